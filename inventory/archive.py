@@ -0,0 +1,67 @@
+# inventory/archive.py
+"""
+Move cold StockLedger rows into StockLedgerArchive.
+
+Only rows already covered by the latest StockCheckpoint are moved, so the
+"checkpoint + tail" reads in inventory.balances keep working from the hot
+table. Moving a row does not change any balance (queryset delete bypasses
+StockLedger.delete()). On PostgreSQL each month lands in its own partition,
+created on demand.
+"""
+from __future__ import annotations
+
+from datetime import datetime, timezone as dt_timezone
+
+from django.db import connection, transaction
+
+from .balances import latest_checkpoint, take_checkpoint
+from .models import StockLedger, StockLedgerArchive
+
+ARCHIVE_FIELDS = ("id", "product_id", "delta", "reason", "ref_type", "ref_id",
+                  "customer_id", "user_id", "note", "created")
+
+
+def _month(dt) -> tuple[int, int]:
+    dt = dt.astimezone(dt_timezone.utc)
+    return dt.year, dt.month
+
+
+def ensure_partitions(months) -> None:
+    """CREATE the monthly partitions for (year, month) pairs (PostgreSQL only)."""
+    if connection.vendor != "postgresql":
+        return
+    table = StockLedgerArchive._meta.db_table
+    with connection.cursor() as cursor:
+        for year, month in sorted(set(months)):
+            start = datetime(year, month, 1, tzinfo=dt_timezone.utc)
+            end = datetime(year + (month == 12), month % 12 + 1, 1, tzinfo=dt_timezone.utc)
+            cursor.execute(
+                f'CREATE TABLE IF NOT EXISTS "{table}_y{year}m{month:02d}" '
+                f'PARTITION OF "{table}" FOR VALUES FROM (%s) TO (%s)',
+                [start, end],
+            )
+
+
+def archive_before(before, batch_size: int = 5000, dry_run: bool = False) -> int:
+    """Archive ledger rows created before `before`; returns the number of rows moved (or movable)."""
+    cp = latest_checkpoint()
+    if cp is None:
+        take_checkpoint()
+        cp = latest_checkpoint()
+        if cp is None:
+            return 0
+    boundary = cp[0]
+    cold = StockLedger.objects.filter(created__lt=before, id__lte=boundary)
+    if dry_run:
+        return cold.count()
+
+    moved = 0
+    while True:
+        rows = list(cold.order_by("id").values(*ARCHIVE_FIELDS)[:batch_size])
+        if not rows:
+            return moved
+        with transaction.atomic():
+            ensure_partitions(_month(r["created"]) for r in rows)
+            StockLedgerArchive.objects.bulk_create([StockLedgerArchive(**r) for r in rows])
+            StockLedger.objects.filter(id__in=[r["id"] for r in rows]).delete()
+        moved += len(rows)
@@ -0,0 +1,157 @@
+# inventory/balances.py
+"""
+Stock balances from the ledger without scanning its history.
+
+- current on-hand: products.Product.stock_cached (maintained by StockLedger)
+- on-hand at T:    latest StockCheckpoint run taken at or before T
+                   + sum(delta) of ledger rows after that checkpoint up to T
+
+A checkpoint covers every ledger id up to its mark, so the mark must never
+pass a row that is still uncommitted (a later run only adds ids above it).
+On PostgreSQL the mark is read under a SHARE lock on the ledger, which
+waits for every in-flight writer; elsewhere it only covers rows older than
+STOCK_CHECKPOINT_LAG seconds.
+"""
+from __future__ import annotations
+
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import Max, Sum
+from django.utils import timezone
+
+from products.models import Product
+from .models import StockCheckpoint, StockLedger, StockLedgerArchive, apply_balances
+
+CHECKPOINT_LAG = getattr(settings, "STOCK_CHECKPOINT_LAG", 300)
+
+
+def _sums(qs) -> dict[int, int]:
+    return {
+        pid: int(total or 0)
+        for pid, total in qs.order_by().values_list("product_id").annotate(total=Sum("delta"))
+    }
+
+
+def _ledger_sums(**filters) -> dict[int, int]:
+    """Per-product sum(delta) over the hot ledger and its archive."""
+    sums = _sums(StockLedger.objects.filter(**filters))
+    for pid, delta in _sums(StockLedgerArchive.objects.filter(**filters)).items():
+        sums[pid] = sums.get(pid, 0) + delta
+    return sums
+
+
+@transaction.atomic
+def post_entries(entries: list[StockLedger], batch_size: int = 1000) -> dict[int, int]:
+    """
+    Insert many ledger rows with bulk_create and move the running balances
+    in one UPDATE. Returns {product_id: new on_hand} for the touched products.
+    """
+    StockLedger.objects.bulk_create(entries, batch_size=batch_size)
+    deltas: dict[int, int] = {}
+    for e in entries:
+        deltas[e.product_id] = deltas.get(e.product_id, 0) + e.delta
+    apply_balances(deltas)
+    return dict(Product.objects.filter(pk__in=list(deltas)).values_list("id", "stock_cached"))
+
+
+def latest_checkpoint(at=None):
+    """(ledger_id, taken_at) of the newest checkpoint run at or before `at`, or None."""
+    qs = StockCheckpoint.objects.all()
+    if at is not None:
+        qs = qs.filter(taken_at__lte=at)
+    return qs.order_by("-taken_at", "-ledger_id").values_list("ledger_id", "taken_at").first()
+
+
+def on_hand_at(at) -> dict[int, int]:
+    """{product_id: on_hand} as of `at` (products with no history are omitted)."""
+    cp = latest_checkpoint(at)
+    if cp is None:
+        return _ledger_sums(created__lte=at)
+    ledger_id, _ = cp
+    balances = dict(
+        StockCheckpoint.objects.filter(ledger_id=ledger_id).values_list("product_id", "on_hand")
+    )
+    # rows after an older checkpoint may already be archived
+    for pid, delta in _ledger_sums(created__lte=at, id__gt=ledger_id).items():
+        balances[pid] = balances.get(pid, 0) + delta
+    return balances
+
+
+def _ledger_mark() -> int:
+    """Highest ledger id below which every row has committed."""
+    hot, archive = StockLedger.objects.all(), StockLedgerArchive.objects.all()
+    with transaction.atomic():
+        if connection.vendor == "postgresql":
+            with connection.cursor() as cursor:
+                cursor.execute(f'LOCK TABLE "{StockLedger._meta.db_table}" IN SHARE MODE')
+        else:
+            cutoff = timezone.now() - timedelta(seconds=CHECKPOINT_LAG)
+            hot, archive = hot.filter(created__lte=cutoff), archive.filter(created__lte=cutoff)
+        return max(hot.aggregate(m=Max("id"))["m"] or 0, archive.aggregate(m=Max("id"))["m"] or 0)
+
+
+def take_checkpoint(force: bool = False) -> int:
+    """
+    Write one checkpoint row per product with ledger history (and every
+    tracked product), built incrementally from the previous run. Returns
+    the number of rows written (0 if the ledger has not moved since the
+    last run and not `force`).
+    """
+    last_id = _ledger_mark()  # own transaction: the lock is released before the sums
+    with transaction.atomic():
+        return _write_checkpoint(last_id, force)
+
+
+def _write_checkpoint(last_id: int, force: bool) -> int:
+    prev = latest_checkpoint()
+    if prev is not None and prev[0] >= last_id and not force:
+        return 0
+
+    if prev is None:
+        balances = _ledger_sums(id__lte=last_id)
+    else:
+        balances = dict(
+            StockCheckpoint.objects.filter(ledger_id=prev[0]).values_list("product_id", "on_hand")
+        )
+        # rows past the previous mark may already be archived (e.g. after invalidated checkpoints)
+        for pid, delta in _ledger_sums(id__gt=prev[0], id__lte=last_id).items():
+            balances[pid] = balances.get(pid, 0) + delta
+
+    now = timezone.now()
+    StockCheckpoint.objects.filter(ledger_id=last_id).delete()  # forced re-run at the same position
+    product_ids = set(balances)
+    product_ids.update(Product.objects.filter(track_stock=True).values_list("id", flat=True))
+    rows = [
+        StockCheckpoint(product_id=pid, ledger_id=last_id, on_hand=balances.get(pid, 0), taken_at=now)
+        for pid in sorted(product_ids)
+    ]
+    StockCheckpoint.objects.bulk_create(rows, batch_size=1000)
+    return len(rows)
+
+
+def checkpoint_drift() -> list[tuple[int, int, int, int]]:
+    """[(ledger_id, product_id, on_hand, ledger_sum)] where the latest checkpoint disagrees with the ledger."""
+    cp = latest_checkpoint()
+    if cp is None:
+        return []
+    ledger_id = cp[0]
+    truth = _ledger_sums(id__lte=ledger_id)
+    saved = dict(StockCheckpoint.objects.filter(ledger_id=ledger_id).values_list("product_id", "on_hand"))
+    return [
+        (ledger_id, pid, saved.get(pid, 0), truth.get(pid, 0))
+        for pid in sorted(set(saved) | set(truth))
+        if saved.get(pid, 0) != truth.get(pid, 0)
+    ]
+
+
+def ledger_drift() -> list[tuple[int, int, int]]:
+    """[(product_id, stock_cached, ledger_sum)] for every product whose cache is wrong."""
+    truth = _ledger_sums()
+    drift = []
+    for pid, cached in Product.objects.values_list("id", "stock_cached").iterator():
+        actual = truth.get(pid, 0)
+        if cached != actual:
+            drift.append((pid, cached, actual))
+    return drift
@@ -0,0 +1,26 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from inventory.archive import archive_before
+
+
+class Command(BaseCommand):
+    help = (
+        "Move StockLedger rows older than --days into StockLedgerArchive "
+        "(monthly partitions on PostgreSQL). Balances are unaffected."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--days", type=int, default=365, help="Archive rows older than N days.")
+        parser.add_argument("--batch-size", type=int, default=5000)
+        parser.add_argument("--dry-run", action="store_true")
+
+    def handle(self, *args, **opts):
+        if opts["days"] < 1:
+            raise CommandError("--days must be at least 1")
+        before = timezone.now() - timedelta(days=opts["days"])
+        n = archive_before(before, batch_size=opts["batch_size"], dry_run=opts["dry_run"])
+        verb = "Would archive" if opts["dry_run"] else "Archived"
+        self.stdout.write(self.style.SUCCESS(f"{verb} {n} ledger row(s) created before {before:%Y-%m-%d}."))
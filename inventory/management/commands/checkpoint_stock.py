@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+
+from inventory.balances import take_checkpoint
+
+
+class Command(BaseCommand):
+    help = "Write a StockCheckpoint run (on-hand per product at the current end of the ledger). Run periodically."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--force", action="store_true", help="Write even if the ledger has not moved.")
+
+    def handle(self, *args, **opts):
+        n = take_checkpoint(force=opts["force"])
+        if n:
+            self.stdout.write(self.style.SUCCESS(f"Checkpointed {n} product(s)."))
+        else:
+            self.stdout.write("Ledger unchanged since the last checkpoint; nothing written.")
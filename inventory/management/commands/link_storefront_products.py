@@ -0,0 +1,42 @@
+from django.core.management.base import BaseCommand
+from django.db.models.functions import Lower
+
+from inventory.storefront import sync_all
+from products.models import Product as LedgerProduct
+from shop.models import Product as ShopProduct
+
+
+class Command(BaseCommand):
+    help = (
+        "Link unlinked ledger products (products.Product) to storefront products (shop.Product) "
+        "by case-insensitive name, then resync storefront stock from the ledger."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--dry-run", action="store_true")
+        parser.add_argument("--sync-only", action="store_true", help="Skip linking; only resync stock.")
+
+    def handle(self, *args, **opts):
+        if not opts["sync_only"]:
+            taken = set(
+                LedgerProduct.objects.filter(shop_product__isnull=False).values_list("shop_product_id", flat=True)
+            )
+            shop_by_name = {
+                name: pid
+                for pid, name in ShopProduct.objects.annotate(n=Lower("name")).values_list("id", "n")
+                if pid not in taken
+            }
+            links = []
+            for lp in LedgerProduct.objects.filter(shop_product__isnull=True).only("id", "name"):
+                sid = shop_by_name.pop(lp.name.lower(), None)
+                if sid is not None:
+                    lp.shop_product_id = sid
+                    links.append(lp)
+            self.stdout.write(f"{len(links)} product(s) to link.")
+            if opts["dry_run"]:
+                return
+            LedgerProduct.objects.bulk_update(links, ["shop_product"], batch_size=500)
+        if opts["dry_run"]:
+            return
+        n = sync_all()
+        self.stdout.write(self.style.SUCCESS(f"Synced stock for {n} storefront product(s)."))
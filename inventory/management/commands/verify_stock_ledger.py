@@ -0,0 +1,46 @@
+from django.core.management.base import BaseCommand
+
+from inventory.balances import checkpoint_drift, ledger_drift, take_checkpoint
+from inventory.models import StockCheckpoint
+from products.models import Product
+
+
+class Command(BaseCommand):
+    help = (
+        "Recompute on-hand from the full StockLedger and report products whose stock_cached "
+        "or latest StockCheckpoint drifted."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--fix", action="store_true", help="Overwrite stock_cached with the ledger sum and rebuild wrong checkpoints (run while the ledger is quiet).")
+
+    def handle(self, *args, **opts):
+        bad_checkpoint = checkpoint_drift()
+        for ledger_id, pid, on_hand, actual in bad_checkpoint:
+            self.stdout.write(
+                f"checkpoint {ledger_id} product {pid}: on_hand={on_hand} ledger={actual} (drift {on_hand - actual:+d})"
+            )
+        if bad_checkpoint and opts["fix"]:
+            # every run since the first miss carries it forward: rebuild from the full ledger
+            StockCheckpoint.objects.all().delete()
+            take_checkpoint()
+            self.stdout.write(self.style.SUCCESS("Rebuilt the checkpoints from the ledger."))
+        elif bad_checkpoint:
+            self.stdout.write(self.style.WARNING(
+                f"Checkpoint {bad_checkpoint[0][0]} is wrong for {len(bad_checkpoint)} product(s); re-run with --fix to rebuild."
+            ))
+
+        drift = ledger_drift()
+        for pid, cached, actual in drift:
+            self.stdout.write(f"product {pid}: stock_cached={cached} ledger={actual} (drift {cached - actual:+d})")
+        if not drift:
+            self.stdout.write(self.style.SUCCESS("No drift."))
+            return
+        if opts["fix"]:
+            Product.objects.bulk_update(
+                [Product(pk=pid, stock_cached=actual) for pid, _, actual in drift],
+                ["stock_cached"], batch_size=1000,
+            )
+            self.stdout.write(self.style.SUCCESS(f"Fixed {len(drift)} product(s)."))
+        else:
+            self.stdout.write(self.style.WARNING(f"{len(drift)} product(s) drifted; re-run with --fix to repair."))
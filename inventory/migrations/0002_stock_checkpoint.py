@@ -0,0 +1,44 @@
+# Generated by Django 5.2.7 on 2026-10-19 04:16
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Sum
+
+
+def backfill_stock_cached(apps, schema_editor):
+    # stock_cached becomes the maintained running balance of the ledger
+    Product = apps.get_model('products', 'Product')
+    StockLedger = apps.get_model('inventory', 'StockLedger')
+    sums = dict(
+        StockLedger.objects.order_by().values_list('product_id').annotate(total=Sum('delta'))
+    )
+    products = list(Product.objects.only('id', 'stock_cached'))
+    for p in products:
+        p.stock_cached = int(sums.get(p.id) or 0)
+    Product.objects.bulk_update(products, ['stock_cached'], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0001_initial'),
+        ('products', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StockCheckpoint',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('ledger_id', models.BigIntegerField()),
+                ('on_hand', models.IntegerField()),
+                ('taken_at', models.DateTimeField(db_index=True)),
+                ('product', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='stock_checkpoints', to='products.product')),
+            ],
+            options={
+                'ordering': ['-taken_at'],
+                'constraints': [models.UniqueConstraint(fields=('ledger_id', 'product'), name='uniq_checkpoint_product')],
+            },
+        ),
+        migrations.RunPython(backfill_stock_cached, migrations.RunPython.noop),
+    ]
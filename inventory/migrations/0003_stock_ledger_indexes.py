@@ -0,0 +1,33 @@
+# Generated by Django 5.2.7 on 2026-10-19 04:18
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('customers', '0001_initial'),
+        ('inventory', '0002_stock_checkpoint'),
+        ('products', '0001_initial'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='stockledger',
+            index=models.Index(fields=['-created', '-id'], name='ledger_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='stockledger',
+            index=models.Index(fields=['product', '-created', '-id'], name='ledger_product_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='stockledger',
+            index=models.Index(fields=['ref_type', 'ref_id'], name='ledger_ref_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='stockledger',
+            index=models.Index(fields=['reason', '-created'], name='ledger_reason_created_idx'),
+        ),
+    ]
@@ -0,0 +1,85 @@
+# Generated by Django 5.2.7 on 2026-10-19 04:18
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+# PostgreSQL: archive is range-partitioned by month on `created`. Partitions
+# (inventory_stockledgerarchive_yYYYYmMM) are created on demand by
+# inventory.archive.ensure_partitions; the DEFAULT partition catches the rest.
+# The primary key must include the partition key, hence (id, created).
+PG_CREATE = [
+    """
+    CREATE TABLE inventory_stockledgerarchive (
+        id bigint NOT NULL,
+        product_id bigint NOT NULL,
+        delta integer NOT NULL,
+        reason varchar(16) NOT NULL,
+        ref_type varchar(32) NULL,
+        ref_id varchar(64) NULL,
+        customer_id bigint NULL,
+        user_id bigint NULL,
+        note varchar(250) NULL,
+        created timestamp with time zone NOT NULL,
+        archived_at timestamp with time zone NOT NULL,
+        PRIMARY KEY (id, created)
+    ) PARTITION BY RANGE (created)
+    """,
+    "CREATE TABLE inventory_stockledgerarchive_default PARTITION OF inventory_stockledgerarchive DEFAULT",
+    "CREATE INDEX ledger_arch_product_idx ON inventory_stockledgerarchive (product_id, created DESC, id DESC)",
+    "CREATE INDEX ledger_arch_ref_idx ON inventory_stockledgerarchive (ref_type, ref_id)",
+]
+
+
+def create_archive(apps, schema_editor):
+    if schema_editor.connection.vendor == 'postgresql':
+        for sql in PG_CREATE:
+            schema_editor.execute(sql)
+    else:
+        schema_editor.create_model(apps.get_model('inventory', 'StockLedgerArchive'))
+
+
+def drop_archive(apps, schema_editor):
+    if schema_editor.connection.vendor == 'postgresql':
+        schema_editor.execute("DROP TABLE IF EXISTS inventory_stockledgerarchive CASCADE")
+    else:
+        schema_editor.delete_model(apps.get_model('inventory', 'StockLedgerArchive'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('customers', '0001_initial'),
+        ('inventory', '0003_stock_ledger_indexes'),
+        ('products', '0001_initial'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.SeparateDatabaseAndState(
+            state_operations=[
+                migrations.CreateModel(
+                    name='StockLedgerArchive',
+                    fields=[
+                        ('id', models.BigIntegerField(primary_key=True, serialize=False)),
+                        ('delta', models.IntegerField()),
+                        ('reason', models.CharField(choices=[('PRODUCTION', 'PRODUCTION'), ('SALE', 'SALE'), ('ADJUSTMENT', 'ADJUSTMENT'), ('DAMAGED', 'DAMAGED'), ('RETURNED', 'RETURNED')], max_length=16)),
+                        ('ref_type', models.CharField(blank=True, max_length=32, null=True)),
+                        ('ref_id', models.CharField(blank=True, max_length=64, null=True)),
+                        ('note', models.CharField(blank=True, max_length=250, null=True)),
+                        ('created', models.DateTimeField()),
+                        ('archived_at', models.DateTimeField(auto_now_add=True)),
+                        ('customer', models.ForeignKey(blank=True, db_constraint=False, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='customers.customer')),
+                        ('product', models.ForeignKey(db_constraint=False, on_delete=django.db.models.deletion.CASCADE, related_name='+', to='products.product')),
+                        ('user', models.ForeignKey(blank=True, db_constraint=False, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to=settings.AUTH_USER_MODEL)),
+                    ],
+                    options={
+                        'ordering': ['-created'],
+                        'indexes': [models.Index(fields=['product', '-created', '-id'], name='ledger_arch_product_idx'), models.Index(fields=['ref_type', 'ref_id'], name='ledger_arch_ref_idx')],
+                    },
+                ),
+            ],
+        ),
+        # table created here (not in database_operations) so the state model exists
+        migrations.RunPython(create_archive, drop_archive),
+    ]
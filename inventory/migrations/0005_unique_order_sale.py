@@ -0,0 +1,21 @@
+# Generated by Django 5.2.7 on 2026-10-19 04:53
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('customers', '0001_initial'),
+        ('inventory', '0004_stock_ledger_archive'),
+        ('products', '0002_product_shop_link'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddConstraint(
+            model_name='stockledger',
+            constraint=models.UniqueConstraint(condition=models.Q(('reason', 'SALE'), ('ref_type', 'order')), fields=('ref_type', 'ref_id', 'product'), name='ledger_uniq_order_sale'),
+        ),
+    ]
@@ -1,9 +1,46 @@
 # inventory/models.py
-from django.db import models
+from django.db import models, transaction
+from django.db.models import Case, F, IntegerField, Value, When
 from django.conf import settings
 from products.models import Product
 from customers.models import Customer
 
+
+def _schedule_storefront_sync():
+    from .storefront import schedule_storefront_sync
+    transaction.on_commit(schedule_storefront_sync)
+
+
+def apply_balance(product_id, delta: int) -> None:
+    """Move products.Product.stock_cached by `delta` (atomic UPDATE, no read)."""
+    if delta:
+        Product.objects.filter(pk=product_id).update(
+            stock_cached=F("stock_cached") + delta, storefront_dirty=True,
+        )
+        _schedule_storefront_sync()
+
+
+def apply_balances(deltas: dict) -> None:
+    """Move stock_cached for many products in one UPDATE ({product_id: delta})."""
+    deltas = {pid: d for pid, d in deltas.items() if d}
+    if not deltas:
+        return
+    Product.objects.filter(pk__in=list(deltas)).update(
+        stock_cached=F("stock_cached") + Case(
+            *[When(pk=pid, then=Value(d)) for pid, d in deltas.items()],
+            default=Value(0),
+            output_field=IntegerField(),
+        ),
+        storefront_dirty=True,
+    )
+    _schedule_storefront_sync()
+
+
+def _invalidate_checkpoints(ledger_id) -> None:
+    """An edited/deleted ledger row makes every checkpoint taken at or after it wrong: drop them."""
+    StockCheckpoint.objects.filter(ledger_id__gte=ledger_id).delete()
+
+
 class StockLedger(models.Model):
     PRODUCTION = "PRODUCTION"
     SALE = "SALE"
@@ -25,3 +62,106 @@ class StockLedger(models.Model):
 
     class Meta:
         ordering = ["-created"]
+        indexes = [
+            models.Index(fields=["-created", "-id"], name="ledger_created_idx"),
+            models.Index(fields=["product", "-created", "-id"], name="ledger_product_created_idx"),
+            models.Index(fields=["ref_type", "ref_id"], name="ledger_ref_idx"),
+            models.Index(fields=["reason", "-created"], name="ledger_reason_created_idx"),
+        ]
+        constraints = [
+            # one SALE row per product per paid order (inventory.storefront.record_order_sale)
+            models.UniqueConstraint(
+                fields=["ref_type", "ref_id", "product"],
+                condition=models.Q(reason="SALE", ref_type="order"),
+                name="ledger_uniq_order_sale",
+            ),
+        ]
+
+    # Product.stock_cached is the running balance of this ledger. It is kept
+    # in the same transaction as every save()/delete(); queryset.update(),
+    # queryset.delete() and bulk_create() bypass it — use
+    # inventory.balances.post_entries for bulk inserts (see verify_stock_ledger).
+    # Editing or deleting a row also drops the checkpoints covering it;
+    # the next take_checkpoint run rebuilds from the newest one left.
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        if "product_id" in instance.__dict__ and "delta" in instance.__dict__:
+            instance._balance = (instance.product_id, instance.delta)
+        return instance
+
+    def save(self, *args, **kwargs):
+        with transaction.atomic():
+            previous = None
+            if not self._state.adding:
+                previous = getattr(self, "_balance", None)
+                if previous is None:
+                    previous = (
+                        type(self).objects.filter(pk=self.pk)
+                        .values_list("product_id", "delta").first()
+                    )
+            super().save(*args, **kwargs)
+            if previous is not None:
+                _invalidate_checkpoints(self.pk)
+                apply_balance(previous[0], -previous[1])
+            apply_balance(self.product_id, self.delta)
+            self._balance = (self.product_id, self.delta)
+
+    def delete(self, *args, **kwargs):
+        with transaction.atomic():
+            product_id, delta, pk = self.product_id, self.delta, self.pk
+            result = super().delete(*args, **kwargs)
+            _invalidate_checkpoints(pk)
+            apply_balance(product_id, -delta)
+            return result
+
+
+class StockCheckpoint(models.Model):
+    """
+    On-hand per product after all ledger rows with id <= ledger_id.
+    Written for every tracked product in one run (checkpoint_stock), so
+    on-hand at time T = checkpoint taken at or before T + tail sum of rows
+    with id > ledger_id and created <= T.
+    """
+    product = models.ForeignKey(Product, related_name="stock_checkpoints", on_delete=models.CASCADE)
+    ledger_id = models.BigIntegerField()
+    on_hand = models.IntegerField()
+    taken_at = models.DateTimeField(db_index=True)
+
+    class Meta:
+        ordering = ["-taken_at"]
+        constraints = [
+            models.UniqueConstraint(fields=["ledger_id", "product"], name="uniq_checkpoint_product"),
+        ]
+
+    def __str__(self):
+        return f"{self.product_id}: {self.on_hand} @ ledger {self.ledger_id}"
+
+
+class StockLedgerArchive(models.Model):
+    """
+    Cold StockLedger rows moved by `archive_stock_ledger` (same ids). On
+    PostgreSQL the table is range-partitioned by month on `created` (see
+    migration 0004); elsewhere it is a plain table. Read-only history: FKs
+    carry no DB constraints so partitions stay independent.
+    """
+    id = models.BigIntegerField(primary_key=True)
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, db_constraint=False, related_name="+")
+    delta = models.IntegerField()
+    reason = models.CharField(max_length=16, choices=StockLedger.REASONS)
+    ref_type = models.CharField(max_length=32, blank=True, null=True)
+    ref_id = models.CharField(max_length=64, blank=True, null=True)
+    customer = models.ForeignKey(Customer, null=True, blank=True, on_delete=models.SET_NULL,
+                                 db_constraint=False, related_name="+")
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, null=True, blank=True, on_delete=models.SET_NULL,
+                             db_constraint=False, related_name="+")
+    note = models.CharField(max_length=250, blank=True, null=True)
+    created = models.DateTimeField()
+    archived_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ["-created"]
+        indexes = [
+            models.Index(fields=["product", "-created", "-id"], name="ledger_arch_product_idx"),
+            models.Index(fields=["ref_type", "ref_id"], name="ledger_arch_ref_idx"),
+        ]
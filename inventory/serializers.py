@@ -1,6 +1,6 @@
 # inventory/serializers.py
 from rest_framework import serializers
-from .models import StockLedger
+from .models import StockLedger, StockLedgerArchive
 from products.models import Product
 
 class StockLedgerSer(serializers.ModelSerializer):
@@ -15,3 +15,19 @@ class InventorySnapshotRowSer(serializers.Serializer):
     name = serializers.CharField()
     sku = serializers.CharField(allow_null=True)
     on_hand = serializers.IntegerField()
+
+class StockLedgerBulkRowSer(serializers.Serializer):
+    # plain ids: products are resolved for the whole batch with one in_bulk()
+    product = serializers.IntegerField()
+    delta = serializers.IntegerField()
+    reason = serializers.ChoiceField(choices=StockLedger.REASONS)
+    ref_type = serializers.CharField(max_length=32, required=False, allow_null=True, allow_blank=True)
+    ref_id = serializers.CharField(max_length=64, required=False, allow_null=True, allow_blank=True)
+    note = serializers.CharField(max_length=250, required=False, allow_null=True, allow_blank=True)
+
+class StockLedgerArchiveSer(serializers.ModelSerializer):
+    product_name = serializers.CharField(source="product.name", read_only=True)
+    class Meta:
+        model = StockLedgerArchive
+        fields = ("id","product","product_name","delta","reason","ref_type","ref_id","customer","user","note","created","archived_at")
+        read_only_fields = fields
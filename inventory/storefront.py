@@ -0,0 +1,143 @@
+# inventory/storefront.py
+"""
+Ledger -> storefront stock sync.
+
+products.Product (ledger) links to shop.Product (storefront) through
+`shop_product`. For a linked storefront product:
+
+    shop.Product.stock = max(0, ledger on-hand - units held by checkouts)
+
+Every balance change marks the ledger product `storefront_dirty` in the same
+UPDATE and schedules one debounced celery run (STOREFRONT_SYNC_DEBOUNCE
+seconds); the run clears the flags and rewrites the dirty storefront rows
+with batched bulk UPDATEs. Unlinked storefront products are left alone.
+"""
+from __future__ import annotations
+
+import logging
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import IntegrityError, transaction
+from django.db.models import IntegerField, OuterRef, Subquery, Sum, Value
+from django.db.models.functions import Coalesce, Greatest
+
+from products.models import Product as LedgerProduct
+from shop.stock_alerts import stock_changed
+
+logger = logging.getLogger(__name__)
+
+SYNC_DEBOUNCE = getattr(settings, "STOREFRONT_SYNC_DEBOUNCE", 5)
+SYNC_BATCH_SIZE = 500
+_SCHEDULED_KEY = "inventory:storefront_sync:scheduled"
+
+
+def schedule_storefront_sync() -> None:
+    """At most one pending sync per debounce window."""
+    if cache.add(_SCHEDULED_KEY, 1, SYNC_DEBOUNCE * 4):
+        from .tasks import sync_storefront_stock
+        try:
+            sync_storefront_stock.apply_async(countdown=SYNC_DEBOUNCE)
+        except Exception:
+            # broker down: the ledger write has committed and the rows stay
+            # storefront_dirty, so the next scheduled run picks them up
+            cache.delete(_SCHEDULED_KEY)
+            logger.exception("Could not schedule the storefront stock sync")
+
+
+def _storefront_stock_expr():
+    from orders.models import StockReservation
+    on_hand = Subquery(
+        LedgerProduct.objects.filter(shop_product=OuterRef("pk")).values("stock_cached")[:1],
+        output_field=IntegerField(),
+    )
+    held = Subquery(
+        StockReservation.objects
+        .filter(product=OuterRef("pk"), status=StockReservation.HELD, backend="db")
+        .order_by().values("product")
+        .annotate(n=Sum("quantity")).values("n")[:1],
+        output_field=IntegerField(),
+    )
+    return Greatest(on_hand - Coalesce(held, Value(0)), Value(0), output_field=IntegerField())
+
+
+def sync_shop_products(shop_product_ids) -> int:
+    """
+    Rewrite storefront stock for the given shop.Product ids (bulk UPDATE per
+    batch). The rows are locked first, in id order like reserve_order: the
+    UPDATE then reads held units in a snapshot taken after any reservation
+    that already touched them committed, and later ones wait for us.
+    """
+    from shop.models import Product as ShopProduct
+    ids = sorted(set(shop_product_ids))
+    updated = 0
+    for i in range(0, len(ids), SYNC_BATCH_SIZE):
+        with transaction.atomic():
+            batch = list(
+                ShopProduct.objects.select_for_update()
+                .filter(pk__in=ids[i:i + SYNC_BATCH_SIZE]).order_by("pk")
+                .values_list("pk", flat=True)
+            )
+            updated += ShopProduct.objects.filter(pk__in=batch).update(stock=_storefront_stock_expr())
+    if updated:
+        stock_changed()
+    return updated
+
+
+def sync_dirty() -> int:
+    """Sync every storefront product whose ledger balance changed since the last run."""
+    cache.delete(_SCHEDULED_KEY)
+    total = 0
+    while True:
+        with transaction.atomic():
+            rows = list(
+                LedgerProduct.objects.filter(storefront_dirty=True)
+                .values_list("id", "shop_product_id")[:SYNC_BATCH_SIZE]
+            )
+            if not rows:
+                return total
+            # clear first: a change landing after this point re-marks the row
+            LedgerProduct.objects.filter(pk__in=[pid for pid, _ in rows]).update(storefront_dirty=False)
+            total += sync_shop_products(sid for _, sid in rows if sid)
+
+
+def sync_all() -> int:
+    ids = LedgerProduct.objects.filter(shop_product__isnull=False).values_list("shop_product_id", flat=True)
+    LedgerProduct.objects.filter(storefront_dirty=True).update(storefront_dirty=False)
+    return sync_shop_products(list(ids))
+
+
+def record_order_sale(order_id) -> int:
+    """
+    Post SALE ledger rows for the linked items of a paid order (once per
+    order; ref_type="order", enforced by ledger_uniq_order_sale). Returns
+    the number of rows written, 0 if another call already posted them.
+    """
+    from orders.models import OrderItem
+    from .balances import post_entries
+    from .models import StockLedger
+
+    ref_id = str(order_id)
+    if StockLedger.objects.filter(ref_type="order", ref_id=ref_id, reason=StockLedger.SALE).exists():
+        return 0
+    lines = (
+        OrderItem.objects.filter(order_id=order_id, product__ledger_product__isnull=False)
+        .order_by()
+        .values_list("product__ledger_product__id")
+        .annotate(units=Sum("quantity"))
+    )
+    entries = [
+        StockLedger(product_id=pid, delta=-int(units), reason=StockLedger.SALE,
+                    ref_type="order", ref_id=ref_id)
+        for pid, units in lines if units
+    ]
+    if not entries:
+        return 0
+    # a concurrent paid-callback that got there first makes the insert
+    # conflict; the savepoint keeps the caller's transaction usable
+    try:
+        with transaction.atomic():
+            post_entries(entries)
+    except IntegrityError:
+        return 0
+    return len(entries)
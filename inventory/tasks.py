@@ -0,0 +1,11 @@
+from celery import shared_task
+
+
+@shared_task
+def sync_storefront_stock():
+    """
+    Debounced (see inventory.storefront.schedule_storefront_sync): push
+    ledger balance changes to the linked shop.Product.stock rows.
+    """
+    from .storefront import sync_dirty
+    return sync_dirty()
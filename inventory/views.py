@@ -1,12 +1,40 @@
 # inventory/views.py
-from django.db.models import Sum, F
-from rest_framework import viewsets, permissions, mixins
+from datetime import datetime, time
+
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+from rest_framework import viewsets, permissions, mixins, status
 from rest_framework.decorators import action
+from rest_framework.exceptions import ValidationError
+from rest_framework.pagination import CursorPagination
 from rest_framework.response import Response
-from .models import StockLedger
-from .serializers import StockLedgerSer, InventorySnapshotRowSer
+from .balances import on_hand_at, post_entries
+from .models import StockLedger, StockLedgerArchive
+from .serializers import StockLedgerSer, StockLedgerArchiveSer, StockLedgerBulkRowSer, InventorySnapshotRowSer
 from products.models import Product
 
+
+class LedgerCursorPagination(CursorPagination):
+    """Keyset pagination on (-created, -id), served by the ledger indexes."""
+    page_size = 50
+    page_size_query_param = "page_size"
+    max_page_size = 500
+    ordering = ("-created", "-id")
+
+
+def _filter_ledger(qs, params):
+    # each filter matches a leading column of a StockLedger / archive index
+    if params.get("product"):
+        qs = qs.filter(product_id=params["product"])
+    if params.get("reason"):
+        qs = qs.filter(reason=params["reason"])
+    if params.get("ref_type"):
+        qs = qs.filter(ref_type=params["ref_type"])
+        if params.get("ref_id"):
+            qs = qs.filter(ref_id=params["ref_id"])
+    return qs
+
+
 class StockLedgerViewSet(mixins.ListModelMixin,
                          mixins.CreateModelMixin,
                          mixins.DestroyModelMixin,
@@ -14,21 +42,95 @@ class StockLedgerViewSet(mixins.ListModelMixin,
     queryset = StockLedger.objects.select_related("product","customer","user")
     serializer_class = StockLedgerSer
     permission_classes = [permissions.IsAuthenticated]
+    pagination_class = LedgerCursorPagination
+
+    def get_queryset(self):
+        qs = super().get_queryset()
+        if self.action == "list":
+            qs = _filter_ledger(qs, self.request.query_params)
+        return qs
+
+    @action(detail=False, methods=["get"])
+    def archive(self, request):
+        """Archived (cold) ledger rows; same filters and pagination as the list."""
+        qs = _filter_ledger(StockLedgerArchive.objects.select_related("product"), request.query_params)
+        page = self.paginate_queryset(qs)
+        return self.get_paginated_response(StockLedgerArchiveSer(page, many=True).data)
+
+    BULK_MAX_ROWS = 5000
+
+    @action(detail=False, methods=["post"])
+    def bulk(self, request):
+        """
+        POST [{product, delta, reason, ref_type?, ref_id?, note?}, ...]
+        (or {"rows": [...]}). All rows are written in one transaction with
+        bulk_create; returns the new on-hand of every touched product.
+        """
+        data = request.data.get("rows") if isinstance(request.data, dict) else request.data
+        if not isinstance(data, list) or not data:
+            raise ValidationError({"rows": "Send a non-empty list of ledger rows."})
+        if len(data) > self.BULK_MAX_ROWS:
+            raise ValidationError({"rows": f"At most {self.BULK_MAX_ROWS} rows per request."})
+
+        ser = StockLedgerBulkRowSer(data=data, many=True)
+        ser.is_valid(raise_exception=True)
+        rows = ser.validated_data
+
+        found = Product.objects.in_bulk({r["product"] for r in rows}, field_name="pk")
+        missing = [i for i, r in enumerate(rows) if r["product"] not in found]
+        if missing:
+            raise ValidationError({"rows": {i: {"product": "Unknown product."} for i in missing}})
+
+        user = request.user if request.user.is_authenticated else None
+        on_hand = post_entries([
+            StockLedger(
+                product_id=r["product"],
+                delta=r["delta"],
+                reason=r["reason"],
+                ref_type=r.get("ref_type") or None,
+                ref_id=r.get("ref_id") or None,
+                note=r.get("note") or None,
+                user=user,
+            )
+            for r in rows
+        ])
+        return Response({
+            "created": len(rows),
+            "on_hand": [{"product_id": pid, "on_hand": n} for pid, n in sorted(on_hand.items())],
+        }, status=status.HTTP_201_CREATED)
 
     @action(detail=False, methods=["get"])
     def snapshot(self, request):
-        # on-hand = sum(delta) per product where track_stock=True
-        sums = (StockLedger.objects
-                .values("product_id")
-                .annotate(on_hand=Sum("delta")))
-        on_by_id = {row["product_id"]: row["on_hand"] or 0 for row in sums}
+        """
+        On-hand per tracked product from Product.stock_cached (no ledger scan).
+        ?at=<ISO datetime or date> -> on-hand at that moment (checkpoint + tail).
+        """
+        at = _parse_at(request.query_params.get("at"))
+        products = (Product.objects.filter(track_stock=True)
+                    .order_by("id")
+                    .values_list("id", "name", "sku", "stock_cached"))
+        balances = on_hand_at(at) if at is not None else None
         rows = []
-        for p in Product.objects.filter(track_stock=True):
+        for pid, name, sku, cached in products:
             rows.append({
-                "product_id": p.id,
-                "name": p.name,
-                "sku": p.sku,
-                "on_hand": int(on_by_id.get(p.id, 0)),
+                "product_id": pid,
+                "name": name,
+                "sku": sku,
+                "on_hand": int(cached if balances is None else balances.get(pid, 0)),
             })
         ser = InventorySnapshotRowSer(rows, many=True)
         return Response(ser.data)
+
+
+def _parse_at(value):
+    if not value:
+        return None
+    dt = parse_datetime(value)
+    if dt is None:
+        d = parse_date(value)
+        if d is None:
+            raise ValidationError({"at": "Use an ISO datetime or YYYY-MM-DD."})
+        dt = datetime.combine(d, time.max)
+    if timezone.is_naive(dt):
+        dt = timezone.make_aware(dt, timezone.get_current_timezone())
+    return dt
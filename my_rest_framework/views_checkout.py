@@ -9,13 +9,12 @@ from rest_framework.exceptions import ValidationError
 from cart.cart import Cart as SessionCart
 from .views_cart import _cart_payload  # reuse your existing payload builder
 
-# OPTIONAL: if using Stripe (recommended)
+# OPTIONAL: if using Stripe (recommended); one pooled client per process
 try:
-    import stripe
-    stripe.api_key = getattr(settings, "STRIPE_SECRET_KEY", None)
-    STRIPE_ENABLED = bool(stripe.api_key)
+    from payment.stripe_client import get_client
+    STRIPE_ENABLED = bool(getattr(settings, "STRIPE_SECRET_KEY", None))
 except Exception:
-    stripe = None
+    get_client = None
     STRIPE_ENABLED = False
 
 
@@ -56,7 +55,7 @@ class CreateCheckoutSessionView(APIView):
         payment_intent_id = None
 
         if STRIPE_ENABLED:
-            intent = stripe.PaymentIntent.create(
+            intent = get_client().payment_intents.create(dict(
                 amount=amount_cents,
                 currency=currency,
                 automatic_payment_methods={"enabled": True},
@@ -64,7 +63,7 @@ class CreateCheckoutSessionView(APIView):
                     # (optional) include info to link back to your order/session if needed
                     "session_key": request.session.session_key or "",
                 },
-            )
+            ))
             client_secret = intent.client_secret
             payment_intent_id = intent.id
 
@@ -93,7 +92,7 @@ class FinalizeCheckoutView(APIView):
         payment_intent_id = request.data.get("payment_intent_id")
         if STRIPE_ENABLED and payment_intent_id:
             try:
-                intent = stripe.PaymentIntent.retrieve(payment_intent_id)
+                intent = get_client().payment_intents.retrieve(payment_intent_id)
             except Exception:
                 return Response({"error": "Unable to verify payment intent."}, status=400)
 
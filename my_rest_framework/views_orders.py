@@ -1,13 +1,18 @@
 # myshop/my_rest_framework/views_order.py
 from decimal import Decimal
 from django.db import transaction
+from django.db.models import Prefetch
 from rest_framework.views import APIView
 from rest_framework.generics import RetrieveAPIView
 from rest_framework.response import Response
 from rest_framework import status, serializers
+from rest_framework.exceptions import NotFound
 
 from cart.cart import Cart
+from orders.cache import etag_matches, get_order_payload
+from orders.idempotency import IdempotencyConflict, checkout_key, claim, complete, find_replay
 from orders.models import Order, OrderItem
+from orders.reservations import OutOfStock, reserve_order
 from .serializers import OrderCreateSerializer
 
 # Pick only fields that exist on your Order model
@@ -32,9 +37,9 @@ class OrderDetailSerializer(serializers.ModelSerializer):
         fields = _order_fields(Order) + ["items"]
 
     def get_items(self, obj):
-        qs = OrderItem.objects.filter(order=obj)
+        # obj.items is prefetched with products by OrderDetailView
         data = []
-        for it in qs:
+        for it in obj.items.all():
             product = it.product
             image_url = ""
             try:
@@ -59,9 +64,18 @@ class OrdersView(APIView):
     POST /api/orders/
     Body: { first_name, last_name, email, address, postal_code, city }
     Creates an Order from the current session cart.
+
+    Idempotent: a repeated submit (same Idempotency-Key header, or same
+    session + cart + form within a few minutes) returns the original order
+    with `Idempotent-Replayed: true` instead of creating another one.
     """
     permission_classes = []  # public
 
+    @staticmethod
+    def _replay(rec):
+        return Response(rec.response or {"id": rec.order_id}, status=status.HTTP_200_OK,
+                        headers={"Idempotent-Replayed": "true"})
+
     @transaction.atomic
     def post(self, request):
         ser = OrderCreateSerializer(data=request.data)
@@ -69,6 +83,11 @@ class OrdersView(APIView):
 
         cart = Cart(request)
 
+        key, ttl, from_header = checkout_key(request, cart, ser.validated_data)
+        rec = find_replay(key, from_header)
+        if rec is not None:
+            return self._replay(rec)
+
         subtotal = cart.get_total_price() if hasattr(cart, "get_total_price") else Decimal("0")
         discount = cart.get_discount() if hasattr(cart, "get_discount") else Decimal("0")
         total = (subtotal - discount).quantize(Decimal("0.01")) if (subtotal or discount) else Decimal("0.00")
@@ -76,7 +95,15 @@ class OrdersView(APIView):
         if total <= 0 and len(cart) == 0:
             return Response({"detail": "Cart is empty."}, status=status.HTTP_400_BAD_REQUEST)
 
+        try:
+            rec, replay = claim(key, ttl, from_header)
+        except IdempotencyConflict:
+            return Response({"detail": "This order is already being processed."}, status=status.HTTP_409_CONFLICT)
+        if replay is not None:
+            return self._replay(replay)
+
         order = Order.objects.create(
+            user       = request.user if request.user.is_authenticated else None,
             first_name = ser.validated_data["first_name"],
             last_name  = ser.validated_data["last_name"],
             email      = ser.validated_data["email"],
@@ -111,22 +138,47 @@ class OrdersView(APIView):
         if changed:
             order.save(update_fields=changed)
 
+        # Hold stock last, so the row locks are kept as briefly as possible
+        try:
+            reserve_order(order, [(line["product_id"], line["quantity"]) for line in items_payload])
+        except OutOfStock as e:
+            transaction.set_rollback(True)
+            return Response({"detail": "Not enough stock.", "product_id": e.product_id},
+                            status=status.HTTP_409_CONFLICT)
+
         # Save in session for Stripe fallback
         request.session["last_order_id"] = order.id
         request.session.modified = True
 
-        return Response({
+        payload = {
             "id": order.id,
             "subtotal": str(subtotal),
             "discount": str(discount),
             "total": str(total),
             "items": items_payload,
-        }, status=status.HTTP_201_CREATED)
+        }
+        complete(rec, order, payload)
+        return Response(payload, status=status.HTTP_201_CREATED)
 
 class OrderDetailView(RetrieveAPIView):
     """
     GET /api/orders/<pk>/
+    Paid orders are served from the order payload cache (orders.cache) with an ETag.
     """
-    queryset = Order.objects.all()
+    queryset = Order.objects.prefetch_related(
+        Prefetch("items", queryset=OrderItem.objects.select_related("product"))
+    )
     serializer_class = OrderDetailSerializer
     permission_classes = []
+
+    def retrieve(self, request, *args, **kwargs):
+        payload, etag = get_order_payload(
+            kwargs["pk"], "api_detail",
+            lambda order: dict(self.get_serializer(order).data),
+            queryset=self.get_queryset(),
+        )
+        if payload is None:
+            raise NotFound()
+        if etag_matches(request, etag):
+            return Response(status=status.HTTP_304_NOT_MODIFIED, headers={"ETag": etag})
+        return Response(payload, headers={"ETag": etag, "Cache-Control": "private, no-cache"})
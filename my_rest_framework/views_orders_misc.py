@@ -2,7 +2,7 @@
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework import status
-from orders.models import Order
+from orders.cache import etag_matches, get_order_payload
 
 class OrderThankYouAPI(APIView):
     permission_classes = []  # AllowAny
@@ -21,12 +21,17 @@ class OrderThankYouAPI(APIView):
             return Response({"detail": "No order id."}, status=status.HTTP_400_BAD_REQUEST)
 
         try:
-            order = Order.objects.get(id=oid)
-        except Order.DoesNotExist:
-            return Response({"detail": "Order not found."}, status=status.HTTP_404_NOT_FOUND)
+            oid = int(oid)
+        except (TypeError, ValueError):
+            return Response({"detail": "Invalid order id."}, status=status.HTTP_400_BAD_REQUEST)
 
-        return Response({
+        payload, etag = get_order_payload(oid, "thank_you", lambda order: {
             "order": order.id,
             "paid": order.paid,
-            "total": str(getattr(order, "total", "")),
+            "total": str(order.total_amount),
         })
+        if payload is None:
+            return Response({"detail": "Order not found."}, status=status.HTTP_404_NOT_FOUND)
+        if etag_matches(request, etag):
+            return Response(status=status.HTTP_304_NOT_MODIFIED, headers={"ETag": etag})
+        return Response(payload, headers={"ETag": etag, "Cache-Control": "private, no-cache"})
@@ -60,6 +60,7 @@ INSTALLED_APPS = [
     "products",
     "customers.apps.CustomersConfig",
     "inventory.apps.InventoryConfig",
+    "shipping.apps.ShippingConfig",
 
     # 3rd-party
     "graphene_django",
@@ -265,6 +266,13 @@ STRIPE_PUBLISHABLE_KEY = config("STRIPE_PUBLISHABLE_KEY", default="")
 STRIPE_SECRET_KEY = config("STRIPE_SECRET_KEY", default="")
 STRIPE_API_VERSION = config("STRIPE_API_VERSION", default="2024-04-10")
 STRIPE_WEBHOOK_SECRET = config("STRIPE_WEBHOOK_SECRET", default="")
+STRIPE_API_BASE = config("STRIPE_API_BASE", default="")  # override for `manage.py fake_stripe`
+# Shared client (payment.stripe_client)
+STRIPE_CONNECT_TIMEOUT = 3        # seconds
+STRIPE_READ_TIMEOUT = 20          # seconds, per attempt
+STRIPE_MAX_NETWORK_RETRIES = 2    # retry budget per call (idempotent retries)
+STRIPE_HTTP_POOL_SIZE = 20        # keep-alive connections per process
+STRIPE_SLOW_CALL_MS = 2000        # log calls slower than this
 
 GRAPHENE = {"SCHEMA": "recommender.schema.schema"}
 
@@ -307,6 +315,11 @@ REDIS_HOST = '127.0.0.1'
 REDIS_PORT = 6379          
 REDIS_DB   = 0   # <--- add this line
 
+# Co-purchase recommendations (shop.recommender)
+RECOMMENDER_TOP_K = 50               # neighbours kept per product by the periodic trim
+RECOMMENDER_HALF_LIFE_DAYS = None    # e.g. 90 to decay old purchases (>= 1); None = plain counts
+RECOMMENDER_SUGGEST_CACHE_TTL = 60   # seconds suggestions per cart signature are cached
+
 
 TAX_RATES = {
     # Your originals
@@ -364,3 +377,36 @@ TAX_RATES = {
     "WI": Decimal("0.0500"),
     "WY": Decimal("0.0400"),
 }
+
+# Per-jurisdiction overrides on top of TAX_RATES (orders.tax).
+# Keys: "COUNTRY", "COUNTRY-STATE" or "COUNTRY-STATE-POSTALPREFIX"; most specific wins.
+TAX_JURISDICTION_OVERRIDES = {}
+TAX_DEFAULT_RATE = Decimal("0.00")
+TAX_ON_SHIPPING = False
+
+# Stock reservations at checkout (orders.reservations)
+STOCK_RESERVATION_BACKEND = "off"    # "off" (no enforcement), "db" (conditional UPDATE) or "redis" (sharded counters);
+                                     # switch on only once shop.Product.stock is seeded
+STOCK_RESERVATION_TTL = 60 * 60      # seconds a checkout may hold stock before payment
+STOCK_REDIS_SHARDS = 8               # counters per hot SKU (redis backend)
+STOCK_REDIS_HOT_SKUS = []            # shop.Product ids to shard
+
+STOREFRONT_SYNC_DEBOUNCE = 5         # seconds to coalesce ledger changes before syncing shop.Product.stock
+LOW_STOCK_DIGEST_INTERVAL = 15 * 60  # at most one low-stock digest email per window (shop.stock_alerts)
+STOCK_CHECKPOINT_LAG = 5 * 60        # non-PostgreSQL: checkpoints only cover ledger rows older than this
+
+# Periodic tasks (run `celery -A myshop beat` next to the workers)
+CELERY_BEAT_SCHEDULE = {
+    "release-expired-reservations": {
+        "task": "orders.tasks.release_expired_reservations",
+        "schedule": 5 * 60,
+    },
+    "process-pending-stripe-events": {
+        "task": "payment.tasks.process_pending_stripe_events",
+        "schedule": 60,
+    },
+    "trim-copurchase-graph": {
+        "task": "shop.tasks.trim_copurchase_graph",
+        "schedule": 60 * 60,
+    },
+}
@@ -22,6 +22,7 @@ from accounts import views_admin as accounts_admin
 from orders import views_admin as orders_admin
 from shop import views_admin as shop_admin
 from support import views_admin as support_admin
+from payment import views_admin as payment_admin
 
 # Public order views (detail + items + last)
 from orders.views_public import (
@@ -81,6 +82,7 @@ api_patterns = [
     # Orders
     path("api/admin/recent_orders/",             orders_admin.RecentOrders.as_view(), name="admin-recent-orders"),
     path("api/admin/orders/",                    orders_admin.OrderList.as_view(),    name="admin-orders"),
+    path("api/admin/orders/export/",             orders_admin.export_orders,          name="admin-orders-export"),
     path("api/admin/orders/<int:pk>/",           orders_admin.OrderDetail.as_view(),  name="admin-order-detail"),
     path("api/admin/orders/<int:pk>/mark_paid/", orders_admin.mark_paid,              name="admin-order-mark-paid"),
 
@@ -91,6 +93,9 @@ api_patterns = [
 
     # Enquiries
     path("api/admin/enquiries/summary/", support_admin.enquiry_summary, name="admin-enquiry-summary"),
+
+    # Payments
+    path("api/admin/stripe_stats/", payment_admin.stripe_stats, name="admin-stripe-stats"),
 ]
 
 # Start with API + site root
@@ -1,15 +1,12 @@
 # orders/admin.py
-import csv
-from io import StringIO
-from datetime import datetime
-
-from django.http import HttpResponse
 from django.contrib import admin, messages
 from django.urls import reverse, NoReverseMatch
 from django.utils.safestring import mark_safe
-from django.utils import timezone
 
+from .exports import streaming_export_response
 from .models import Order, OrderItem
+from .reservations import commit_order
+from .rollups import record_paid_order
 
 
 class OrderItemInline(admin.TabularInline):
@@ -48,32 +45,22 @@ def order_pdf(obj: Order):
 
 @admin.action(description="Export selected to CSV")
 def export_to_csv(modeladmin, request, queryset):
-    opts = modeladmin.model._meta
-    fields = [f for f in opts.get_fields() if not f.many_to_many and not f.one_to_many]
-
-    buff = StringIO()
-    writer = csv.writer(buff)
-    writer.writerow([f.verbose_name for f in fields])
+    return streaming_export_response(queryset, "csv", f"{modeladmin.model._meta.model_name}_export")
 
-    for obj in queryset:
-        row = []
-        for f in fields:
-            value = f.value_from_object(obj)
-            if isinstance(value, datetime):
-                if timezone.is_naive(value):
-                    value = timezone.make_aware(value, timezone.get_current_timezone())
-                value = timezone.localtime(value).strftime("%Y-%m-%d %H:%M:%S")
-            row.append(value)
-        writer.writerow(row)
 
-    response = HttpResponse(buff.getvalue(), content_type="text/csv; charset=utf-8")
-    response["Content-Disposition"] = f'attachment; filename="{opts.model_name}_export.csv"'
-    return response
+@admin.action(description="Export selected to JSONL")
+def export_to_jsonl(modeladmin, request, queryset):
+    return streaming_export_response(queryset, "jsonl", f"{modeladmin.model._meta.model_name}_export")
 
 
 @admin.action(description="Mark selected as paid")
 def mark_paid(modeladmin, request, queryset):
-    updated = queryset.update(paid=True)
+    # queryset.update() skips post_save, so feed the dashboard rollups / stock directly
+    ids = list(queryset.filter(paid=False).values_list("id", flat=True))
+    updated = Order.objects.filter(id__in=ids).update(paid=True)
+    for order_id in ids:
+        record_paid_order(order_id)
+        commit_order(order_id)
     modeladmin.message_user(request, f"{updated} order(s) marked as paid.", level=messages.SUCCESS)
 
 
@@ -90,8 +77,9 @@ class OrderAdmin(admin.ModelAdmin):
     search_fields = ["id", "first_name", "last_name", "email", "address", "city", "postal_code"]
     date_hierarchy = "created"
     readonly_fields = ["created", "updated"]
+    raw_id_fields = ["user"]
     inlines = [OrderItemInline]
-    actions = [export_to_csv, mark_paid]
+    actions = [export_to_csv, export_to_jsonl, mark_paid]
     list_per_page = 50
     ordering = ("-created",)
 
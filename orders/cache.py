@@ -0,0 +1,96 @@
+# orders/cache.py
+"""
+Pre-serialized order payloads for endpoints the thank-you page polls.
+
+Paid orders are effectively immutable, so their payloads are cached under
+(order id, `updated`) together with an ETag (a hash of the payload). Every
+lookup first reads the order's `paid` and `updated` by primary key (one
+indexed row, no joins), so a hit is always the current version in every
+process, whatever the cache backend; changing an order or its items bumps
+`updated` (see invalidate_order). Unpaid orders are never cached.
+"""
+from __future__ import annotations
+
+import hashlib
+import json
+from typing import Any, Callable
+
+from django.conf import settings
+from django.core.cache import cache
+from django.utils import timezone
+
+ORDER_PAYLOAD_TIMEOUT = getattr(settings, "ORDER_PAYLOAD_CACHE_TIMEOUT", 60 * 60 * 24)
+
+
+def _payload_key(order_id, version: str, variant: str) -> str:
+    return f"orders:payload:{order_id}:{version}:{variant}"
+
+
+def _version(updated) -> str:
+    return str(int(updated.timestamp() * 1_000_000)) if updated else "0"
+
+
+def order_version(order) -> str:
+    return _version(getattr(order, "updated", None))
+
+
+def make_etag(payload) -> str:
+    raw = json.dumps(payload, sort_keys=True, separators=(",", ":"), default=str)
+    return f'"{hashlib.sha1(raw.encode()).hexdigest()[:20]}"'
+
+
+def etag_matches(request, etag: str | None) -> bool:
+    if not etag:
+        return False
+    header = request.headers.get("If-None-Match", "")
+    tags = [t.strip() for t in header.split(",") if t.strip()]
+    return "*" in tags or etag in tags
+
+
+def get_order_payload(order_id, variant: str, build: Callable[[Any], Any], queryset=None):
+    """
+    Return (payload, etag) for an order, or (None, None) if it does not exist.
+
+    Cache hit: one single-row version query and one cache read. Miss: the
+    order is loaded from `queryset` (default Order.objects) and
+    `build(order)` is stored if the order is paid.
+    """
+    from .models import Order
+
+    current = Order.objects.filter(pk=order_id).values_list("paid", "updated").first()
+    if current is None:
+        return None, None
+    paid, updated = current
+    if paid:
+        hit = cache.get(_payload_key(order_id, _version(updated), variant))
+        if hit is not None:
+            etag, payload = hit
+            return payload, etag
+
+    if queryset is None:
+        queryset = Order.objects.all()
+    order = queryset.filter(pk=order_id).first()
+    if order is None:
+        return None, None
+
+    payload = build(order)
+    etag = make_etag(payload)
+    if order.paid:
+        cache.set(_payload_key(order.pk, order_version(order), variant), (etag, payload), ORDER_PAYLOAD_TIMEOUT)
+    return payload, etag
+
+
+def prime_order(order, builders: dict[str, Callable[[Any], Any]]) -> None:
+    """Build and store several variants at once (called on the paid transition)."""
+    version = order_version(order)
+    values = {}
+    for variant, build in builders.items():
+        payload = build(order)
+        values[_payload_key(order.pk, version, variant)] = (make_etag(payload), payload)
+    cache.set_many(values, ORDER_PAYLOAD_TIMEOUT)
+
+
+def invalidate_order(order_id) -> None:
+    """Bump a paid order's `updated` so no process serves its cached payloads again (they expire on their own)."""
+    from .models import Order
+    Order.objects.filter(pk=order_id, paid=True).update(updated=timezone.now())
@@ -0,0 +1,115 @@
+# orders/idempotency.py
+"""
+Idempotent order creation.
+
+Each checkout submit is reduced to a key:
+  - the client's `Idempotency-Key` header (scoped to user / session), or
+  - a fingerprint of session + cart lines + coupon + submitted form fields.
+
+The key is claimed with a unique INSERT inside a savepoint. A repeat
+submission finds the row in one indexed lookup and gets the original order
+back; a concurrent duplicate blocks on the unique index until the first
+transaction commits, then replays it. Header keys live for
+ORDER_IDEMPOTENCY_TTL seconds, fingerprints for ORDER_CART_DEDUP_TTL and
+only while the original order is unpaid (the same cart may be bought again).
+"""
+from __future__ import annotations
+
+import hashlib
+import json
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+
+from .models import OrderIdempotencyKey
+
+HEADER_TTL = getattr(settings, "ORDER_IDEMPOTENCY_TTL", 60 * 60 * 24)
+CART_TTL = getattr(settings, "ORDER_CART_DEDUP_TTL", 60 * 10)
+
+
+class IdempotencyConflict(Exception):
+    """Same key is being processed by a request that has not finished."""
+
+
+def _digest(*parts) -> str:
+    raw = json.dumps(parts, sort_keys=True, separators=(",", ":"), default=str)
+    return hashlib.sha256(raw.encode()).hexdigest()
+
+
+def _scope(request) -> str:
+    if request.user.is_authenticated:
+        return f"user:{request.user.pk}"
+    if not request.session.session_key:
+        request.session.save()
+    return f"session:{request.session.session_key}"
+
+
+def checkout_key(request, cart, fields: dict) -> tuple[str, int, bool]:
+    """
+    Return (key, ttl_seconds, from_header). `fields` are the submitted
+    order fields; they are part of the fingerprint so an edited form is a
+    new submission.
+    """
+    header = (request.headers.get("Idempotency-Key") or "").strip()
+    if header:
+        return _digest("hdr", _scope(request), header), HEADER_TTL, True
+    lines = sorted(
+        (str(pid), str(item.get("price")), int(item.get("quantity", 0)))
+        for pid, item in cart.cart.items()
+    )
+    return _digest("cart", _scope(request), lines, cart.coupon_id, fields), CART_TTL, False
+
+
+def find_replay(key: str, from_header: bool = True) -> OrderIdempotencyKey | None:
+    """Live, completed record for `key` (one indexed lookup), else None."""
+    rec = (
+        OrderIdempotencyKey.objects
+        .select_related("order")
+        .filter(key=key, expires_at__gt=timezone.now(), order__isnull=False)
+        .first()
+    )
+    if rec is None or (not from_header and rec.order.paid):
+        return None
+    return rec
+
+
+def claim(key: str, ttl: int, from_header: bool = True):
+    """
+    Claim `key` for a new order. Returns (record, None) when the caller
+    should create the order, or (None, replay_record) for a duplicate.
+    Must run inside the transaction that creates the order.
+    """
+    now = timezone.now()
+    expires_at = now + timedelta(seconds=ttl)
+    try:
+        with transaction.atomic():
+            return OrderIdempotencyKey.objects.create(key=key, expires_at=expires_at), None
+    except IntegrityError:
+        pass
+
+    rec = OrderIdempotencyKey.objects.select_related("order").select_for_update().get(key=key)
+    live = rec.expires_at > now and rec.order_id is not None and (from_header or not rec.order.paid)
+    if live:
+        return None, rec
+    if rec.order_id is None and rec.expires_at > now:
+        raise IdempotencyConflict(key)
+    # expired / reusable: take it over
+    rec.order = None
+    rec.response = None
+    rec.created_at = now
+    rec.expires_at = expires_at
+    rec.save(update_fields=["order", "response", "created_at", "expires_at"])
+    return rec, None
+
+
+def complete(rec: OrderIdempotencyKey, order, response=None) -> None:
+    rec.order = order
+    rec.response = response
+    rec.save(update_fields=["order", "response"])
+
+
+def purge_expired() -> int:
+    deleted, _ = OrderIdempotencyKey.objects.filter(expires_at__lte=timezone.now()).delete()
+    return deleted
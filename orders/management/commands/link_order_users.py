@@ -0,0 +1,57 @@
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models.functions import Lower, Trim
+
+from orders.models import Order
+
+
+class Command(BaseCommand):
+    help = "Link historical guest orders to user accounts by normalized (lower-cased) e-mail."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=1000, help="Users per batch.")
+        parser.add_argument("--dry-run", action="store_true")
+
+    def handle(self, *args, **opts):
+        batch_size = opts["batch_size"]
+        dry_run = opts["dry_run"]
+        self.verbosity = opts["verbosity"]
+        User = get_user_model()
+
+        users = (
+            User.objects.exclude(email__isnull=True).exclude(email="")
+            .annotate(email_lower=Lower(Trim("email")))
+            .values_list("id", "email_lower")
+            .order_by("id")
+        )
+
+        linked = 0
+        batch: dict[str, int] = {}
+        for uid, email in users.iterator(chunk_size=batch_size):
+            batch[email] = uid
+            if len(batch) >= batch_size:
+                linked += self._link(batch, dry_run)
+                batch = {}
+        if batch:
+            linked += self._link(batch, dry_run)
+
+        verb = "Would link" if dry_run else "Linked"
+        self.stdout.write(self.style.SUCCESS(f"{verb} {linked} order(s) to users."))
+
+    def _link(self, by_email: dict[str, int], dry_run: bool) -> int:
+        # keys come from the same SQL expression: the database folds case
+        # (SQLite's lower() is ASCII-only), never Python's str.lower()
+        rows = (
+            Order.objects.filter(user__isnull=True)
+            .annotate(email_lower=Lower(Trim("email")))
+            .filter(email_lower__in=list(by_email))
+            .values_list("id", "email_lower")
+        )
+        updates = [Order(pk=oid, user_id=by_email[email]) for oid, email in rows]
+        if updates and not dry_run:
+            with transaction.atomic():
+                Order.objects.bulk_update(updates, ["user"], batch_size=500)
+        if self.verbosity > 1:
+            self.stdout.write(f"  batch: {len(by_email)} users, {len(updates)} orders")
+        return len(updates)
@@ -0,0 +1,33 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from django.utils.dateparse import parse_date
+
+from orders.rollups import rebuild_rollups
+
+
+class Command(BaseCommand):
+    help = "Rebuild DailySales / DailyProductSales rollups from paid orders (backfill)."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--days", type=int, default=0, help="Only rebuild the last N days (0 = full history).")
+        parser.add_argument("--since", help="First day to rebuild (YYYY-MM-DD).")
+        parser.add_argument("--until", help="Last day to rebuild, inclusive (YYYY-MM-DD).")
+        parser.add_argument("--batch-size", type=int, default=2000)
+
+    def handle(self, *args, **opts):
+        since = until = None
+        if opts["days"]:
+            since = timezone.localdate() - timedelta(days=opts["days"])
+        if opts["since"]:
+            since = parse_date(opts["since"])
+            if since is None:
+                raise CommandError("--since must be YYYY-MM-DD")
+        if opts["until"]:
+            until = parse_date(opts["until"])
+            if until is None:
+                raise CommandError("--until must be YYYY-MM-DD")
+
+        n = rebuild_rollups(since=since, until=until, batch_size=opts["batch_size"])
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt sales rollups for {n} day(s)."))
@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+
+from orders.reservations import release_expired, release_orphaned_holds
+
+
+class Command(BaseCommand):
+    help = "Release expired stock reservations of unpaid orders (same as the celery task)."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=500)
+
+    def handle(self, *args, **opts):
+        orphans = release_orphaned_holds()
+        released = release_expired(batch_size=opts["batch_size"])
+        self.stdout.write(self.style.SUCCESS(
+            f"Released {released} reservation(s) and {orphans} rolled-back Redis hold(s)."
+        ))
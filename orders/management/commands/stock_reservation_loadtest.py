@@ -0,0 +1,132 @@
+import statistics
+import threading
+import time
+import uuid
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.test.utils import override_settings
+
+from orders.models import Order, StockReservation
+from orders.reservations import OutOfStock, get_backend, reserve_order
+
+
+class Command(BaseCommand):
+    help = (
+        "Concurrent checkout load test for stock reservations: N workers race to "
+        "reserve one product; reports throughput/latency and verifies there is no oversell. "
+        "Run against PostgreSQL (SQLite serializes writers)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--backend", choices=["db", "redis"], default="db")
+        parser.add_argument("--stock", type=int, default=500, help="Units on hand at start.")
+        parser.add_argument("--checkouts", type=int, default=2000, help="Total checkout attempts.")
+        parser.add_argument("--workers", type=int, default=16)
+        parser.add_argument("--qty", type=int, default=1, help="Units per checkout.")
+        parser.add_argument("--shards", type=int, default=1, help="Redis counter shards for the test SKU.")
+        parser.add_argument("--keep", action="store_true", help="Keep the test product and orders.")
+
+    def handle(self, *args, **opts):
+        from shop.models import Category, Product
+
+        if opts["workers"] < 1 or opts["checkouts"] < 1:
+            raise CommandError("--workers and --checkouts must be positive")
+
+        category, _ = Category.objects.get_or_create(slug="loadtest", defaults={"name": "Load test"})
+        tag = uuid.uuid4().hex[:8]
+        product = Product.objects.create(
+            category=category, name=f"loadtest-{tag}", slug=f"loadtest-{tag}",
+            price=1, stock=opts["stock"], available=False,
+        )
+
+        with override_settings(STOCK_REDIS_HOT_SKUS=[product.pk], STOCK_REDIS_SHARDS=opts["shards"]):
+            backend = get_backend(opts["backend"])
+            if opts["backend"] == "redis":
+                backend.sync([product.pk])
+            try:
+                results = self._run(product, backend, opts)
+                self._report(product, backend, opts, results)
+            finally:
+                if not opts["keep"]:
+                    Order.objects.filter(email=f"loadtest-{tag}@example.com").delete()
+                    product.delete()
+                    if opts["backend"] == "redis":
+                        backend.client.delete(*backend.shard_keys(product.pk))
+
+    def _run(self, product, backend, opts):
+        lock = threading.Lock()
+        remaining = [opts["checkouts"]]
+        results = {"ok": 0, "out": 0, "errors": 0, "latency": []}
+        email = f"{product.name}@example.com"
+
+        def worker():
+            latencies, ok = [], {"ok": 0, "out": 0, "errors": 0}
+            try:
+                while True:
+                    with lock:
+                        if remaining[0] <= 0:
+                            break
+                        remaining[0] -= 1
+                    t0 = time.perf_counter()
+                    try:
+                        with transaction.atomic():
+                            order = Order.objects.create(
+                                first_name="Load", last_name="Test", email=email,
+                                address="-", postal_code="00000", city="-",
+                            )
+                            reserve_order(order, [(product.pk, opts["qty"])], backend=backend)
+                        ok["ok"] += 1
+                    except OutOfStock:
+                        ok["out"] += 1
+                    except Exception as exc:  # lock timeouts etc. are part of the result
+                        ok["errors"] += 1
+                        if ok["errors"] == 1:
+                            self.stderr.write(f"worker error: {exc!r}")
+                    latencies.append(time.perf_counter() - t0)
+            finally:
+                connection.close()
+                with lock:
+                    for k, v in ok.items():
+                        results[k] += v
+                    results["latency"].extend(latencies)
+
+        threads = [threading.Thread(target=worker) for _ in range(opts["workers"])]
+        t0 = time.perf_counter()
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        results["elapsed"] = time.perf_counter() - t0
+        return results
+
+    def _report(self, product, backend, opts, results):
+        reserved = results["ok"] * opts["qty"]
+        held = sum(
+            StockReservation.objects.filter(product=product, status=StockReservation.HELD)
+            .values_list("quantity", flat=True)
+        )
+        product.refresh_from_db(fields=["stock"])
+        if opts["backend"] == "redis":
+            available = sum(int(v or 0) for v in backend.client.mget(backend.shard_keys(product.pk)))
+        else:
+            available = product.stock
+
+        lat = sorted(results["latency"]) or [0.0]
+        p99 = lat[min(len(lat) - 1, int(len(lat) * 0.99))]
+        attempts = results["ok"] + results["out"] + results["errors"]
+        self.stdout.write(
+            f"backend={opts['backend']} shards={opts['shards']} workers={opts['workers']} "
+            f"attempts={attempts} in {results['elapsed']:.2f}s "
+            f"({attempts / max(results['elapsed'], 1e-9):.0f}/s)"
+        )
+        self.stdout.write(
+            f"reserved={results['ok']} out_of_stock={results['out']} errors={results['errors']} "
+            f"p50={statistics.median(lat) * 1000:.1f}ms p99={p99 * 1000:.1f}ms"
+        )
+        self.stdout.write(f"stock={opts['stock']} reserved_units={reserved} held_rows={held} available={available}")
+
+        oversold = reserved > opts["stock"] or held != reserved or available != opts["stock"] - reserved
+        if oversold:
+            raise CommandError("Inconsistent stock: oversell or lost units detected.")
+        self.stdout.write(self.style.SUCCESS("OK: no oversell, counters consistent."))
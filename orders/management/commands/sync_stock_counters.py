@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+
+from orders.reservations import get_backend
+
+
+class Command(BaseCommand):
+    help = (
+        "Seed / reconcile the Redis stock counters (STOCK_RESERVATION_BACKEND='redis') "
+        "from Product.stock minus units currently held. Overwrites live counters."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("product_ids", nargs="*", type=int, help="Only these products (default: all).")
+
+    def handle(self, *args, **opts):
+        n = get_backend("redis").sync(opts["product_ids"] or None)
+        self.stdout.write(self.style.SUCCESS(f"Synced counters for {n} product(s)."))
@@ -0,0 +1,22 @@
+# Generated by Django 5.2.7 on 2026-10-19 04:04
+
+import django.db.models.functions.text
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('orders', '0005_daily_sales_rollups'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='order',
+            index=models.Index(fields=['paid', '-created', '-id'], name='order_paid_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='order',
+            index=models.Index(django.db.models.functions.text.Lower('email'), models.OrderBy(models.F('created'), descending=True), name='order_email_lower_created_idx'),
+        ),
+    ]
@@ -0,0 +1,67 @@
+# Generated by Django 5.2.7 on 2026-10-19 04:23
+
+from django.db import migrations, models
+
+
+def mark_existing_done(apps, schema_editor):
+    # events recorded before the queue existed were handled inline
+    apps.get_model("orders", "StripeEvent").objects.update(status="done")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('orders', '0009_stock_reservation'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='stripeevent',
+            name='attempts',
+            field=models.PositiveSmallIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='stripeevent',
+            name='last_error',
+            field=models.TextField(blank=True),
+        ),
+        migrations.AddField(
+            model_name='stripeevent',
+            name='object_key',
+            field=models.CharField(blank=True, max_length=255),
+        ),
+        migrations.AddField(
+            model_name='stripeevent',
+            name='payload',
+            field=models.JSONField(blank=True, default=dict),
+        ),
+        migrations.AddField(
+            model_name='stripeevent',
+            name='processed_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='stripeevent',
+            name='status',
+            field=models.CharField(choices=[('pending', 'Pending'), ('done', 'Done'), ('failed', 'Failed')], default='pending', max_length=10),
+        ),
+        migrations.AddField(
+            model_name='stripeevent',
+            name='stripe_created',
+            field=models.BigIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='stripeevent',
+            name='type',
+            field=models.CharField(blank=True, max_length=100),
+        ),
+        migrations.RunPython(mark_existing_done, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='stripeevent',
+            index=models.Index(condition=models.Q(('status', 'pending')), fields=['object_key', 'stripe_created', 'id'], name='stripeevent_object_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='stripeevent',
+            index=models.Index(fields=['status', 'created_at'], name='stripeevent_status_idx'),
+        ),
+    ]
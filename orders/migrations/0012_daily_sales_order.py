@@ -0,0 +1,40 @@
+# Generated by Django 5.2.7 on 2026-10-19 04:50
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.utils import timezone
+
+
+def mark_counted_orders(apps, schema_editor):
+    # paid orders before this migration are already in the rollups
+    Order = apps.get_model("orders", "Order")
+    DailySalesOrder = apps.get_model("orders", "DailySalesOrder")
+    batch = []
+    for pk, email, created in Order.objects.filter(paid=True).values_list("id", "email", "created").iterator():
+        batch.append(DailySalesOrder(order_id=pk, day=timezone.localdate(created), email=email))
+        if len(batch) >= 2000:
+            DailySalesOrder.objects.bulk_create(batch)
+            batch = []
+    DailySalesOrder.objects.bulk_create(batch)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('orders', '0011_checkout_session'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DailySalesOrder',
+            fields=[
+                ('order', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='+', serialize=False, to='orders.order')),
+                ('day', models.DateField()),
+                ('email', models.EmailField(max_length=254)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['day', 'email'], name='daily_sales_order_email_idx')],
+            },
+        ),
+        migrations.RunPython(mark_counted_orders, migrations.RunPython.noop),
+    ]
@@ -1,25 +1,32 @@
 from __future__ import annotations
 
-from decimal import Decimal, ROUND_HALF_UP
+from decimal import Decimal
 from django.conf import settings
 from django.core.validators import MaxValueValidator, MinValueValidator
 from django.db import models
+from django.db.models import F
+from django.db.models.functions import Lower
 from django.utils.translation import gettext_lazy as _
 from coupons.models import Coupon
 
 
-# ------- Config (move to settings if you prefer) -------
-FREE_SHIP_THRESHOLD = Decimal("50.00")
-TAX_ON_SHIPPING = False
-STATE_TAX_RATES = {
-    "NY": Decimal("0.08875"),
-    "NJ": Decimal("0.06625"),
-    "CA": Decimal("0.0725"),
-}
-DEFAULT_TAX_RATE = Decimal("0.00")
+from shipping.utils import quote_shipping
+from .tax import TaxQuote, get_tax_table
+
+
+# ------- Config -------
+# Shipping prices come from ShippingRule (shipping.utils, with a fallback table);
+# tax rates from settings.TAX_RATES / TAX_JURISDICTION_OVERRIDES (orders.tax).
 
 
 class Order(models.Model):
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        related_name='orders',
+        null=True,
+        blank=True,
+        on_delete=models.SET_NULL,
+    )
     first_name = models.CharField(_('first name'), max_length=50)
     last_name = models.CharField(_('last name'), max_length=50)
     email = models.EmailField(_('e-mail'))
@@ -59,7 +66,12 @@ class Order(models.Model):
 
     class Meta:
         ordering = ['-created']
-        indexes = [models.Index(fields=['-created'])]
+        indexes = [
+            models.Index(fields=['-created']),
+            # admin order list: keyset pagination + filters (orders.views_admin.OrderList)
+            models.Index(fields=['paid', '-created', '-id'], name='order_paid_created_idx'),
+            models.Index(Lower('email'), F('created').desc(), name='order_email_lower_created_idx'),
+        ]
 
     def __str__(self):
         return f'Order {self.id}'
@@ -95,32 +107,44 @@ class Order(models.Model):
         return self.get_total_cost().quantize(Decimal("0.01"))
 
     def compute_shipping(self, merchandise_total: Decimal) -> Decimal:
-        method = (self.shipping_method or "standard").lower()
-        if method == "standard":
-            return Decimal("0.00") if merchandise_total >= FREE_SHIP_THRESHOLD else Decimal("7.95")
-        if method == "expedited":
-            return Decimal("19.95")
-        if method == "overnight":
-            return Decimal("34.95")
-        return Decimal("0.00")
+        return quote_shipping(
+            country=self.ship_country or "US",
+            state=self.ship_state or "",
+            postal_code=self.postal_code or "",
+            subtotal=merchandise_total,
+            method=(self.shipping_method or "standard").lower(),
+        )
+
+    def tax_basket(self, merchandise_total: Decimal, shipping: Decimal) -> dict:
+        """Input for orders.tax quote_many (bulk repricing / reports)."""
+        return {
+            "merchandise": merchandise_total,
+            "shipping": shipping,
+            "country": self.ship_country or "US",
+            "state": self.ship_state or "",
+            "postal_code": self.postal_code or "",
+        }
+
+    def quote_tax(self, merchandise_total: Decimal, shipping: Decimal) -> TaxQuote:
+        return get_tax_table().quote(
+            merchandise_total, shipping,
+            country=self.ship_country or "US",
+            state=self.ship_state or "",
+            postal_code=self.postal_code or "",
+        )
 
     def effective_tax_rate(self) -> Decimal:
-        if (self.ship_country or "").upper() != "US":
-            return DEFAULT_TAX_RATE
-        return STATE_TAX_RATES.get((self.ship_state or "").upper(), DEFAULT_TAX_RATE)
+        return get_tax_table().rate_for(self.ship_country or "US", self.ship_state or "", self.postal_code or "")
 
     def compute_tax(self, merchandise_total: Decimal, shipping: Decimal) -> Decimal:
-        rate = self.effective_tax_rate()
-        base = merchandise_total + (shipping if TAX_ON_SHIPPING else Decimal("0.00"))
-        return (base * rate).quantize(Decimal("0.01"), rounding=ROUND_HALF_UP)
+        return self.quote_tax(merchandise_total, shipping).amount
 
     def compute_grand_total(self) -> dict:
         subtotal = self.merchandise_subtotal()
         discount_abs = self.get_discount().quantize(Decimal("0.01"))
         merch_after = (subtotal - discount_abs).quantize(Decimal("0.01"))
         shipping = self.compute_shipping(merch_after)
-        tax_r = self.effective_tax_rate()
-        tax_amt = self.compute_tax(merch_after, shipping)
+        tax_r, tax_amt = self.quote_tax(merch_after, shipping)
         grand = (merch_after + shipping + tax_amt).quantize(Decimal("0.01"))
         return {
             "subtotal_amount": subtotal,
@@ -163,8 +187,160 @@ class OrderItem(models.Model):
 
 # --- Webhook idempotency: store processed Stripe event IDs ---
 class StripeEvent(models.Model):
+    """
+    One row per received Stripe webhook event. The unique event_id makes
+    ingestion idempotent; payment.stripe_events processes PENDING rows in
+    Stripe `created` order per object_key.
+    """
+    PENDING = "pending"
+    DONE = "done"
+    FAILED = "failed"
+    STATUS_CHOICES = [(PENDING, "Pending"), (DONE, "Done"), (FAILED, "Failed")]
+
     event_id = models.CharField(max_length=255, unique=True)
+    type = models.CharField(max_length=100, blank=True)
+    object_key = models.CharField(max_length=255, blank=True)  # e.g. "order:42"
+    payload = models.JSONField(default=dict, blank=True)
+    stripe_created = models.BigIntegerField(default=0)  # event.created (unix seconds)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=PENDING)
+    attempts = models.PositiveSmallIntegerField(default=0)
+    last_error = models.TextField(blank=True)
+    next_attempt_at = models.DateTimeField(blank=True, null=True)  # set while a failed event backs off
     created_at = models.DateTimeField(auto_now_add=True)
+    processed_at = models.DateTimeField(blank=True, null=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["object_key", "stripe_created", "id"], name="stripeevent_object_idx",
+                         condition=models.Q(status="pending")),
+            models.Index(fields=["status", "created_at"], name="stripeevent_status_idx"),
+        ]
 
     def __str__(self):
         return self.event_id
+
+
+# --- Dashboard rollups (maintained when an order transitions to paid) ---
+class DailySales(models.Model):
+    day = models.DateField(unique=True)
+    orders = models.PositiveIntegerField(default=0)
+    units = models.PositiveIntegerField(default=0)
+    customers = models.PositiveIntegerField(default=0)
+    revenue = models.DecimalField(max_digits=14, decimal_places=2, default=Decimal("0.00"))
+
+    class Meta:
+        ordering = ["-day"]
+        verbose_name_plural = "daily sales"
+
+    def __str__(self):
+        return f"{self.day}: {self.orders} orders / {self.revenue}"
+
+
+class DailyProductSales(models.Model):
+    day = models.DateField()
+    product = models.ForeignKey('shop.Product', related_name='daily_sales', on_delete=models.CASCADE)
+    units = models.PositiveIntegerField(default=0)
+    revenue = models.DecimalField(max_digits=14, decimal_places=2, default=Decimal("0.00"))
+
+    class Meta:
+        ordering = ["-day"]
+        verbose_name_plural = "daily product sales"
+        constraints = [
+            models.UniqueConstraint(fields=["day", "product"], name="uniq_daily_product_sales"),
+        ]
+
+    def __str__(self):
+        return f"{self.day}: product {self.product_id} x{self.units}"
+
+
+class DailySalesOrder(models.Model):
+    """
+    One row per order counted in the rollups: makes record_paid_order
+    idempotent and is what "returning customer that day" is checked against.
+    """
+    order = models.OneToOneField(Order, primary_key=True, related_name='+', on_delete=models.CASCADE)
+    day = models.DateField()
+    email = models.EmailField()
+
+    class Meta:
+        indexes = [models.Index(fields=["day", "email"], name="daily_sales_order_email_idx")]
+
+
+# --- Idempotent checkout (orders.idempotency) ---
+class OrderIdempotencyKey(models.Model):
+    """
+    One row per checkout submission key: a hashed Idempotency-Key header or a
+    session + cart fingerprint. Repeated submissions replay `order`/`response`.
+    """
+    key = models.CharField(max_length=64, unique=True)
+    order = models.ForeignKey(
+        Order,
+        related_name='idempotency_keys',
+        null=True,
+        blank=True,
+        on_delete=models.CASCADE,
+    )
+    response = models.JSONField(null=True, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    expires_at = models.DateTimeField(db_index=True)
+
+    def __str__(self):
+        return f"{self.key[:12]}… -> order {self.order_id}"
+
+
+# --- Stock reservations (orders.reservations) ---
+class StockReservation(models.Model):
+    """
+    Units of a product held for an order between checkout and payment.
+    HELD -> COMMITTED when the order is paid, HELD -> RELEASED on expiry.
+    """
+    HELD = "held"
+    COMMITTED = "committed"
+    RELEASED = "released"
+    STATUSES = [(HELD, "Held"), (COMMITTED, "Committed"), (RELEASED, "Released")]
+
+    order = models.ForeignKey(Order, related_name='reservations', on_delete=models.CASCADE)
+    product = models.ForeignKey('shop.Product', related_name='reservations', on_delete=models.CASCADE)
+    quantity = models.PositiveIntegerField()
+    status = models.CharField(max_length=10, choices=STATUSES, default=HELD)
+    backend = models.CharField(max_length=8, default="db")
+    created_at = models.DateTimeField(auto_now_add=True)
+    expires_at = models.DateTimeField()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['status', 'expires_at'], name='reservation_status_exp_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.quantity} x product {self.product_id} for order {self.order_id} ({self.status})"
+
+
+# --- Stripe Checkout sessions (payment.checkout_sessions) ---
+class CheckoutSession(models.Model):
+    """
+    Local copy of a Stripe Checkout Session created for (order, total_cents).
+    Resume requests are answered from here; webhooks keep `status` current.
+    """
+    OPEN = "open"
+    COMPLETE = "complete"
+    EXPIRED = "expired"
+    STATUS_CHOICES = [(OPEN, "Open"), (COMPLETE, "Complete"), (EXPIRED, "Expired")]
+
+    order = models.ForeignKey(Order, related_name='checkout_sessions', on_delete=models.CASCADE)
+    total_cents = models.PositiveIntegerField()
+    session_id = models.CharField(max_length=255, unique=True)
+    url = models.URLField(max_length=2048)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=OPEN)
+    expires_at = models.DateTimeField()
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['order', 'total_cents', '-expires_at'], name='checkout_session_open_idx',
+                         condition=models.Q(status='open')),
+        ]
+
+    def __str__(self):
+        return f"{self.session_id} ({self.status}) for order {self.order_id}"
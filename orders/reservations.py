@@ -0,0 +1,369 @@
+# orders/reservations.py
+"""
+Stock reservations at checkout: reserve on order create, commit when the
+order is paid, release when the hold expires.
+
+Backends (settings.STOCK_RESERVATION_BACKEND):
+
+  "off"    (default) no enforcement: every checkout gets its hold and paid
+           orders still count down shop.Product.stock (floored at 0). Use
+           until stock is seeded (ledger sync / admin), then switch.
+  "db"     shop.Product.stock is the number of units still for sale.
+           Reserving is one conditional statement,
+               UPDATE ... SET stock = stock - n WHERE id = ? AND stock >= n
+           so there is no SELECT ... FOR UPDATE and no read-modify-write race.
+  "redis"  Available units live in Redis counters. Hot products
+           (STOCK_REDIS_HOT_SKUS) are split over STOCK_REDIS_SHARDS counters so
+           concurrent checkouts hit different keys; each shard decrement is a
+           Lua check-and-DECRBY. Product.stock is decremented when the order
+           is paid. Seed / reconcile counters with `sync_stock_counters`.
+           Decrements do not roll back with the checkout transaction, so
+           each one is also recorded as pending in Redis until it commits;
+           pending holds whose StockReservation rows never appeared are
+           given back after PENDING_GRACE seconds.
+
+Holds last STOCK_RESERVATION_TTL seconds; `release_expired_reservations`
+(command + celery task) gives expired holds of unpaid orders back, and
+orphaned Redis holds with them.
+"""
+from __future__ import annotations
+
+import json
+import logging
+import random
+import time
+from datetime import timedelta
+from typing import Iterable
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F, Sum
+from django.db.models.functions import Greatest
+from django.utils import timezone
+
+from shop.stock_alerts import stock_changed
+from .models import StockReservation
+
+logger = logging.getLogger(__name__)
+
+RESERVATION_TTL = getattr(settings, "STOCK_RESERVATION_TTL", 60 * 60)
+PENDING_GRACE = 10 * 60  # a checkout transaction still open after this is treated as rolled back
+
+
+class OutOfStock(Exception):
+    def __init__(self, product_id, requested):
+        self.product_id = product_id
+        self.requested = requested
+        super().__init__(f"Not enough stock for product {product_id} (requested {requested}).")
+
+
+def _product_model():
+    from shop.models import Product
+    return Product
+
+
+class OffBackend:
+    name = "off"
+    transactional = True
+
+    def take(self, product_id, qty: int) -> bool:
+        return True
+
+    def give_back(self, product_id, qty: int) -> None:
+        pass
+
+    def sell(self, product_id, qty: int) -> None:
+        _product_model().objects.filter(pk=product_id).update(stock=Greatest(F("stock") - qty, 0))
+
+    def force_take(self, product_id, qty: int) -> None:
+        pass
+
+
+class DbBackend:
+    name = "db"
+    transactional = True
+
+    def take(self, product_id, qty: int) -> bool:
+        return _product_model().objects.filter(pk=product_id, stock__gte=qty).update(stock=F("stock") - qty) == 1
+
+    def give_back(self, product_id, qty: int) -> None:
+        _product_model().objects.filter(pk=product_id).update(stock=F("stock") + qty)
+
+    def sell(self, product_id, qty: int) -> None:
+        """Units left the building; for this backend they already left `stock` at reserve time."""
+
+    def force_take(self, product_id, qty: int) -> None:
+        _product_model().objects.filter(pk=product_id).update(stock=Greatest(F("stock") - qty, 0))
+
+
+class RedisBackend:
+    name = "redis"
+    transactional = False
+    PENDING_KEY = "stock:pending"  # zset: json {ids, expires_at, lines} -> time taken
+
+    # KEYS[1] = shard, ARGV[1] = wanted, ARGV[2] = "1" to accept a partial take
+    TAKE = """
+local have = tonumber(redis.call('GET', KEYS[1]) or '0')
+local want = tonumber(ARGV[1])
+if have >= want then
+  redis.call('DECRBY', KEYS[1], want)
+  return want
+end
+if ARGV[2] == '1' and have > 0 then
+  redis.call('DECRBY', KEYS[1], have)
+  return have
+end
+return 0
+"""
+
+    def __init__(self, client=None):
+        self._client = client
+        self._take = None
+
+    @property
+    def client(self):
+        if self._client is None:
+            import redis
+            self._client = redis.Redis(
+                host=getattr(settings, "REDIS_HOST", "127.0.0.1"),
+                port=getattr(settings, "REDIS_PORT", 6379),
+                db=getattr(settings, "REDIS_DB", 0),
+            )
+        return self._client
+
+    def _script(self):
+        if self._take is None:
+            self._take = self.client.register_script(self.TAKE)
+        return self._take
+
+    @staticmethod
+    def shard_count(product_id) -> int:
+        hot = getattr(settings, "STOCK_REDIS_HOT_SKUS", ())
+        if int(product_id) in {int(p) for p in hot}:
+            return max(1, int(getattr(settings, "STOCK_REDIS_SHARDS", 8)))
+        return 1
+
+    def shard_keys(self, product_id) -> list[str]:
+        return [f"stock:avail:{product_id}:{i}" for i in range(self.shard_count(product_id))]
+
+    def take(self, product_id, qty: int) -> bool:
+        keys = self.shard_keys(product_id)
+        start = random.randrange(len(keys))
+        keys = keys[start:] + keys[:start]
+        script = self._script()
+        for key in keys:
+            if int(script(keys=[key], args=[qty, 0])) == qty:
+                return True
+        if len(keys) == 1:
+            return False
+        # no single shard covers it: gather across shards, undo on shortfall
+        taken, remaining = [], qty
+        for key in keys:
+            got = int(script(keys=[key], args=[remaining, 1]))
+            if got:
+                taken.append((key, got))
+                remaining -= got
+            if remaining == 0:
+                return True
+        pipe = self.client.pipeline(transaction=False)
+        for key, got in taken:
+            pipe.incrby(key, got)
+        pipe.execute()
+        return False
+
+    def give_back(self, product_id, qty: int) -> None:
+        self.client.incrby(random.choice(self.shard_keys(product_id)), qty)
+
+    def sell(self, product_id, qty: int) -> None:
+        _product_model().objects.filter(pk=product_id).update(stock=Greatest(F("stock") - qty, 0))
+
+    def force_take(self, product_id, qty: int) -> None:
+        self.give_back(product_id, -qty)
+
+    def track(self, held: list[StockReservation]) -> str:
+        """Record holds whose transaction has not committed yet; returns the token for untrack()."""
+        token = json.dumps({
+            "ids": [r.pk for r in held],
+            "expires_at": held[0].expires_at.isoformat() if held else None,  # ids alone may be reused after a rollback
+            "lines": [[r.product_id, r.quantity] for r in held],
+        })
+        self.client.zadd(self.PENDING_KEY, {token: time.time()})
+        return token
+
+    def untrack(self, token: str) -> None:
+        self.client.zrem(self.PENDING_KEY, token)
+
+    def release_orphans(self, grace: int, limit: int = 500) -> int:
+        """
+        Give back pending holds older than `grace` seconds whose reservation
+        rows do not exist (the checkout rolled back); returns how many.
+        """
+        n = 0
+        for token in self.client.zrangebyscore(self.PENDING_KEY, "-inf", time.time() - grace, start=0, num=limit):
+            if not self.client.zrem(self.PENDING_KEY, token):
+                continue  # another sweep took it
+            pending = json.loads(token)
+            if StockReservation.objects.filter(pk__in=pending["ids"], expires_at=pending["expires_at"]).exists():
+                continue  # committed; only its untrack was lost
+            for product_id, qty in pending["lines"]:
+                self.give_back(product_id, qty)
+            n += 1
+        return n
+
+    def sync(self, product_ids: Iterable | None = None) -> int:
+        """
+        Reset counters to Product.stock minus units held on this backend.
+        Run while checkout is quiet (or right after deploy); it overwrites live counters.
+        """
+        Product = _product_model()
+        qs = Product.objects.all()
+        if product_ids is not None:
+            qs = qs.filter(pk__in=list(product_ids))
+        held = dict(
+            StockReservation.objects
+            .filter(status=StockReservation.HELD, backend=self.name)
+            .values_list("product_id")
+            .annotate(n=Sum("quantity"))
+        )
+        pipe = self.client.pipeline(transaction=False)
+        n = 0
+        for pid, stock in qs.values_list("id", "stock").iterator(chunk_size=2000):
+            available = max(0, stock - held.get(pid, 0))
+            keys = self.shard_keys(pid)
+            per, extra = divmod(available, len(keys))
+            for i, key in enumerate(keys):
+                pipe.set(key, per + (1 if i < extra else 0))
+            n += 1
+        pipe.execute()
+        return n
+
+
+_backends: dict[str, object] = {}
+
+
+def get_backend(name: str | None = None):
+    name = name or getattr(settings, "STOCK_RESERVATION_BACKEND", "off")
+    if name not in _backends:
+        if name == "off":
+            _backends[name] = OffBackend()
+        elif name == "db":
+            _backends[name] = DbBackend()
+        elif name == "redis":
+            _backends[name] = RedisBackend()
+        else:
+            raise ValueError(f"Unknown STOCK_RESERVATION_BACKEND {name!r}")
+    return _backends[name]
+
+
+def _aggregate(lines) -> list[tuple[int, int]]:
+    qty: dict[int, int] = {}
+    for product_id, n in lines:
+        qty[product_id] = qty.get(product_id, 0) + int(n)
+    # fixed order so concurrent checkouts never lock rows in opposite orders
+    return sorted((pid, n) for pid, n in qty.items() if n > 0)
+
+
+def reserve_order(order, lines: Iterable[tuple[int, int]] | None = None, backend=None) -> list[StockReservation]:
+    """
+    Hold stock for `order`; `lines` are (product_id, quantity) pairs (default:
+    the order's items). Raises OutOfStock and undoes its own holds if any
+    product is short. Call inside the transaction that creates the order,
+    as the last step before commit.
+    """
+    backend = backend or get_backend()
+    if lines is None:
+        lines = order.items.values_list("product_id", "quantity")
+    lines = _aggregate(lines)
+    expires_at = timezone.now() + timedelta(seconds=RESERVATION_TTL)
+
+    taken = []
+    try:
+        with transaction.atomic():
+            for product_id, qty in lines:
+                if not backend.take(product_id, qty):
+                    raise OutOfStock(product_id, qty)
+                taken.append((product_id, qty))
+            held = StockReservation.objects.bulk_create([
+                StockReservation(order=order, product_id=pid, quantity=qty,
+                                 backend=backend.name, expires_at=expires_at)
+                for pid, qty in lines
+            ])
+            if backend.transactional:
+                stock_changed()
+            else:
+                token = backend.track(held)
+                transaction.on_commit(lambda: backend.untrack(token), robust=True)
+            return held
+    except Exception:
+        if not backend.transactional:
+            for product_id, qty in taken:
+                backend.give_back(product_id, qty)
+        raise
+
+
+def commit_order(order_id) -> int:
+    """
+    Order paid: held units become sold (re-taking holds that already
+    expired) and SALE rows are posted to the stock ledger for linked products.
+    """
+    from inventory.storefront import record_order_sale
+
+    with transaction.atomic():
+        rows = list(
+            StockReservation.objects.select_for_update()
+            .filter(order_id=order_id, status__in=[StockReservation.HELD, StockReservation.RELEASED])
+        )
+        for r in rows:
+            backend = get_backend(r.backend)
+            if r.status == StockReservation.RELEASED and not backend.take(r.product_id, r.quantity):
+                logger.warning(
+                    "Order %s paid after its hold expired; product %s is short by up to %s unit(s).",
+                    order_id, r.product_id, r.quantity,
+                )
+                backend.force_take(r.product_id, r.quantity)
+            backend.sell(r.product_id, r.quantity)
+        if rows:
+            StockReservation.objects.filter(pk__in=[r.pk for r in rows]).update(status=StockReservation.COMMITTED)
+            stock_changed()
+        record_order_sale(order_id)
+    return len(rows)
+
+
+def _release(qs) -> int:
+    with transaction.atomic():
+        rows = list(qs.select_for_update(skip_locked=True))
+        for r in rows:
+            get_backend(r.backend).give_back(r.product_id, r.quantity)
+        StockReservation.objects.filter(pk__in=[r.pk for r in rows]).update(status=StockReservation.RELEASED)
+    return len(rows)
+
+
+def release_order(order_id) -> int:
+    """Give back everything still held for an (abandoned / cancelled) order."""
+    return _release(StockReservation.objects.filter(order_id=order_id, status=StockReservation.HELD))
+
+
+def release_orphaned_holds(grace: int = PENDING_GRACE) -> int:
+    """Give back Redis holds whose checkout transaction rolled back (no-op for the other backends)."""
+    backend = get_backend()
+    if not hasattr(backend, "release_orphans"):
+        return 0
+    return backend.release_orphans(grace)
+
+
+def release_expired(now=None, batch_size: int = 500) -> int:
+    """Release expired holds of unpaid orders in batches; returns the number released."""
+    now = now or timezone.now()
+    total = 0
+    while True:
+        ids = list(
+            StockReservation.objects
+            .filter(status=StockReservation.HELD, expires_at__lte=now, order__paid=False)
+            .values_list("id", flat=True)[:batch_size]
+        )
+        if not ids:
+            return total
+        released = _release(StockReservation.objects.filter(pk__in=ids, status=StockReservation.HELD))
+        total += released
+        if released == 0:
+            return total
@@ -0,0 +1,161 @@
+# orders/rollups.py
+"""
+Daily sales rollups for the admin dashboard.
+
+`record_paid_order` is applied on the unpaid -> paid transition (see
+orders.signals) and counts each order at most once (DailySalesOrder);
+`rebuild_rollups` recomputes a date range from raw Order/OrderItem rows
+for backfills and corrections.
+"""
+from __future__ import annotations
+
+from datetime import date, datetime, time, timedelta
+from decimal import Decimal
+
+from django.db import IntegrityError, transaction
+from django.db.models import Count, DecimalField, F, Sum
+from django.db.models.functions import Coalesce, TruncDate
+from django.utils import timezone
+
+from .models import DailyProductSales, DailySales, DailySalesOrder, Order, OrderItem
+
+MONEY = DecimalField(max_digits=14, decimal_places=2)
+
+
+def _day_bounds(day: date) -> tuple[datetime, datetime]:
+    tz = timezone.get_current_timezone()
+    start = timezone.make_aware(datetime.combine(day, time.min), tz)
+    return start, start + timedelta(days=1)
+
+
+def record_paid_order(order_id: int) -> bool:
+    """
+    Add one newly-paid order to the DailySales/DailyProductSales rows of its
+    day. Returns False if the order was already counted (paid twice, or the
+    on_commit hook ran twice).
+    """
+    order = Order.objects.only("id", "email", "created").get(pk=order_id)
+    day = timezone.localdate(order.created)
+
+    lines = list(
+        OrderItem.objects.filter(order_id=order_id)
+        .values("product_id")
+        .annotate(
+            units=Coalesce(Sum("quantity"), 0),
+            revenue=Coalesce(Sum(F("price") * F("quantity"), output_field=MONEY), Decimal("0.00")),
+        )
+    )
+    units = sum(line["units"] for line in lines)
+    revenue = sum((line["revenue"] for line in lines), Decimal("0.00"))
+
+    with transaction.atomic():
+        DailySales.objects.get_or_create(day=day)
+        # the day row lock serializes orders of one day, so two first orders
+        # from the same email cannot both miss each other's marker
+        DailySales.objects.select_for_update().filter(day=day).get()
+        try:
+            with transaction.atomic():
+                DailySalesOrder.objects.create(order_id=order_id, day=day, email=order.email)
+        except IntegrityError:
+            return False
+        returning = (
+            DailySalesOrder.objects.filter(day=day, email=order.email)
+            .exclude(order_id=order_id)
+            .exists()
+        )
+        DailySales.objects.filter(day=day).update(
+            orders=F("orders") + 1,
+            units=F("units") + units,
+            customers=F("customers") + (0 if returning else 1),
+            revenue=F("revenue") + revenue,
+        )
+        if lines:
+            DailyProductSales.objects.bulk_create(
+                [DailyProductSales(day=day, product_id=line["product_id"]) for line in lines],
+                ignore_conflicts=True,
+            )
+        for line in lines:
+            DailyProductSales.objects.filter(day=day, product_id=line["product_id"]).update(
+                units=F("units") + line["units"],
+                revenue=F("revenue") + line["revenue"],
+            )
+    return True
+
+
+def rebuild_rollups(since: date | None = None, until: date | None = None, batch_size: int = 2000) -> int:
+    """
+    Recompute rollups for [since, until] (inclusive, local dates) from raw orders.
+    Returns the number of DailySales rows written.
+    """
+    orders = Order.objects.filter(paid=True)
+    items = OrderItem.objects.filter(order__paid=True)
+    sales = DailySales.objects.all()
+    product_sales = DailyProductSales.objects.all()
+    markers = DailySalesOrder.objects.all()
+    if since:
+        start, _ = _day_bounds(since)
+        orders = orders.filter(created__gte=start)
+        items = items.filter(order__created__gte=start)
+        sales = sales.filter(day__gte=since)
+        product_sales = product_sales.filter(day__gte=since)
+        markers = markers.filter(day__gte=since)
+    if until:
+        _, end = _day_bounds(until)
+        orders = orders.filter(created__lt=end)
+        items = items.filter(order__created__lt=end)
+        sales = sales.filter(day__lte=until)
+        product_sales = product_sales.filter(day__lte=until)
+        markers = markers.filter(day__lte=until)
+
+    per_day = {
+        r["day"]: r
+        for r in orders.annotate(day=TruncDate("created"))
+        .values("day")
+        .annotate(orders=Count("id"), customers=Count("email", distinct=True))
+        .order_by()
+    }
+    line_rows = (
+        items.annotate(day=TruncDate("order__created"))
+        .values("day", "product_id")
+        .annotate(
+            units=Coalesce(Sum("quantity"), 0),
+            revenue=Coalesce(Sum(F("price") * F("quantity"), output_field=MONEY), Decimal("0.00")),
+        )
+        .order_by()
+    )
+
+    totals: dict[date, list] = {}
+    product_objs = []
+    for r in line_rows.iterator(chunk_size=batch_size):
+        t = totals.setdefault(r["day"], [0, Decimal("0.00")])
+        t[0] += r["units"]
+        t[1] += r["revenue"]
+        product_objs.append(DailyProductSales(
+            day=r["day"], product_id=r["product_id"], units=r["units"], revenue=r["revenue"],
+        ))
+
+    sales_objs = [
+        DailySales(
+            day=day,
+            orders=row["orders"],
+            customers=row["customers"],
+            units=totals.get(day, [0])[0],
+            revenue=totals.get(day, [0, Decimal("0.00")])[1],
+        )
+        for day, row in per_day.items()
+    ]
+
+    marker_objs = [
+        DailySalesOrder(order_id=oid, day=day, email=email)
+        for oid, day, email in orders.annotate(day=TruncDate("created")).values_list("id", "day", "email")
+        .order_by().iterator(chunk_size=batch_size)
+    ]
+
+    with transaction.atomic():
+        sales.delete()
+        product_sales.delete()
+        markers.delete()
+        DailySales.objects.bulk_create(sales_objs, batch_size=batch_size)
+        DailyProductSales.objects.bulk_create(product_objs, batch_size=batch_size)
+        DailySalesOrder.objects.bulk_create(marker_objs, batch_size=batch_size, ignore_conflicts=True)
+    return len(sales_objs)
@@ -1,12 +1,12 @@
 from __future__ import annotations
 from django.conf import settings
 from django.db import transaction
-from django.db.models.signals import pre_save, post_save
+from django.db.models.signals import pre_save, post_save, post_delete
 from django.dispatch import receiver
 from django.core.mail import EmailMultiAlternatives
 from django.template.loader import render_to_string
 
-from .models import Order
+from .models import Order, OrderItem
 
 def _money(v) -> str:
     try:
@@ -154,3 +154,47 @@ def _send_on_paid(sender, instance: Order, created: bool, **kwargs):
             )
 
     transaction.on_commit(_after_commit)
+
+# -----------------------------------------------------------
+# POST-SAVE: paid flipped False -> True => dashboard rollups
+# -----------------------------------------------------------
+@receiver(post_save, sender=Order)
+def _rollup_on_paid(sender, instance: Order, created: bool, **kwargs):
+    if not (instance.paid and not getattr(instance, "_was_paid", False)):
+        return
+    from .rollups import record_paid_order
+    order_id = instance.pk
+    transaction.on_commit(lambda: record_paid_order(order_id))
+
+# -----------------------------------------------------------
+# POST-SAVE: paid flipped False -> True => held stock is sold
+# -----------------------------------------------------------
+@receiver(post_save, sender=Order)
+def _commit_stock_on_paid(sender, instance: Order, created: bool, **kwargs):
+    if not (instance.paid and not getattr(instance, "_was_paid", False)):
+        return
+    from .reservations import commit_order
+    order_id = instance.pk
+    transaction.on_commit(lambda: commit_order(order_id))
+
+# -----------------------------------------------------------
+# Order payload cache (orders.cache): prime paid orders; an
+# order save bumps `updated`, which retires its cached payloads
+# -----------------------------------------------------------
+@receiver(post_save, sender=Order)
+def _cache_on_save(sender, instance: Order, created: bool, **kwargs):
+    from .cache import prime_order
+
+    if instance.paid:
+        def _after_commit():
+            from .views_public import PUBLIC_ORDER_BUILDERS
+            order = sender.objects.get(pk=instance.pk)
+            prime_order(order, PUBLIC_ORDER_BUILDERS)
+        transaction.on_commit(_after_commit)
+
+
+@receiver(post_save, sender=OrderItem)
+@receiver(post_delete, sender=OrderItem)
+def _cache_on_item_change(sender, instance: OrderItem, **kwargs):
+    from .cache import invalidate_order
+    invalidate_order(instance.order_id)
@@ -17,4 +17,14 @@ def order_created(order_id):
     mail_sent = send_mail(
         subject, message, 'admin@myshop.com', [order.email]
     )
-    return mail_sent
\ No newline at end of file
+    return mail_sent
+
+@shared_task
+def release_expired_reservations():
+    """
+    Periodic (celery beat): give back stock held by unpaid orders whose
+    reservation expired, and Redis holds whose checkout rolled back.
+    """
+    from .reservations import release_expired, release_orphaned_holds
+    release_orphaned_holds()
+    return release_expired()
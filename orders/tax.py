@@ -0,0 +1,141 @@
+# orders/tax.py
+"""
+Single tax engine used by every checkout path.
+
+Rates are parsed once into an immutable TaxTable:
+
+  TAX_RATES                   {"NY": Decimal("0.08875"), ...}  US state rates
+  TAX_JURISDICTION_OVERRIDES  {"US-CO": "0.08", "US-NY-100": "0.08875", "CA": "0.05"}
+  TAX_DEFAULT_RATE            rate when nothing matches (default 0)
+  TAX_ON_SHIPPING             whether shipping is taxable (default False)
+
+Override keys are COUNTRY[-STATE[-POSTAL_PREFIX]]; the most specific match
+wins (postal prefix, longest first -> state -> country -> default).
+"""
+from __future__ import annotations
+
+from dataclasses import dataclass
+from decimal import Decimal, ROUND_HALF_UP
+from functools import lru_cache
+from types import MappingProxyType
+from typing import Iterable, Mapping, NamedTuple
+
+from django.conf import settings
+from django.core.signals import setting_changed
+from django.dispatch import receiver
+
+CENT = Decimal("0.01")
+ZERO = Decimal("0.00")
+
+
+class TaxQuote(NamedTuple):
+    rate: Decimal
+    amount: Decimal
+
+
+def _dec(value) -> Decimal:
+    return value if isinstance(value, Decimal) else Decimal(str(value or "0"))
+
+
+@dataclass(frozen=True)
+class TaxTable:
+    rates: Mapping[tuple[str, str, str], Decimal]
+    default_rate: Decimal = ZERO
+    tax_on_shipping: bool = False
+    max_prefix: int = 0
+
+    def rate_for(self, country: str = "US", state: str = "", postal_code: str = "") -> Decimal:
+        country = (country or "US").upper()
+        state = (state or "").upper()
+        rates = self.rates
+        if self.max_prefix and postal_code:
+            postal = postal_code.strip().upper()
+            for n in range(min(len(postal), self.max_prefix), 0, -1):
+                rate = rates.get((country, state, postal[:n]))
+                if rate is not None:
+                    return rate
+        rate = rates.get((country, state, ""))
+        if rate is None and state:
+            rate = rates.get((country, "", ""))
+        return self.default_rate if rate is None else rate
+
+    def quote(self, merchandise, shipping=ZERO, *, country: str = "US", state: str = "",
+              postal_code: str = "") -> TaxQuote:
+        rate = self.rate_for(country, state, postal_code)
+        return self._quote(rate, merchandise, shipping)
+
+    def quote_many(self, baskets: Iterable[Mapping]) -> list[TaxQuote]:
+        """
+        Quote many baskets in one call. Each basket is a mapping with
+        `merchandise` and optional `shipping`, `country`, `state`, `postal_code`.
+        Rates are resolved once per distinct jurisdiction.
+        """
+        seen: dict[tuple, Decimal] = {}
+        out = []
+        for b in baskets:
+            key = (b.get("country") or "US", b.get("state") or "", b.get("postal_code") or "")
+            rate = seen.get(key)
+            if rate is None:
+                rate = seen[key] = self.rate_for(*key)
+            out.append(self._quote(rate, b.get("merchandise"), b.get("shipping")))
+        return out
+
+    def _quote(self, rate: Decimal, merchandise, shipping) -> TaxQuote:
+        base = _dec(merchandise)
+        if self.tax_on_shipping:
+            base += _dec(shipping)
+        if base <= 0:
+            return TaxQuote(rate, ZERO)
+        return TaxQuote(rate, (base * rate).quantize(CENT, rounding=ROUND_HALF_UP))
+
+
+def build_tax_table(state_rates: Mapping | None = None, overrides: Mapping | None = None,
+                    default_rate=ZERO, tax_on_shipping: bool = False) -> TaxTable:
+    rates: dict[tuple[str, str, str], Decimal] = {}
+    for state, rate in (state_rates or {}).items():
+        rates[("US", str(state).upper(), "")] = _dec(rate)
+    max_prefix = 0
+    for key, rate in (overrides or {}).items():
+        parts = (str(key).upper().split("-", 2) + ["", ""])[:3]
+        rates[(parts[0], parts[1], parts[2])] = _dec(rate)
+        max_prefix = max(max_prefix, len(parts[2]))
+    return TaxTable(
+        rates=MappingProxyType(rates),
+        default_rate=_dec(default_rate),
+        tax_on_shipping=bool(tax_on_shipping),
+        max_prefix=max_prefix,
+    )
+
+
+@lru_cache(maxsize=1)
+def get_tax_table() -> TaxTable:
+    return build_tax_table(
+        state_rates=getattr(settings, "TAX_RATES", {}),
+        overrides=getattr(settings, "TAX_JURISDICTION_OVERRIDES", {}),
+        default_rate=getattr(settings, "TAX_DEFAULT_RATE", ZERO),
+        tax_on_shipping=getattr(settings, "TAX_ON_SHIPPING", False),
+    )
+
+
+def reload_tax_table() -> None:
+    get_tax_table.cache_clear()
+
+
+@receiver(setting_changed)
+def _reload_on_setting_changed(sender, setting, **kwargs):
+    if setting.startswith("TAX_"):
+        reload_tax_table()
+
+
+# ---- convenience wrappers ----
+def tax_rate(country: str = "US", state: str = "", postal_code: str = "") -> Decimal:
+    return get_tax_table().rate_for(country, state, postal_code)
+
+
+def quote_tax(merchandise, shipping=ZERO, *, country: str = "US", state: str = "",
+              postal_code: str = "") -> TaxQuote:
+    return get_tax_table().quote(merchandise, shipping, country=country, state=state, postal_code=postal_code)
+
+
+def quote_taxes(baskets: Iterable[Mapping]) -> list[TaxQuote]:
+    return get_tax_table().quote_many(baskets)
@@ -13,4 +13,8 @@ urlpatterns = [
     # NEW: price the order after shipping address/method are entered
     # POST JSON -> views.price_order
     path("api/checkout/price/<int:order_id>/", views.price_order, name="checkout-price"),
+
+    # read-only: shipping + tax + total for every method in one call
+    # POST JSON -> views.quote_order
+    path("api/checkout/quote/", views.quote_order, name="checkout-quote"),
 ]
@@ -5,15 +5,19 @@ from cart.cart import Cart
 from django.shortcuts import get_object_or_404, redirect, render
 from .forms import OrderCreateForm
 from .models import Order, OrderItem
-from django.http import HttpResponse, JsonResponse, HttpResponseBadRequest
+from django.http import Http404, HttpResponse, JsonResponse, HttpResponseBadRequest
 from django.template.loader import render_to_string
 
 from .tasks import order_created
+from .reservations import OutOfStock, reserve_order
+from .idempotency import IdempotencyConflict, checkout_key, claim, complete, find_replay
+from .tax import quote_tax, quote_taxes
+from shipping.utils import quote_all_methods, quote_shipping
 from django.contrib.admin.views.decorators import staff_member_required
 
 # NEW: only needed if your Order model doesn't have update_totals()
-from decimal import Decimal, ROUND_HALF_UP
-from django.conf import settings
+from decimal import Decimal
+from django.db import transaction
 from django.views.decorators.http import require_POST
 from django.views.decorators.csrf import csrf_exempt
 
@@ -32,17 +36,11 @@ def _state_from_address(addr: dict) -> str:
     return str(st).strip().upper()[:2]
 
 def _fallback_shipping(method: str, merchandise_after: Decimal) -> Decimal:
-    # Replace with your shipping module if available
-    if method == "express":
-        return Decimal("14.00")
-    if merchandise_after >= Decimal("100.00"):
-        return Decimal("0.00")
-    return Decimal("6.00")
+    return quote_shipping(method=method, subtotal=merchandise_after)
 
 def _fallback_tax(country: str, state: str, taxable_base: Decimal, shipping: Decimal) -> Decimal:
-    # Adjust whether shipping is taxable for your business; here: goods only
-    rate = _to_dec(getattr(settings, "TAX_RATES", {}).get(state, Decimal("0.00")))
-    return (taxable_base * rate).quantize(Decimal("0.01"), rounding=ROUND_HALF_UP)
+    # Same engine as everywhere else (settings.TAX_ON_SHIPPING decides whether shipping is taxable)
+    return quote_tax(taxable_base, shipping, country=country, state=state).amount
 
 
 def order_create(request):
@@ -51,63 +49,114 @@ def order_create(request):
     if request.method == 'POST':
         form = OrderCreateForm(request.POST)
         if form.is_valid():
-            order = form.save(commit=False)
-
-            # --- coupon/discount (existing) ---
-            if cart.coupon:
-                order.coupon = cart.coupon
-                order.discount = cart.coupon.discount  # % value
-
-            # --- capture shipping inputs if present ---
-            order.shipping_method = (request.POST.get('shipping_method') or 'standard').lower()
-            order.ship_state = (request.POST.get('state') or '').upper()
-            order.ship_country = (request.POST.get('country') or 'US').upper()
-
-            order.save()
-
-            # create items (existing)
-            for item in cart:
-                OrderItem.objects.create(
-                    order=order,
-                    product=item['product'],
-                    price=item['price'],
-                    quantity=item['quantity']
-                )
-
-            # --- compute & persist authoritative amounts for Stripe/email/thank-you ---
-            if hasattr(order, 'update_totals'):
-                order.update_totals(save=True)
-            else:
-                subtotal_amount = order.get_total_cost_before_discount().quantize(Decimal('0.01'))
-                discount_amount = order.get_discount().quantize(Decimal('0.01'))
-                merchandise_after = (subtotal_amount - discount_amount).quantize(Decimal('0.01'))
-
-                # SHIPPING
-                if compute_shipping:
-                    shipping_amount = compute_shipping(order.shipping_method, merchandise_after)
-                else:
-                    shipping_amount = _fallback_shipping(order.shipping_method, merchandise_after)
-                shipping_amount = _to_dec(shipping_amount)
+            # --- idempotency: double clicks / retries replay the original order ---
+            if len(cart) == 0 and request.session.get('order_id'):
+                # cart was already turned into an order (resubmit after the redirect)
+                return redirect('payment:process')
+            key, ttl, from_header = checkout_key(request, cart, {
+                **form.cleaned_data,
+                'shipping_method': request.POST.get('shipping_method') or '',
+                'state': request.POST.get('state') or '',
+                'country': request.POST.get('country') or '',
+            })
+            replay = find_replay(key, from_header)
+            if replay is not None:
+                request.session['order_id'] = replay.order_id
+                return redirect('payment:process')
+
+            with transaction.atomic():
+                try:
+                    rec, replay = claim(key, ttl, from_header)
+                except IdempotencyConflict:
+                    rec = replay = None
+                if replay is not None:
+                    request.session['order_id'] = replay.order_id
+                    return redirect('payment:process')
+                if rec is None:
+                    form.add_error(None, 'This order is already being processed.')
+                    return render(request, 'orders/order/create.html', {
+                        'cart': cart,
+                        'form': form,
+                        'current_step': 2,
+                        'steps': ['Cart', 'Shipping', 'Payment', 'Review'],
+                    })
+
+                order = form.save(commit=False)
+                if request.user.is_authenticated:
+                    order.user = request.user
+
+                # --- coupon/discount (existing) ---
+                if cart.coupon:
+                    order.coupon = cart.coupon
+                    order.discount = cart.coupon.discount  # % value
+
+                # --- capture shipping inputs if present ---
+                order.shipping_method = (request.POST.get('shipping_method') or 'standard').lower()
+                order.ship_state = (request.POST.get('state') or '').upper()
+                order.ship_country = (request.POST.get('country') or 'US').upper()
 
-                # TAX
-                if compute_tax:
-                    tax_amount = compute_tax(order.ship_country or "US", order.ship_state or "", merchandise_after, shipping_amount)
-                else:
-                    tax_amount = _fallback_tax(order.ship_country or "US", order.ship_state or "", merchandise_after, shipping_amount)
-                tax_amount = _to_dec(tax_amount)
-
-                total_amount = (merchandise_after + shipping_amount + tax_amount).quantize(Decimal('0.01'))
-
-                for attr, val in [
-                    ('subtotal_amount', subtotal_amount),
-                    ('discount_amount', discount_amount),
-                    ('shipping_amount', shipping_amount),
-                    ('tax_amount', tax_amount),
-                    ('total_amount', total_amount),
-                ]:
-                    if hasattr(order, attr):
-                        setattr(order, attr, val)
                 order.save()
+                complete(rec, order)
+
+                # create items (existing)
+                for item in cart:
+                    OrderItem.objects.create(
+                        order=order,
+                        product=item['product'],
+                        price=item['price'],
+                        quantity=item['quantity']
+                    )
+
+                # --- compute & persist authoritative amounts for Stripe/email/thank-you ---
+                if hasattr(order, 'update_totals'):
+                    order.update_totals(save=True)
+                else:
+                    subtotal_amount = order.get_total_cost_before_discount().quantize(Decimal('0.01'))
+                    discount_amount = order.get_discount().quantize(Decimal('0.01'))
+                    merchandise_after = (subtotal_amount - discount_amount).quantize(Decimal('0.01'))
+
+                    # SHIPPING
+                    if compute_shipping:
+                        shipping_amount = compute_shipping(order.shipping_method, merchandise_after)
+                    else:
+                        shipping_amount = _fallback_shipping(order.shipping_method, merchandise_after)
+                    shipping_amount = _to_dec(shipping_amount)
+
+                    # TAX
+                    if compute_tax:
+                        tax_amount = compute_tax(order.ship_country or "US", order.ship_state or "", merchandise_after, shipping_amount)
+                    else:
+                        tax_amount = _fallback_tax(order.ship_country or "US", order.ship_state or "", merchandise_after, shipping_amount)
+                    tax_amount = _to_dec(tax_amount)
+
+                    total_amount = (merchandise_after + shipping_amount + tax_amount).quantize(Decimal('0.01'))
+
+                    for attr, val in [
+                        ('subtotal_amount', subtotal_amount),
+                        ('discount_amount', discount_amount),
+                        ('shipping_amount', shipping_amount),
+                        ('tax_amount', tax_amount),
+                        ('total_amount', total_amount),
+                    ]:
+                        if hasattr(order, attr):
+                            setattr(order, attr, val)
+                    order.save()
+
+                # --- hold stock until payment (orders.reservations) ---
+                try:
+                    reserve_order(order)
+                except OutOfStock as e:
+                    transaction.set_rollback(True)
+                    form.add_error(None, f'Sorry, product #{e.product_id} no longer has enough stock.')
+                    order = None
+
+            if order is None:
+                return render(request, 'orders/order/create.html', {
+                    'cart': cart,
+                    'form': form,
+                    'current_step': 2,
+                    'steps': ['Cart', 'Shipping', 'Payment', 'Review'],
+                })
 
             # clear the cart (existing)
             cart.clear()
@@ -192,17 +241,18 @@ def price_order(request, order_id: int):
     discount_amount = _to_dec(getattr(order, "discount_amount", None) or order.get_discount())
     merchandise_after = _to_dec(subtotal_amount - discount_amount)
 
-    # shipping
-    if compute_shipping:
-        shipping_amount = _to_dec(compute_shipping(method, merchandise_after))
-    else:
-        shipping_amount = _fallback_shipping(method, merchandise_after)
-
-    # tax (goods only; adjust if shipping taxable in your region)
-    if compute_tax:
-        tax_amount = _to_dec(compute_tax(country, state, merchandise_after, shipping_amount))
-    else:
-        tax_amount = _fallback_tax(country, state, merchandise_after, shipping_amount)
+    # shipping (ShippingRule index; no query)
+    postal_code = (addr.get("postal_code") or order.postal_code or "").strip()
+    shipping_amount = _to_dec(quote_shipping(
+        country=country, state=state, postal_code=postal_code,
+        subtotal=merchandise_after, method=method,
+    ))
+
+    # tax (orders.tax engine; settings.TAX_ON_SHIPPING decides whether shipping is taxable)
+    tax_rate, tax_amount = quote_tax(
+        merchandise_after, shipping_amount,
+        country=country, state=state, postal_code=postal_code,
+    )
 
     total_amount = _to_dec(merchandise_after + shipping_amount + tax_amount)
 
@@ -211,6 +261,7 @@ def price_order(request, order_id: int):
         ('subtotal_amount', subtotal_amount),
         ('discount_amount', discount_amount),
         ('shipping_amount', shipping_amount),
+        ('tax_rate', tax_rate),
         ('tax_amount', tax_amount),
         ('total_amount', total_amount),
     ]:
@@ -227,5 +278,96 @@ def price_order(request, order_id: int):
         "tax_amount": str(tax_amount),
         "total_amount": str(total_amount),
         "shipping_method": method,
-        "tax_rate": str(getattr(settings, "TAX_RATES", {}).get(state, Decimal("0.00"))),
+        "tax_rate": str(tax_rate),
+    })
+
+
+def _session_order_or_404(request, order_id) -> Order:
+    """
+    An order the caller may see: the checkout order or last order of this
+    session, or one linked to the logged-in user (staff see all). Anything
+    else is a 404, so ids cannot be probed.
+    """
+    order = get_object_or_404(Order, id=order_id)
+    user = request.user
+    allowed = (
+        order.id in {request.session.get("order_id"), request.session.get("last_order_id")}
+        or (user.is_authenticated and (user.is_staff or order.user_id == user.id))
+    )
+    if not allowed:
+        raise Http404
+    return order
+
+
+# ---------- NEW: quote every shipping method at once (read-only) ----------
+@require_POST
+def quote_order(request):
+    """
+    POST JSON: {
+      "shipping_address": { "state": "NY", "country": "US", "postal_code": "10001" },
+      "order_id": 123        # optional; defaults to the session cart
+    }
+    Returns shipping + tax + total for every available shipping method in one
+    response, so the shipping step can render all options. Nothing is saved.
+    `order_id` must belong to this session or user; POST needs X-CSRFToken.
+    """
+    import json
+    try:
+        body = json.loads(request.body.decode("utf-8") or "{}")
+    except Exception:
+        return HttpResponseBadRequest("Invalid JSON")
+
+    addr = body.get("shipping_address") or {}
+    order_id = body.get("order_id")
+    order = None
+    if order_id not in (None, ""):
+        try:
+            order = _session_order_or_404(request, int(order_id))
+        except (TypeError, ValueError):
+            return HttpResponseBadRequest("Invalid order_id")
+
+    state = _state_from_address(addr) or (order.ship_state if order else "")
+    country = (addr.get("country") or (order.ship_country if order else "") or "US").upper()
+    postal_code = (addr.get("postal_code") or (order.postal_code if order else "") or "").strip()
+
+    if order is not None and order.subtotal_amount:
+        subtotal_amount = _to_dec(order.subtotal_amount)
+        discount_amount = _to_dec(order.discount_amount)
+    elif order is not None:
+        subtotal_amount = _to_dec(order.get_total_cost_before_discount())
+        discount_amount = _to_dec(order.get_discount())
+    else:
+        cart = Cart(request)
+        coupon = cart.coupon
+        subtotal_amount = _to_dec(cart.get_total_price())
+        discount_amount = _to_dec((Decimal(coupon.discount) / Decimal(100)) * subtotal_amount if coupon else 0)
+    merchandise_after = _to_dec(subtotal_amount - discount_amount)
+
+    shipping = quote_all_methods(
+        country=country, state=state, postal_code=postal_code, subtotal=merchandise_after,
+    )
+    taxes = quote_taxes(
+        {"merchandise": merchandise_after, "shipping": amount,
+         "country": country, "state": state, "postal_code": postal_code}
+        for amount in shipping.values()
+    )
+
+    methods = []
+    for (method, shipping_amount), (tax_rate, tax_amount) in zip(shipping.items(), taxes):
+        methods.append({
+            "shipping_method": method,
+            "shipping_amount": str(shipping_amount),
+            "tax_rate": str(tax_rate),
+            "tax_amount": str(tax_amount),
+            "total_amount": str(_to_dec(merchandise_after + shipping_amount + tax_amount)),
+        })
+
+    return JsonResponse({
+        "order_id": order.id if order else None,
+        "state": state,
+        "country": country,
+        "subtotal_amount": str(subtotal_amount),
+        "discount_amount": str(discount_amount),
+        "merchandise_after": str(merchandise_after),
+        "methods": methods,
     })
@@ -1,43 +1,63 @@
 # orders/views_admin.py
+import json
 from decimal import Decimal
-from datetime import timedelta
+from datetime import datetime, time, timedelta
 
-from django.db.models import Sum, F, DecimalField, Count
-from django.db.models.functions import TruncDate, Coalesce
+from django.db import connection
+from django.db.models import Prefetch, Sum, DecimalField
+from django.db.models.functions import Coalesce, Lower
 from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
 
 from rest_framework.decorators import api_view, permission_classes
 from rest_framework.permissions import IsAdminUser
 from rest_framework.response import Response
 from rest_framework.generics import ListAPIView, RetrieveAPIView
-from rest_framework.pagination import PageNumberPagination
+from rest_framework.exceptions import ValidationError
+from rest_framework.pagination import CursorPagination
 from rest_framework.views import APIView
 
-from .models import Order, OrderItem
+from .exports import EXPORT_FORMATS, streaming_export_response
+from .models import DailyProductSales, DailySales, Order, OrderItem
 from .serializers_admin import OrderListSer, OrderDetailAdminSer
 
 MONEY = DecimalField(max_digits=12, decimal_places=2)
 
-def revenue_expr():
-    # If your reverse name isn't "items", use "orderitem__price" etc.
-    return Coalesce(Sum(F("items__price") * F("items__quantity"), output_field=MONEY), Decimal("0.00"))
+def _parse_bound(value, end=False):
+    """Accept a date (YYYY-MM-DD) or datetime; dates cover the whole day."""
+    if not value:
+        return None
+    dt = parse_datetime(value)
+    if dt is None:
+        d = parse_date(value)
+        if d is None:
+            raise ValueError(value)
+        dt = datetime.combine(d, time.min)
+        if end:
+            dt += timedelta(days=1)
+    if timezone.is_naive(dt):
+        dt = timezone.make_aware(dt, timezone.get_current_timezone())
+    return dt
+
+# Dashboard endpoints read the DailySales / DailyProductSales rollups only
+# (see orders.rollups); `manage.py rebuild_sales_rollups` backfills them.
 
 @api_view(["GET"])
 @permission_classes([IsAdminUser])
 def stats(request):
-    tz = timezone.get_current_timezone()
-    now = timezone.now().astimezone(tz)
-    start_today = now.replace(hour=0, minute=0, second=0, microsecond=0)
-    start_7d = start_today - timedelta(days=7)
+    today = timezone.localdate()
+    start_7d = today - timedelta(days=7)
 
-    today_qs = Order.objects.filter(created__gte=start_today, paid=True)
-    week_qs  = Order.objects.filter(created__gte=start_7d, created__lt=start_today, paid=True)
+    today_row = DailySales.objects.filter(day=today).first()
+    revenue_today = today_row.revenue if today_row else Decimal("0.00")
+    orders_today  = today_row.orders if today_row else 0
 
-    revenue_today = today_qs.aggregate(v=revenue_expr())["v"] or Decimal("0.00")
-    orders_today  = today_qs.count()
-
-    rev_7d = week_qs.aggregate(v=revenue_expr())["v"] or Decimal("0.00")
-    ord_7d = week_qs.count()
+    week = DailySales.objects.filter(day__gte=start_7d, day__lt=today).aggregate(
+        revenue=Coalesce(Sum("revenue"), Decimal("0.00"), output_field=MONEY),
+        orders=Coalesce(Sum("orders"), 0),
+    )
+    rev_7d = week["revenue"]
+    ord_7d = week["orders"]
 
     return Response({
         "revenue_today": revenue_today,
@@ -46,17 +66,13 @@ def stats(request):
         "orders_avg_7d": (ord_7d / 7) if ord_7d else 0,
         "aov_7d": (rev_7d / Decimal(ord_7d)) if ord_7d else None,
         "conv_rate_7d": None,  # needs traffic analytics to compute
-        "customers_today": today_qs.values("email").distinct().count(),
+        "customers_today": today_row.customers if today_row else 0,
     })
 
 def sales_range(days: int):
-    since = timezone.now() - timedelta(days=days)
-    qs = (Order.objects.filter(created__gte=since, paid=True)
-          .annotate(day=TruncDate("created"))
-          .values("day")
-          .annotate(revenue=revenue_expr(), orders=Count("id"))
-          .order_by("day"))
-    return [{"day": r["day"].isoformat(), "revenue": r["revenue"], "orders": r["orders"]} for r in qs]
+    since = timezone.localdate(timezone.now() - timedelta(days=days))
+    qs = DailySales.objects.filter(day__gte=since, orders__gt=0).order_by("day")
+    return [{"day": r.day.isoformat(), "revenue": r.revenue, "orders": r.orders} for r in qs]
 
 @api_view(["GET"])
 @permission_classes([IsAdminUser])
@@ -66,27 +82,84 @@ def sales_7d(request):  return Response(sales_range(7))
 @permission_classes([IsAdminUser])
 def sales_30d(request): return Response(sales_range(30))
 
-class StdPagination(PageNumberPagination):
+def estimated_count(qs) -> int:
+    """
+    Planner row estimate on PostgreSQL (EXPLAIN, no table scan);
+    other backends fall back to an exact COUNT(*).
+    """
+    qs = qs.order_by()
+    if connection.vendor != "postgresql":
+        return qs.count()
+    sql, params = qs.query.sql_with_params()
+    with connection.cursor() as cursor:
+        cursor.execute(f"EXPLAIN (FORMAT JSON) {sql}", params)
+        plan = cursor.fetchone()[0]
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    return int(plan[0]["Plan"]["Plan Rows"])
+
+class OrderCursorPagination(CursorPagination):
+    """
+    Keyset pagination on (-created, -id): no OFFSET scans and no COUNT(*)
+    unless asked for with ?count=exact or ?count=estimate.
+    """
     page_size = 20
     page_size_query_param = "page_size"
     max_page_size = 200
+    ordering = ("-created", "-id")
+
+    def paginate_queryset(self, queryset, request, view=None):
+        mode = request.query_params.get("count")
+        self.count = None
+        if mode == "exact":
+            self.count = queryset.order_by().count()
+        elif mode == "estimate":
+            self.count = estimated_count(queryset)
+        return super().paginate_queryset(queryset, request, view)
+
+    def get_paginated_response(self, data):
+        response = super().get_paginated_response(data)
+        if self.count is not None:
+            response.data["count"] = self.count
+        return response
 
 class OrderList(ListAPIView):
+    """
+    GET /api/admin/orders/?paid=&since=&until=&email=&count=exact|estimate&cursor=
+    Filters are backed by the composite indexes on Order.
+    """
     permission_classes = [IsAdminUser]
     serializer_class = OrderListSer
-    pagination_class = StdPagination
+    pagination_class = OrderCursorPagination
 
     def get_queryset(self):
-        qs = Order.objects.all().order_by("-created")
-        paid = self.request.query_params.get("paid")
+        qs = Order.objects.only(*OrderListSer.Meta.fields)
+        params = self.request.query_params
+        paid = params.get("paid")
         if paid in {"true","1","false","0"}:
             qs = qs.filter(paid=(paid in {"true","1"}))
+        try:
+            since = _parse_bound(params.get("since"))
+            until = _parse_bound(params.get("until"), end=True)
+        except ValueError as e:
+            raise ValidationError({"detail": f"Invalid date: {e}"})
+        if since:
+            qs = qs.filter(created__gte=since)
+        if until:
+            qs = qs.filter(created__lt=until)
+        email = (params.get("email") or "").strip()
+        if email:
+            qs = qs.alias(email_lower=Lower("email")).filter(email_lower=email.lower())
         return qs
 
 class OrderDetail(RetrieveAPIView):
     permission_classes = [IsAdminUser]
     serializer_class = OrderDetailAdminSer
-    queryset = Order.objects.all()
+    queryset = (
+        Order.objects
+        .select_related("coupon")
+        .prefetch_related(Prefetch("items", queryset=OrderItem.objects.select_related("product")))
+    )
 
 @api_view(["POST"])
 @permission_classes([IsAdminUser])
@@ -105,13 +178,13 @@ def mark_paid(request, pk: int):
 def top_products(request):
     days = int(request.query_params.get("days", 30))
     limit = int(request.query_params.get("limit", 5))
-    since = timezone.now() - timedelta(days=days)
+    since = timezone.localdate(timezone.now() - timedelta(days=days))
 
-    qs = (OrderItem.objects.filter(order__paid=True, order__created__gte=since)
+    qs = (DailyProductSales.objects.filter(day__gte=since)
           .values("product__name")
           .annotate(
-              units=Coalesce(Sum("quantity"), 0),
-              revenue=Coalesce(Sum(F("price")*F("quantity"), output_field=MONEY), Decimal("0.00"))
+              units=Coalesce(Sum("units"), 0),
+              revenue=Coalesce(Sum("revenue"), Decimal("0.00"), output_field=MONEY),
           )
           .order_by("-revenue")[:limit])
 
@@ -120,6 +193,33 @@ def top_products(request):
 class RecentOrders(APIView):
     permission_classes = [IsAdminUser]
     def get(self, request):
-        limit = int(request.query_params.get("limit", 8))
-        qs = Order.objects.all().order_by("-created")[:limit]
+        limit = min(int(request.query_params.get("limit", 8)), 100)
+        qs = Order.objects.only(*OrderListSer.Meta.fields).order_by("-created", "-id")[:limit]
         return Response(OrderListSer(qs, many=True).data)
+
+@api_view(["GET"])
+@permission_classes([IsAdminUser])
+def export_orders(request):
+    """
+    GET /api/admin/orders/export/?fmt=csv|jsonl&start=YYYY-MM-DD&end=YYYY-MM-DD&paid=true
+    Streams orders + line items; `end` is inclusive for plain dates.
+    """
+    fmt = (request.query_params.get("fmt") or "csv").lower()
+    if fmt not in EXPORT_FORMATS:
+        return Response({"detail": f"fmt must be one of {sorted(EXPORT_FORMATS)}"}, status=400)
+    try:
+        start = _parse_bound(request.query_params.get("start"))
+        end = _parse_bound(request.query_params.get("end"), end=True)
+    except ValueError as e:
+        return Response({"detail": f"Invalid date: {e}"}, status=400)
+
+    qs = Order.objects.all()
+    if start:
+        qs = qs.filter(created__gte=start)
+    if end:
+        qs = qs.filter(created__lt=end)
+    paid = request.query_params.get("paid")
+    if paid in {"true","1","false","0"}:
+        qs = qs.filter(paid=(paid in {"true","1"}))
+
+    return streaming_export_response(qs, fmt, "orders_export")
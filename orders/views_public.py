@@ -1,15 +1,17 @@
 # orders/views_public.py
 from decimal import Decimal
-from django.http import JsonResponse, Http404
+from django.http import JsonResponse, Http404, HttpResponseNotModified
 from django.views.decorators.http import require_GET
-from django.db.models import F, Value, CharField
-from django.db.models.functions import Coalesce, Cast
+from django.db.models import F, Q, Value, CharField
+from django.db.models.functions import Coalesce, Cast, Lower
 
 # DRF imports for the authenticated "my orders" endpoint
 from rest_framework.decorators import api_view, permission_classes
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
 
+from .cache import etag_matches, get_order_payload
+
 
 def D(x):
     try:
@@ -110,72 +112,71 @@ def _order_payload(order, include_contact=False):
 @permission_classes([IsAuthenticated])
 def my_orders(request):
     """
-    Return recent orders for the logged-in user.
-
-    - Prefer the FK user field if present (Order.user)
-    - Fallback to email match if no user-linked orders exist
+    Return recent orders for the logged-in user in one indexed query:
+    orders linked through Order.user, plus not-yet-linked guest orders
+    placed with the same e-mail (lower(email) index).
     """
     from .models import Order
 
     user = request.user
-    qs = Order.objects.none()
-
-    # Prefer FK match if model has a user field and requests are linked
-    if user.is_authenticated:
-        try:
-            qs = Order.objects.filter(user=user).order_by("-created")
-        except Exception:
-            qs = Order.objects.none()
-
-    # Fallback: look up by email if no FK matches
-    if not qs.exists() and getattr(user, "email", None):
-        qs = Order.objects.filter(email__iexact=user.email).order_by("-created")
-
-    qs = qs[:20]  # latest 20 orders
-
-    data = []
-    for o in qs:
-        # Compute or reuse totals in the same way as _order_payload
-        subtotal_amount = getattr(o, "subtotal_amount", None)
-        if subtotal_amount is None:
-            _, derived_subtotal = _items_payload(o.id)
-            subtotal_amount = derived_subtotal
-
-        discount_amount = getattr(o, "discount_amount", None) or D(getattr(o, "discount", 0))
-        shipping_amount = getattr(o, "shipping_amount", None) or D(0)
-        tax_amount      = getattr(o, "tax_amount", None) or D(0)
-
-        total_amount = getattr(o, "total_amount", None)
-        if total_amount is None:
-            total_amount = max(Decimal("0"), subtotal_amount - discount_amount) + shipping_amount + tax_amount
-
-        data.append({
-            "id": o.id,
-            "created": getattr(o, "created", None).isoformat() if getattr(o, "created", None) else None,
-            "total_amount": str(total_amount),
-            "status": getattr(o, "status", None)
-                      or getattr(o, "payment_status", None)
-                      or ("Paid" if getattr(o, "paid", False) else "Pending"),
-        })
+    match = Q(user=user)
+    email = (getattr(user, "email", None) or "").strip().lower()
+    if email:
+        match |= Q(user__isnull=True, email_lower=email)
+
+    qs = (
+        Order.objects
+        .alias(email_lower=Lower("email"))
+        .filter(match)
+        .order_by("-created", "-id")
+        .values("id", "created", "total_amount", "paid")[:20]  # latest 20 orders
+    )
+
+    data = [{
+        "id": o["id"],
+        "created": o["created"].isoformat() if o["created"] else None,
+        "total_amount": str(o["total_amount"]),
+        "status": "Paid" if o["paid"] else "Pending",
+    } for o in qs]
 
     return Response(data)
 
 
+PUBLIC_ORDER_BUILDERS = {
+    "public": lambda order: _order_payload(order, include_contact=False),
+    "public_full": lambda order: _order_payload(order, include_contact=True),
+    "items": lambda order: _items_payload(order.id)[0],
+}
+
+
+def _cached_order_response(request, order_id, variant, not_found=None):
+    """JsonResponse for a cached order variant, honouring If-None-Match."""
+    payload, etag = get_order_payload(order_id, variant, PUBLIC_ORDER_BUILDERS[variant])
+    if payload is None:
+        if not_found is not None:
+            return not_found
+        raise Http404
+    if etag_matches(request, etag):
+        response = HttpResponseNotModified()
+    else:
+        response = JsonResponse(payload, safe=False, status=200)
+    response["ETag"] = etag
+    response["Cache-Control"] = "private, no-cache"
+    return response
+
+
+def _detail_variant(request) -> str:
+    return "public_full" if request.GET.get("full") in {"1", "true", "yes"} else "public"
+
+
 @require_GET
 def order_detail_public(request, pk: int):
-    from .models import Order
-    try:
-        order = Order.objects.get(pk=pk)
-    except Order.DoesNotExist:
-        raise Http404
-    include_contact = request.GET.get("full") in {"1", "true", "yes"}
-    return JsonResponse(_order_payload(order, include_contact), status=200)
+    return _cached_order_response(request, pk, _detail_variant(request))
 
 
 @require_GET
 def order_items_public(request, pk: int):
-    items, _ = _items_payload(pk)
-    return JsonResponse(items, safe=False, status=200)
+    return _cached_order_response(request, pk, "items", not_found=JsonResponse([], safe=False, status=200))
 
 
 @require_GET
@@ -183,10 +184,7 @@ def last_order(request):
     oid = request.session.get("last_order_id")
     if not oid:
         return JsonResponse({"detail": "No recent order"}, status=404)
-    from .models import Order
-    try:
-        order = Order.objects.get(pk=oid)
-    except Order.DoesNotExist:
-        return JsonResponse({"detail": "Order not found"}, status=404)
-    include_contact = request.GET.get("full") in {"1", "true", "yes"}
-    return JsonResponse(_order_payload(order, include_contact), status=200)
+    return _cached_order_response(
+        request, oid, _detail_variant(request),
+        not_found=JsonResponse({"detail": "Order not found"}, status=404),
+    )
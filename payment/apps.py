@@ -1,6 +1,14 @@
 from django.apps import AppConfig
+from django.conf import settings
 
 
 class PaymentConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'payment'
+
+    def ready(self):
+        # e.g. http://127.0.0.1:12111 to run checkout against `manage.py fake_stripe`
+        api_base = getattr(settings, "STRIPE_API_BASE", "")
+        if api_base:
+            import stripe
+            stripe.api_base = api_base
@@ -0,0 +1,69 @@
+# payment/checkout_sessions.py
+"""
+Stripe Checkout sessions, remembered locally.
+
+create_stripe_session asks `open_session(order, total_cents)` first. A hit
+returns the stored URL without calling Stripe. Otherwise it creates a
+session and stores it with `record_session`. The webhook worker moves
+rows to COMPLETE / EXPIRED (checkout.session.completed / .expired). A
+row is only reused while its order is unpaid and it has more than
+RESUME_MARGIN left before Stripe expires it.
+
+Because the worker may lag, `payment_pending(order)` also looks at the
+webhook queue: a received but unprocessed "session paid" event means the
+customer already paid, so neither a stored nor a new session is handed out.
+"""
+from __future__ import annotations
+
+from datetime import datetime, timedelta, timezone as dt_timezone
+
+from django.conf import settings
+from django.utils import timezone
+
+from orders.models import CheckoutSession, StripeEvent
+
+RESUME_MARGIN = timedelta(seconds=getattr(settings, "CHECKOUT_SESSION_RESUME_MARGIN", 5 * 60))
+DEFAULT_LIFETIME = timedelta(hours=24)  # Stripe's default expires_at
+
+
+PAID_EVENT_TYPES = ("checkout.session.completed", "checkout.session.async_payment_succeeded")
+
+
+def payment_pending(order) -> bool:
+    """A paid-session webhook for `order` is stored but not yet processed."""
+    return StripeEvent.objects.filter(
+        object_key=f"order:{order.pk}", status=StripeEvent.PENDING, type__in=PAID_EVENT_TYPES,
+    ).exists()
+
+
+def open_session(order, total_cents: int) -> CheckoutSession | None:
+    return (
+        CheckoutSession.objects
+        .filter(order=order, order__paid=False, total_cents=total_cents, status=CheckoutSession.OPEN,
+                expires_at__gt=timezone.now() + RESUME_MARGIN)
+        .order_by("-expires_at")
+        .first()
+    )
+
+
+def record_session(order, total_cents: int, session) -> CheckoutSession:
+    expires = session.get("expires_at")
+    if expires:
+        expires_at = datetime.fromtimestamp(int(expires), tz=dt_timezone.utc)
+    else:
+        expires_at = timezone.now() + DEFAULT_LIFETIME
+    status = session.get("status") or CheckoutSession.OPEN
+    if status not in dict(CheckoutSession.STATUS_CHOICES):
+        status = CheckoutSession.OPEN
+    row, _ = CheckoutSession.objects.update_or_create(
+        session_id=session["id"],
+        defaults={"order": order, "total_cents": total_cents, "url": session.get("url") or "",
+                  "status": status, "expires_at": expires_at},
+    )
+    return row
+
+
+def mark_session(session_id: str, status: str) -> int:
+    return CheckoutSession.objects.filter(session_id=session_id).exclude(status=status).update(
+        status=status, updated_at=timezone.now(),
+    )
@@ -0,0 +1,289 @@
+# payment/fake_stripe.py
+"""
+A local stand-in for the parts of the Stripe API checkout uses, for
+offline load tests. Point the SDK at it with STRIPE_API_BASE (see
+payment.apps) and run `manage.py fake_stripe`.
+
+Stripe API (form-encoded, like the real one):
+  POST /v1/checkout/sessions            GET /v1/checkout/sessions/<id>
+  POST /v1/payment_intents              GET /v1/payment_intents/<id>
+  POST /v1/payment_intents/<id>/confirm
+
+Test hooks (JSON):
+  POST /_fake/checkout/sessions/<id>/complete   pay the session, deliver
+                                                checkout.session.completed
+  POST /_fake/checkout/sessions/<id>/expire     deliver checkout.session.expired
+  GET  /_fake/stats
+
+Webhooks are signed like Stripe's (Stripe-Signature: t=..,v1=HMAC-SHA256),
+so they pass stripe.Webhook.construct_event with the same secret. Latency,
+API failures, and dropped or duplicated webhooks can be injected.
+"""
+from __future__ import annotations
+
+import hashlib
+import hmac
+import json
+import random
+import re
+import secrets
+import threading
+import time
+import urllib.error
+import urllib.request
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qsl, urlsplit
+
+
+def decode_form(body: str) -> dict:
+    """Stripe's bracketed form encoding (a[b][0]=x) back into dicts and lists."""
+    root: dict = {}
+    for key, value in parse_qsl(body, keep_blank_values=True):
+        parts = re.findall(r"[^\[\]]+", key)
+        node = root
+        for part in parts[:-1]:
+            node = node.setdefault(part, {})
+        node[parts[-1]] = value
+
+    def listify(v):
+        if isinstance(v, dict):
+            v = {k: listify(x) for k, x in v.items()}
+            if v and all(k.isdigit() for k in v):
+                return [v[k] for k in sorted(v, key=int)]
+        return v
+    return listify(root)
+
+
+def sign_payload(payload: str, secret: str, timestamp: int | None = None) -> str:
+    t = int(timestamp or time.time())
+    sig = hmac.new(secret.encode(), f"{t}.{payload}".encode(), hashlib.sha256).hexdigest()
+    return f"t={t},v1={sig}"
+
+
+def _new_id(prefix: str) -> str:
+    return f"{prefix}_test_{secrets.token_hex(12)}"
+
+
+class ApiError(Exception):
+    def __init__(self, status: int, message: str, type_: str = "invalid_request_error"):
+        self.status, self.message, self.type = status, message, type_
+
+
+class FakeStripe:
+    def __init__(self, public_url: str, webhook_url: str | None = None, webhook_secret: str = "whsec_fake",
+                 latency_ms: float = 0, jitter_ms: float = 0, failure_rate: float = 0.0,
+                 webhook_delay_ms: float = 0, webhook_drop_rate: float = 0.0,
+                 webhook_duplicate_rate: float = 0.0):
+        self.public_url = public_url.rstrip("/")
+        self.webhook_url = webhook_url
+        self.webhook_secret = webhook_secret
+        self.latency_ms, self.jitter_ms, self.failure_rate = latency_ms, jitter_ms, failure_rate
+        self.webhook_delay_ms = webhook_delay_ms
+        self.webhook_drop_rate = webhook_drop_rate
+        self.webhook_duplicate_rate = webhook_duplicate_rate
+        self.sessions: dict[str, dict] = {}
+        self.intents: dict[str, dict] = {}
+        self._idempotent: dict[str, tuple[int, dict]] = {}
+        self._lock = threading.Lock()
+        self.stats = {"requests": 0, "injected_failures": 0, "webhooks_sent": 0,
+                      "webhooks_dropped": 0, "webhooks_failed": 0}
+
+    # ---- dispatch ---------------------------------------------------------
+
+    def handle(self, method: str, path: str, params: dict, headers) -> tuple[int, dict]:
+        if path.startswith("/_fake/"):
+            return self._fake_hook(method, path)
+        with self._lock:
+            self.stats["requests"] += 1
+        delay = self.latency_ms + random.uniform(-self.jitter_ms, self.jitter_ms)
+        if delay > 0:
+            time.sleep(delay / 1000)
+        if self.failure_rate and random.random() < self.failure_rate:
+            with self._lock:
+                self.stats["injected_failures"] += 1
+            raise ApiError(500, "Injected failure (fake_stripe).", "api_error")
+
+        idem = headers.get("Idempotency-Key") if method == "POST" else None
+        if idem:
+            with self._lock:
+                if idem in self._idempotent:
+                    return self._idempotent[idem]
+        result = self._route(method, path, params)
+        if idem:
+            with self._lock:
+                self._idempotent.setdefault(idem, result)
+        return result
+
+    def _route(self, method, path, params):
+        parts = path.strip("/").split("/")
+        if parts[:3] == ["v1", "checkout", "sessions"]:
+            if method == "POST" and len(parts) == 3:
+                return 200, self.create_session(params)
+            if method == "GET" and len(parts) == 4:
+                return 200, self._get(self.sessions, parts[3], "checkout.session")
+        if parts[:2] == ["v1", "payment_intents"]:
+            if method == "POST" and len(parts) == 2:
+                return 200, self.create_intent(params)
+            if method == "GET" and len(parts) == 3:
+                return 200, self._get(self.intents, parts[2], "payment_intent")
+            if method == "POST" and len(parts) == 4 and parts[3] == "confirm":
+                return 200, self.confirm_intent(parts[2])
+        raise ApiError(404, f"Unrecognized request URL ({method}: {path}).")
+
+    def _fake_hook(self, method, path):
+        m = re.fullmatch(r"/_fake/checkout/sessions/([^/]+)/(complete|expire)", path)
+        if method == "POST" and m:
+            action = self.complete_session if m.group(2) == "complete" else self.expire_session
+            session, webhook_status = action(m.group(1))
+            return 200, {"session": session["id"], "payment_intent": session["payment_intent"],
+                         "webhook_status": webhook_status}
+        if method == "GET" and path == "/_fake/stats":
+            with self._lock:
+                return 200, dict(self.stats, sessions=len(self.sessions), payment_intents=len(self.intents))
+        raise ApiError(404, f"Unknown fake hook {path}.")
+
+    @staticmethod
+    def _get(store, obj_id, kind):
+        try:
+            return store[obj_id]
+        except KeyError:
+            raise ApiError(404, f"No such {kind}: '{obj_id}'") from None
+
+    # ---- objects ----------------------------------------------------------
+
+    def create_session(self, params: dict) -> dict:
+        amount = 0
+        for item in params.get("line_items") or []:
+            price = item.get("price_data") or {}
+            amount += int(price.get("unit_amount") or 0) * int(item.get("quantity") or 1)
+        sid = _new_id("cs")
+        session = {
+            "id": sid, "object": "checkout.session",
+            "mode": params.get("mode", "payment"),
+            "status": "open", "payment_status": "unpaid",
+            "amount_total": amount, "currency": "usd",
+            "client_reference_id": params.get("client_reference_id"),
+            "customer_email": params.get("customer_email"),
+            "metadata": params.get("metadata") or {},
+            "payment_intent": None,
+            "success_url": params.get("success_url"), "cancel_url": params.get("cancel_url"),
+            "url": f"{self.public_url}/c/pay/{sid}",
+            "created": int(time.time()),
+            "expires_at": int(params.get("expires_at") or time.time() + 24 * 3600),
+        }
+        with self._lock:
+            self.sessions[sid] = session
+        return session
+
+    def create_intent(self, params: dict) -> dict:
+        pid = _new_id("pi")
+        intent = {
+            "id": pid, "object": "payment_intent",
+            "amount": int(params.get("amount") or 0), "currency": params.get("currency", "usd"),
+            "status": "requires_payment_method",
+            "client_secret": f"{pid}_secret_{secrets.token_hex(8)}",
+            "metadata": params.get("metadata") or {},
+            "created": int(time.time()),
+        }
+        with self._lock:
+            self.intents[pid] = intent
+        return intent
+
+    def confirm_intent(self, pid: str) -> dict:
+        intent = self._get(self.intents, pid, "payment_intent")
+        intent["status"] = "succeeded"
+        self.send_event("payment_intent.succeeded", intent)
+        return intent
+
+    def expire_session(self, sid: str) -> tuple[dict, int | None]:
+        session = self._get(self.sessions, sid, "checkout.session")
+        if session["status"] == "open":
+            session["status"] = "expired"
+        return session, self.send_event("checkout.session.expired", dict(session))
+
+    def complete_session(self, sid: str) -> tuple[dict, int | None]:
+        session = self._get(self.sessions, sid, "checkout.session")
+        if session["payment_status"] != "paid":
+            intent = self.create_intent({"amount": session["amount_total"], "metadata": session["metadata"]})
+            intent["status"] = "succeeded"
+            session.update(status="complete", payment_status="paid", payment_intent=intent["id"])
+        return session, self.send_event("checkout.session.completed", dict(session))
+
+    # ---- webhooks ---------------------------------------------------------
+
+    def send_event(self, event_type: str, obj: dict) -> int | None:
+        """Deliver a signed event; returns the receiver's HTTP status (None if dropped or no URL)."""
+        if not self.webhook_url:
+            return None
+        if self.webhook_drop_rate and random.random() < self.webhook_drop_rate:
+            with self._lock:
+                self.stats["webhooks_dropped"] += 1
+            return None
+        if self.webhook_delay_ms:
+            time.sleep(self.webhook_delay_ms / 1000)
+        event = {
+            "id": _new_id("evt"), "object": "event", "type": event_type,
+            "created": int(time.time()), "livemode": False,
+            "data": {"object": obj},
+        }
+        payload = json.dumps(event)
+        times = 2 if self.webhook_duplicate_rate and random.random() < self.webhook_duplicate_rate else 1
+        status = None
+        for _ in range(times):
+            status = self._post_webhook(payload)
+        return status
+
+    def _post_webhook(self, payload: str) -> int:
+        req = urllib.request.Request(
+            self.webhook_url, data=payload.encode(), method="POST",
+            headers={"Content-Type": "application/json",
+                     "Stripe-Signature": sign_payload(payload, self.webhook_secret)},
+        )
+        try:
+            with urllib.request.urlopen(req, timeout=30) as resp:
+                status = resp.status
+        except urllib.error.HTTPError as exc:
+            status = exc.code
+        except OSError:
+            status = 0
+        with self._lock:
+            self.stats["webhooks_sent" if 200 <= status < 300 else "webhooks_failed"] += 1
+        return status
+
+
+def make_server(fake: FakeStripe, host: str = "127.0.0.1", port: int = 12111) -> ThreadingHTTPServer:
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"  # keep-alive, like the real API
+        disable_nagle_algorithm = True
+
+        def _dispatch(self, method):
+            url = urlsplit(self.path)
+            body = self.rfile.read(int(self.headers.get("Content-Length") or 0)).decode()
+            params = decode_form(body if method == "POST" else url.query)
+            try:
+                status, data = fake.handle(method, url.path, params, self.headers)
+            except ApiError as exc:
+                status, data = exc.status, {"error": {"type": exc.type, "message": exc.message}}
+            out = json.dumps(data).encode()
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(out)))
+            self.send_header("Request-Id", _new_id("req"))
+            self.end_headers()
+            self.wfile.write(out)
+
+        def do_GET(self):
+            self._dispatch("GET")
+
+        def do_POST(self):
+            self._dispatch("POST")
+
+        def do_DELETE(self):
+            self._dispatch("DELETE")
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer((host, port), Handler)
+    server.daemon_threads = True
+    return server
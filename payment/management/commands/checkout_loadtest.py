@@ -0,0 +1,154 @@
+import json
+import statistics
+import threading
+import time
+import urllib.error
+import urllib.request
+from collections import defaultdict
+from http.cookies import SimpleCookie
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+
+from orders.models import Order
+
+STAGES = ["cart", "order", "session", "webhook", "paid"]
+
+
+class StageError(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = (
+        "End-to-end checkout load test: cart -> order -> Stripe session -> webhook (-> paid), "
+        "against a running site whose STRIPE_API_BASE points at `manage.py fake_stripe`. "
+        "Reports p50/p99 per stage."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--base-url", default="http://127.0.0.1:8000", help="The site under test.")
+        parser.add_argument("--stripe-url", default="http://127.0.0.1:12111", help="The fake Stripe server.")
+        parser.add_argument("--product", type=int, help="shop.Product id to buy (default: first available in stock).")
+        parser.add_argument("--quantity", type=int, default=1)
+        parser.add_argument("--checkouts", type=int, default=100)
+        parser.add_argument("--workers", type=int, default=8)
+        parser.add_argument("--wait-paid", type=float, default=0,
+                            help="Seconds to wait per order for the webhook worker to mark it paid (0 = skip).")
+
+    def handle(self, *args, **opts):
+        from shop.models import Product
+
+        if opts["workers"] < 1 or opts["checkouts"] < 1:
+            raise CommandError("--workers and --checkouts must be positive")
+        qs = Product.objects.filter(available=True, stock__gte=opts["checkouts"] * opts["quantity"])
+        if opts["product"]:
+            qs = qs.filter(pk=opts["product"])
+        product = qs.order_by("id").first()
+        if product is None:
+            raise CommandError(f"No available product with at least {opts['checkouts'] * opts['quantity']} units in stock.")
+
+        lock = threading.Lock()
+        remaining = [opts["checkouts"]]
+        timings = defaultdict(list)
+        errors = defaultdict(int)
+        first_error = {}
+
+        def worker():
+            try:
+                while True:
+                    with lock:
+                        if remaining[0] <= 0:
+                            return
+                        remaining[0] -= 1
+                        n = remaining[0]
+                    try:
+                        for stage, secs in self._checkout(product, n, opts):
+                            with lock:
+                                timings[stage].append(secs)
+                    except StageError as exc:
+                        stage, msg = exc.args
+                        with lock:
+                            errors[stage] += 1
+                            first_error.setdefault(stage, msg)
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=worker) for _ in range(opts["workers"])]
+        t0 = time.perf_counter()
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        elapsed = time.perf_counter() - t0
+
+        completed = len(timings["webhook"])
+        self.stdout.write(
+            f"product={product.pk} checkouts={opts['checkouts']} workers={opts['workers']} "
+            f"completed={completed} in {elapsed:.2f}s ({completed / max(elapsed, 1e-9):.1f} checkouts/s)"
+        )
+        for stage in STAGES:
+            lat = sorted(timings[stage])
+            if not lat and not errors[stage]:
+                continue
+            if lat:
+                p99 = lat[min(len(lat) - 1, int(len(lat) * 0.99))]
+                line = (f"{stage:8} n={len(lat):5} p50={statistics.median(lat) * 1000:8.1f}ms "
+                        f"p99={p99 * 1000:8.1f}ms max={lat[-1] * 1000:8.1f}ms")
+            else:
+                line = f"{stage:8} n=    0"
+            if errors[stage]:
+                line += f" errors={errors[stage]} (first: {first_error[stage]})"
+            self.stdout.write(line)
+
+    # ---- one virtual customer ---------------------------------------------
+
+    def _checkout(self, product, n, opts):
+        base = opts["base_url"].rstrip("/")
+        # cookies are replayed by hand: SESSION_COOKIE_DOMAIN may name the
+        # production domain, which a real cookie jar would refuse for 127.0.0.1
+        cookies = {}
+
+        def call(stage, url, payload):
+            headers = {"Content-Type": "application/json", "Accept": "application/json"}
+            if cookies and url.startswith(base):
+                headers["Cookie"] = "; ".join(f"{k}={v}" for k, v in cookies.items())
+            req = urllib.request.Request(url, data=json.dumps(payload).encode(), method="POST", headers=headers)
+            t0 = time.perf_counter()
+            try:
+                with urllib.request.urlopen(req, timeout=60) as resp:
+                    for header in resp.headers.get_all("Set-Cookie") or []:
+                        for morsel in SimpleCookie(header).values():
+                            cookies[morsel.key] = morsel.value
+                    body = json.loads(resp.read() or b"{}")
+            except urllib.error.HTTPError as exc:
+                raise StageError(stage, f"HTTP {exc.code}: {exc.read()[:200]!r}") from None
+            except OSError as exc:
+                raise StageError(stage, repr(exc)) from None
+            return body, time.perf_counter() - t0
+
+        _, secs = call("cart", f"{base}/api/cart/item/", {"product_id": product.pk, "quantity": opts["quantity"]})
+        yield "cart", secs
+
+        order, secs = call("order", f"{base}/api/orders/", {
+            "first_name": "Load", "last_name": f"Test {n}", "email": f"checkout-loadtest-{n}@example.com",
+            "address": "1 Test St", "postal_code": "00000", "city": "Testville",
+        })
+        yield "order", secs
+
+        session, secs = call("session", f"{base}/api/checkout/stripe-session/", {"order_id": order["id"]})
+        yield "session", secs
+        session_id = session["url"].rstrip("/").rsplit("/", 1)[-1]
+
+        done, secs = call("webhook", f"{opts['stripe_url'].rstrip('/')}/_fake/checkout/sessions/{session_id}/complete", {})
+        if done.get("webhook_status") not in (200, None):
+            raise StageError("webhook", f"site answered {done.get('webhook_status')}")
+        yield "webhook", secs
+
+        if opts["wait_paid"]:
+            t0 = time.perf_counter()
+            while not Order.objects.filter(pk=order["id"], paid=True).exists():
+                if time.perf_counter() - t0 > opts["wait_paid"]:
+                    raise StageError("paid", f"order {order['id']} not paid after {opts['wait_paid']}s")
+                time.sleep(0.05)
+            yield "paid", time.perf_counter() - t0
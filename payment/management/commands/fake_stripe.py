@@ -0,0 +1,42 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from payment.fake_stripe import FakeStripe, make_server
+
+
+class Command(BaseCommand):
+    help = (
+        "Run a local fake Stripe API (checkout sessions, payment intents, signed webhooks). "
+        "Start the site with STRIPE_API_BASE=http://<host>:<port>, any STRIPE_SECRET_KEY and "
+        "STRIPE_WEBHOOK_SECRET equal to --webhook-secret."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--host", default="127.0.0.1")
+        parser.add_argument("--port", type=int, default=12111)
+        parser.add_argument("--webhook-url", help="e.g. http://127.0.0.1:8000/api/stripe/webhook/")
+        parser.add_argument("--webhook-secret", default=getattr(settings, "STRIPE_WEBHOOK_SECRET", "") or "whsec_fake")
+        parser.add_argument("--latency-ms", type=float, default=0, help="Added to every API call.")
+        parser.add_argument("--jitter-ms", type=float, default=0)
+        parser.add_argument("--failure-rate", type=float, default=0.0, help="Share of API calls answered with a 500.")
+        parser.add_argument("--webhook-delay-ms", type=float, default=0)
+        parser.add_argument("--webhook-drop-rate", type=float, default=0.0)
+        parser.add_argument("--webhook-duplicate-rate", type=float, default=0.0)
+
+    def handle(self, *args, **opts):
+        fake = FakeStripe(
+            public_url=f"http://{opts['host']}:{opts['port']}",
+            webhook_url=opts["webhook_url"], webhook_secret=opts["webhook_secret"],
+            latency_ms=opts["latency_ms"], jitter_ms=opts["jitter_ms"], failure_rate=opts["failure_rate"],
+            webhook_delay_ms=opts["webhook_delay_ms"], webhook_drop_rate=opts["webhook_drop_rate"],
+            webhook_duplicate_rate=opts["webhook_duplicate_rate"],
+        )
+        server = make_server(fake, opts["host"], opts["port"])
+        self.stdout.write(f"Fake Stripe on {fake.public_url} (webhooks -> {opts['webhook_url'] or 'off'})")
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            server.server_close()
+            self.stdout.write(str(fake.stats))
@@ -0,0 +1,31 @@
+from django.core.management.base import BaseCommand
+
+from orders.models import StripeEvent
+from payment.stripe_events import process_object
+
+
+class Command(BaseCommand):
+    help = "Process queued Stripe webhook events inline (all pending objects, or one --object)."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--object", dest="object_key", help='e.g. "order:42"')
+        parser.add_argument("--retry-failed", action="store_true", help="Requeue FAILED events first.")
+
+    def handle(self, *args, **opts):
+        events = StripeEvent.objects.all()
+        if opts["object_key"]:
+            events = events.filter(object_key=opts["object_key"])
+        if opts["retry_failed"]:
+            n = events.filter(status=StripeEvent.FAILED).update(
+                status=StripeEvent.PENDING, attempts=0, next_attempt_at=None,
+            )
+            self.stdout.write(f"Requeued {n} failed event(s).")
+        keys = list(
+            events.filter(status=StripeEvent.PENDING).order_by().values_list("object_key", flat=True).distinct()
+        )
+        handled = blocked = 0
+        for key in keys:
+            done, pending = process_object(key)
+            handled += done
+            blocked += pending
+        self.stdout.write(self.style.SUCCESS(f"Handled {handled} event(s); {blocked} still pending."))
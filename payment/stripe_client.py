@@ -0,0 +1,154 @@
+# payment/stripe_client.py
+"""
+One shared Stripe client per process.
+
+- HTTP: a single requests.Session, so keep-alive connections (and TLS
+  sessions) are reused across requests and threads. The pool size is
+  STRIPE_HTTP_POOL_SIZE.
+- Timeouts: (STRIPE_CONNECT_TIMEOUT, STRIPE_READ_TIMEOUT) seconds per
+  attempt. STRIPE_MAX_NETWORK_RETRIES is the retry budget; Stripe retries
+  idempotently.
+- Async: every service method has an *_async twin, e.g.
+      await get_client().payment_intents.retrieve_async(pid)
+  which runs on httpx when it is installed (optional dependency).
+- Metrics: every HTTP attempt is timed per endpoint (`stats.snapshot()`,
+  /api/admin/stripe_stats/). Attempts slower than STRIPE_SLOW_CALL_MS are
+  logged.
+
+STRIPE_API_BASE points the client at `manage.py fake_stripe`.
+"""
+from __future__ import annotations
+
+import logging
+import re
+import threading
+import time
+from collections import deque
+from functools import lru_cache
+
+import stripe
+from django.conf import settings
+from django.core.signals import setting_changed
+from django.dispatch import receiver
+
+logger = logging.getLogger(__name__)
+
+_ID_SEGMENT = re.compile(r"/[a-z]+_(?=[A-Za-z0-9_]*\d)[A-Za-z0-9_]+")  # pi_3Nx..., not payment_intents
+
+
+class CallStats:
+    """Latency per Stripe endpoint over the last `window` attempts."""
+
+    def __init__(self, window: int = 1000):
+        self._window = window
+        self._lock = threading.Lock()
+        self._calls: dict[str, dict] = {}
+
+    def record(self, op: str, seconds: float, ok: bool) -> None:
+        with self._lock:
+            entry = self._calls.get(op)
+            if entry is None:
+                entry = self._calls[op] = {"count": 0, "errors": 0, "latency": deque(maxlen=self._window)}
+            entry["count"] += 1
+            entry["errors"] += 0 if ok else 1
+            entry["latency"].append(seconds)
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            calls = {op: (e["count"], e["errors"], sorted(e["latency"])) for op, e in self._calls.items()}
+        out = {}
+        for op, (count, errors, lat) in calls.items():
+            if not lat:
+                continue
+            out[op] = {
+                "count": count,
+                "errors": errors,
+                "p50_ms": round(lat[len(lat) // 2] * 1000, 1),
+                "p99_ms": round(lat[min(len(lat) - 1, int(len(lat) * 0.99))] * 1000, 1),
+                "max_ms": round(lat[-1] * 1000, 1),
+            }
+        return out
+
+    def reset(self) -> None:
+        with self._lock:
+            self._calls.clear()
+
+
+stats = CallStats()
+
+
+def _op(method: str, url: str) -> str:
+    path = url.split("://", 1)[-1]
+    path = path[path.find("/"):] if "/" in path else "/"
+    return f"{method.upper()} {_ID_SEGMENT.sub('/:id', path.split('?', 1)[0])}"
+
+
+class _InstrumentedRequestsClient(stripe.RequestsClient):
+    def _timed(self, method, url, started, ok):
+        elapsed = time.perf_counter() - started
+        op = _op(method, url)
+        stats.record(op, elapsed, ok)
+        if elapsed * 1000 >= getattr(settings, "STRIPE_SLOW_CALL_MS", 2000):
+            logger.warning("Slow Stripe call %s: %.0f ms", op, elapsed * 1000)
+
+    def request(self, method, url, headers, post_data=None, **kwargs):
+        started, ok = time.perf_counter(), False
+        try:
+            result = super().request(method, url, headers, post_data, **kwargs)
+            ok = result[1] < 500
+            return result
+        finally:
+            self._timed(method, url, started, ok)
+
+    async def request_async(self, method, url, headers, post_data=None, **kwargs):
+        started, ok = time.perf_counter(), False
+        try:
+            result = await super().request_async(method, url, headers, post_data, **kwargs)
+            ok = result[1] < 500
+            return result
+        finally:
+            self._timed(method, url, started, ok)
+
+
+def _requests_session(pool_size: int):
+    import requests
+    from requests.adapters import HTTPAdapter
+
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=2, pool_maxsize=pool_size)
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session
+
+
+@lru_cache(maxsize=None)
+def get_client() -> stripe.StripeClient:
+    timeout = (
+        float(getattr(settings, "STRIPE_CONNECT_TIMEOUT", 3)),
+        float(getattr(settings, "STRIPE_READ_TIMEOUT", 20)),
+    )
+    try:
+        async_client = stripe.HTTPXClient(timeout=sum(timeout))
+    except ImportError:  # httpx not installed: *_async methods are unavailable
+        async_client = None
+    http_client = _InstrumentedRequestsClient(
+        timeout=timeout,
+        session=_requests_session(int(getattr(settings, "STRIPE_HTTP_POOL_SIZE", 20))),
+        async_fallback_client=async_client,
+    )
+    base_addresses = {}
+    if getattr(settings, "STRIPE_API_BASE", ""):
+        base_addresses["api"] = settings.STRIPE_API_BASE
+    return stripe.StripeClient(
+        settings.STRIPE_SECRET_KEY,
+        stripe_version=getattr(settings, "STRIPE_API_VERSION", None),
+        base_addresses=base_addresses,
+        max_network_retries=int(getattr(settings, "STRIPE_MAX_NETWORK_RETRIES", 2)),
+        http_client=http_client,
+    )
+
+
+@receiver(setting_changed)
+def _reset_on_setting_changed(sender, setting, **kwargs):
+    if setting.startswith("STRIPE_"):
+        get_client.cache_clear()
@@ -0,0 +1,181 @@
+# payment/stripe_events.py
+"""
+Stripe webhook events: acknowledge fast, process in a worker.
+
+The webhook only verifies the signature and inserts an orders.StripeEvent
+row. event_id is unique, so a Stripe retry of an event we already hold is
+a no-op. After commit it enqueues `process_stripe_events(object_key)` and
+returns 200. No order writes, recommender calls or mail happen on the web
+worker.
+
+The worker locks the pending events of one object (e.g. "order:42") and
+handles them in Stripe `created` order, each in its own savepoint. A
+failing event stops the rest of that object's queue (order is preserved)
+and is retried with backoff (next_attempt_at). After MAX_ATTEMPTS it is
+marked FAILED and the queue moves on. `process_pending_stripe_events`
+(celery beat / the `process_stripe_events` command) picks up anything
+whose enqueue or retry was lost, never an event still backing off.
+"""
+from __future__ import annotations
+
+import logging
+from datetime import timedelta
+
+from django.db import IntegrityError, transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from orders.models import CheckoutSession, Order, StripeEvent
+from .checkout_sessions import mark_session
+
+logger = logging.getLogger(__name__)
+
+MAX_ATTEMPTS = 5
+_handlers: dict[str, list] = {}
+
+
+def retry_delay(attempts: int) -> int:
+    """Seconds to wait before retry number `attempts` (1-based): 10s doubling, capped at 10 min."""
+    return min(600, 10 * 2 ** min(max(attempts - 1, 0), 6))
+
+
+def handles(*event_types):
+    def register(fn):
+        for t in event_types:
+            _handlers.setdefault(t, []).append(fn)
+        return fn
+    return register
+
+
+def object_key(obj: dict) -> str:
+    """Events about the same order share a key; others queue by Stripe object id."""
+    order_id = obj.get("client_reference_id") or (obj.get("metadata") or {}).get("order_id")
+    if order_id:
+        return f"order:{order_id}"
+    return str(obj.get("id") or "")
+
+
+def enqueue(key: str) -> None:
+    from .tasks import process_stripe_events
+    try:
+        process_stripe_events.delay(key)
+    except Exception:
+        # the row is stored; the sweep will pick it up
+        logger.exception("Could not enqueue Stripe events for %s", key)
+
+
+def ingest(event: dict) -> StripeEvent | None:
+    """Store a verified event; returns None if it was already received."""
+    obj = (event.get("data") or {}).get("object") or {}
+    try:
+        with transaction.atomic():
+            row = StripeEvent.objects.create(
+                event_id=event["id"],
+                type=event.get("type", ""),
+                object_key=object_key(obj),
+                payload=event,
+                stripe_created=int(event.get("created") or 0),
+            )
+    except IntegrityError:
+        return None
+    transaction.on_commit(lambda: enqueue(row.object_key))
+    return row
+
+
+def _handle(ev: StripeEvent) -> None:
+    obj = ev.payload.get("data", {}).get("object", {})
+    for handler in _handlers.get(ev.type, ()):
+        handler(obj)
+    ev.status = StripeEvent.DONE
+    ev.processed_at = timezone.now()
+    ev.save(update_fields=["status", "processed_at"])
+
+
+def process_object(key: str) -> tuple[int, int]:
+    """
+    Handle the pending events of one object in order.
+    Returns (handled, still_pending); still_pending > 0 means retry later.
+    """
+    handled = 0
+    with transaction.atomic():
+        events = list(
+            StripeEvent.objects.select_for_update()
+            .filter(object_key=key, status=StripeEvent.PENDING)
+            .order_by("stripe_created", "id")
+        )
+        for i, ev in enumerate(events):
+            try:
+                with transaction.atomic():
+                    _handle(ev)
+                handled += 1
+            except Exception as exc:
+                ev.attempts += 1
+                ev.last_error = repr(exc)[:2000]
+                if ev.attempts < MAX_ATTEMPTS:
+                    ev.next_attempt_at = timezone.now() + timedelta(seconds=retry_delay(ev.attempts))
+                    ev.save(update_fields=["attempts", "last_error", "next_attempt_at"])
+                    logger.warning("Stripe event %s (%s) failed, will retry: %r", ev.event_id, ev.type, exc)
+                    return handled, len(events) - i
+                ev.status = StripeEvent.FAILED
+                ev.save(update_fields=["attempts", "last_error", "status"])
+                logger.error("Stripe event %s (%s) failed %s times, giving up: %r",
+                             ev.event_id, ev.type, ev.attempts, exc)
+    return handled, 0
+
+
+def stale_keys(older_than: int = 60, limit: int = 500) -> list[str]:
+    """
+    Objects with pending events that nobody picked up within `older_than`
+    seconds of arriving, or of their scheduled retry. Events still inside
+    their backoff window are left to the retrying task.
+    """
+    cutoff = timezone.now() - timedelta(seconds=older_than)
+    return list(
+        StripeEvent.objects.filter(status=StripeEvent.PENDING)
+        .filter(Q(next_attempt_at__isnull=True, created_at__lte=cutoff) | Q(next_attempt_at__lte=cutoff))
+        .order_by().values_list("object_key", flat=True).distinct()[:limit]
+    )
+
+
+# ---- handlers ---------------------------------------------------------------
+
+def _after_payment(order_id) -> None:
+    from shop.models import Product
+    from shop.recommender import Recommender
+    from .tasks import payment_completed
+
+    try:
+        product_ids = Order.objects.get(pk=order_id).items.values_list("product_id")
+        Recommender().products_bought(Product.objects.filter(id__in=product_ids))
+    except Exception:
+        logger.exception("Recommender update failed for order %s", order_id)
+    payment_completed.delay(order_id)
+
+
+@handles("checkout.session.completed", "checkout.session.async_payment_succeeded")
+def checkout_session_paid(session: dict) -> None:
+    if session.get("mode") != "payment" or session.get("payment_status") != "paid":
+        return
+    order_id = session.get("client_reference_id") or (session.get("metadata") or {}).get("order_id")
+    if not order_id:
+        return
+    order = Order.objects.select_for_update().filter(pk=order_id).first()
+    if order is None:
+        logger.warning("Stripe session %s refers to unknown order %s", session.get("id"), order_id)
+        return
+    if order.paid:
+        return
+    order.paid = True
+    order.stripe_id = session.get("payment_intent") or ""
+    order.save()
+    transaction.on_commit(lambda: _after_payment(order.pk))
+
+
+@handles("checkout.session.completed")
+def checkout_session_completed(session: dict) -> None:
+    mark_session(session.get("id", ""), CheckoutSession.COMPLETE)
+
+
+@handles("checkout.session.expired")
+def checkout_session_expired(session: dict) -> None:
+    mark_session(session.get("id", ""), CheckoutSession.EXPIRED)
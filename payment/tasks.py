@@ -33,4 +33,29 @@ def payment_completed(order_id):
         f'order_{order.id}.pdf', out.getvalue(), 'application/pdf'
     )
     # send e-mail
-    email.send()
\ No newline at end of file
+    email.send()
+
+@shared_task(bind=True, max_retries=None)
+def process_stripe_events(self, object_key):
+    """
+    Handle the queued Stripe webhook events of one object, in order
+    (payment.stripe_events). Retries with backoff while an event fails.
+    """
+    from .stripe_events import process_object, retry_delay
+    handled, pending = process_object(object_key)
+    if pending:
+        raise self.retry(countdown=retry_delay(self.request.retries + 1))
+    return handled
+
+
+@shared_task
+def process_pending_stripe_events():
+    """
+    Periodic (celery beat): re-enqueue objects whose pending events were
+    never picked up (e.g. the broker was down when the webhook arrived).
+    """
+    from .stripe_events import enqueue, stale_keys
+    keys = stale_keys()
+    for key in keys:
+        enqueue(key)
+    return len(keys)
@@ -1,13 +1,11 @@
 # payment/views.py
 from decimal import Decimal, ROUND_HALF_UP
 
-import stripe
 from django.conf import settings
 from django.shortcuts import get_object_or_404, redirect, render
 from orders.models import Order
 
-stripe.api_key = settings.STRIPE_SECRET_KEY
-stripe.api_version = settings.STRIPE_API_VERSION
+from .stripe_client import get_client
 
 # Stripe should NOT calculate anything
 USE_AUTOMATIC_TAX = False
@@ -71,7 +69,7 @@ def payment_process(request):
             "metadata": {"order_id": str(order.id)},
         }
 
-        session = stripe.checkout.Session.create(**session_data)
+        session = get_client().checkout.sessions.create(session_data)
         return redirect(session.url, code=303)
 
     # GET: optional server-rendered page (unchanged)
@@ -0,0 +1,16 @@
+# payment/views_admin.py
+from rest_framework.decorators import api_view, permission_classes
+from rest_framework.permissions import IsAdminUser
+from rest_framework.response import Response
+
+from .stripe_client import stats
+
+
+@api_view(["GET"])
+@permission_classes([IsAdminUser])
+def stripe_stats(request):
+    """Stripe call latency per endpoint in this process (?reset=1 clears it)."""
+    data = stats.snapshot()
+    if request.query_params.get("reset"):
+        stats.reset()
+    return Response(data)
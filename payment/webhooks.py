@@ -1,24 +1,30 @@
+import json
+
 import stripe
 from django.conf import settings
 from django.http import HttpResponse
 from django.views.decorators.csrf import csrf_exempt
-from orders.models import Order
-from shop.models import Product
-from shop.recommender import Recommender
+from django.views.decorators.http import require_POST
 
-from .tasks import payment_completed
+from .stripe_events import ingest
 
 
 @csrf_exempt
+@require_POST
 def stripe_webhook(request):
+    """
+    Verify, store, acknowledge. The event is handled by a celery worker
+    (payment.stripe_events) so Stripe retries and bursts never wait on
+    order updates.
+    """
     payload = request.body
-    sig_header = request.META['HTTP_STRIPE_SIGNATURE']
-    event = None
+    sig_header = request.META.get('HTTP_STRIPE_SIGNATURE', '')
 
     try:
-        event = stripe.Webhook.construct_event(
+        stripe.Webhook.construct_event(
             payload, sig_header, settings.STRIPE_WEBHOOK_SECRET
         )
+        event = json.loads(payload)
     except ValueError:
         # Invalid payload
         return HttpResponse(status=400)
@@ -26,33 +32,5 @@ def stripe_webhook(request):
         # Invalid signature
         return HttpResponse(status=400)
 
-    if event.type == 'checkout.session.completed':
-        session = event.data.object
-        if (
-            session.mode == 'payment'
-            and session.payment_status == 'paid'
-        ):
-            try:
-                order = Order.objects.get(
-                    id=session.client_reference_id
-                )
-            except Order.DoesNotExist:
-                return HttpResponse(status=404)
-
-            # mark order as paid
-            order.paid = True
-
-            # store Stripe payment ID
-            order.stripe_id = session.payment_intent
-            order.save()
-
-            # save items bought for product recommendations
-            product_ids = order.items.values_list('product_id')
-            products = Product.objects.filter(id__in=product_ids)
-            r = Recommender()
-            r.products_bought(products)
-
-            # launch asynchronous task
-            payment_completed.delay(order.id)
-
-    return HttpResponse(status=200)
\ No newline at end of file
+    ingest(event)
+    return HttpResponse(status=200)
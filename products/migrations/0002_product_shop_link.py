@@ -0,0 +1,25 @@
+# Generated by Django 5.2.7 on 2026-10-19 04:20
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0001_initial'),
+        ('shop', '0003_product_stock'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='product',
+            name='shop_product',
+            field=models.OneToOneField(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='ledger_product', to='shop.product'),
+        ),
+        migrations.AddField(
+            model_name='product',
+            name='storefront_dirty',
+            field=models.BooleanField(db_index=True, default=False),
+        ),
+    ]
@@ -8,8 +8,14 @@ class Product(models.Model):
     price_retail = models.DecimalField(max_digits=10, decimal_places=2, default=0)
     price_wholesale = models.DecimalField(max_digits=10, decimal_places=2, default=0)
     track_stock = models.BooleanField(default=True)
-    # optional: cached stock; we’ll still compute from ledger for truth
+    # running balance of inventory.StockLedger (maintained by the ledger)
     stock_cached = models.IntegerField(default=0)
     is_active = models.BooleanField(default=True)
+    # storefront product whose `stock` is derived from this ledger (inventory.storefront)
+    shop_product = models.OneToOneField(
+        "shop.Product", null=True, blank=True, on_delete=models.SET_NULL, related_name="ledger_product",
+    )
+    # set with every balance change, cleared by the storefront sync
+    storefront_dirty = models.BooleanField(default=False, db_index=True)
 
     def __str__(self): return self.name
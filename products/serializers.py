@@ -5,5 +5,5 @@ from .models import Product
 class ProductSer(serializers.ModelSerializer):
     class Meta:
         model = Product
-        fields = ("id","name","sku","image","price_retail","price_wholesale","track_stock","stock_cached","is_active")
+        fields = ("id","name","sku","image","price_retail","price_wholesale","track_stock","stock_cached","is_active","shop_product")
         read_only_fields = ("id","stock_cached")
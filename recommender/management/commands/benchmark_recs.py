@@ -0,0 +1,129 @@
+# recommender/management/commands/benchmark_recs.py
+from __future__ import annotations
+
+import multiprocessing
+import resource
+import sys
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from recommender.similarity import COPURCHASE_NORMS, DEFAULT_CHUNK_SIZE
+
+
+def _rss_mb(who: int = resource.RUSAGE_SELF) -> float:
+    """Peak RSS in MB (ru_maxrss is KB on Linux, bytes on macOS); RUSAGE_CHILDREN = largest child."""
+    peak = resource.getrusage(who).ru_maxrss
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+def synthetic_corpus(n: int, vocab: int = 5000, words: int = 40, seed: int = 0) -> list[str]:
+    """Product-like texts: Zipf-distributed words so a few terms are shared widely."""
+    import numpy as np
+
+    rng = np.random.default_rng(seed)
+    ids = np.minimum(rng.zipf(1.3, size=(n, words)), vocab) - 1
+    return [" ".join(f"w{w}" for w in row) for row in ids]
+
+
+def synthetic_order_lines(n: int, orders: int, lines: int = 3, seed: int = 0):
+    """(order_id, product_id) pairs as build_recs streams them; popular products skew like real carts."""
+    import numpy as np
+
+    rng = np.random.default_rng(seed + 1)
+    order_ids = np.repeat(np.arange(orders), lines)
+    product_ids = np.minimum(rng.zipf(1.5, size=order_ids.size), n)
+    return zip(order_ids.tolist(), product_ids.tolist())
+
+
+def _run(n: int, opts: dict, out) -> None:
+    """One catalog size in a fresh process, so peak RSS belongs to this run only."""
+    import numpy as np
+    from recommender.similarity import (
+        copurchase_matrix, incidence_matrix, tfidf_matrix, topk_chunks, topk_parallel,
+    )
+
+    base = _rss_mb()
+    corpus = synthetic_corpus(n)
+
+    t0 = time.perf_counter()
+    X = tfidf_matrix(corpus, max_features=opts["max_features"], ngram_max=opts["ngram_max"])
+    t1 = time.perf_counter()
+    co = None
+    if opts["copurchase_weight"] > 0:
+        lines = synthetic_order_lines(n, orders=n * opts["orders_per_product"])
+        co = copurchase_matrix(incidence_matrix(lines, np.arange(1, n + 1)), norm=opts["copurchase_norm"])
+    t2 = time.perf_counter()
+    rows = 0
+    if opts["dense"]:
+        from sklearn.metrics.pairwise import cosine_similarity
+        sim = cosine_similarity(X)
+        if co is not None:
+            sim += opts["copurchase_weight"] * co.toarray()
+        np.fill_diagonal(sim, -np.inf)
+        top = np.argsort(-sim, axis=1)[:, :opts["topk"]]
+        rows = int((np.take_along_axis(sim, top, axis=1) > 0).sum())
+    else:
+        kwargs = dict(co=co, co_weight=opts["copurchase_weight"], chunk_size=opts["chunk_size"])
+        if opts["workers"] > 1:
+            chunks = topk_parallel(X, opts["topk"], workers=opts["workers"], **kwargs)
+        else:
+            chunks = topk_chunks(X, opts["topk"], **kwargs)
+        for _, cols, _ in chunks:
+            rows += int((cols >= 0).sum())
+    t3 = time.perf_counter()
+    out.put({
+        "n": n, "nnz": X.nnz, "tfidf": t1 - t0, "co": t2 - t1, "topk": t3 - t2,
+        "rows": rows, "base": base, "peak": _rss_mb(),
+        "worker_peak": _rss_mb(resource.RUSAGE_CHILDREN),
+    })
+
+
+class Command(BaseCommand):
+    help = (
+        "Benchmark build_recs similarity on synthetic catalogs: wall time and peak RSS "
+        "per catalog size (each size runs in its own process)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--sizes", default="1000,5000,20000", help="Comma-separated catalog sizes.")
+        parser.add_argument("--topk", type=int, default=20)
+        parser.add_argument("--chunk-size", type=int, default=DEFAULT_CHUNK_SIZE)
+        parser.add_argument("--max-features", type=int, default=20000)
+        parser.add_argument("--ngram-max", type=int, default=2)
+        parser.add_argument("--copurchase-weight", type=float, default=0.30)
+        parser.add_argument("--copurchase-norm", choices=COPURCHASE_NORMS, default="raw")
+        parser.add_argument("--orders-per-product", type=int, default=5,
+                            help="Synthetic 3-line orders per catalog product.")
+        parser.add_argument("--workers", type=int, default=1, help="Score on a process pool (as build_recs --workers).")
+        parser.add_argument("--dense", action="store_true",
+                            help="Score with the full n x n cosine matrix instead (old build_recs path).")
+
+    def handle(self, *args, **opts):
+        try:
+            sizes = [int(s) for s in opts["sizes"].split(",") if s.strip()]
+        except ValueError:
+            raise CommandError("--sizes must be comma-separated integers")
+        if not sizes or min(sizes) < 2:
+            raise CommandError("--sizes needs catalog sizes >= 2")
+
+        ctx = multiprocessing.get_context("fork")
+        mode = "dense" if opts["dense"] else f"chunked (chunk={opts['chunk_size']}, workers={opts['workers']})"
+        self.stdout.write(f"mode={mode} topk={opts['topk']} copurchase_weight={opts['copurchase_weight']}")
+        self.stdout.write(
+            f"{'products':>9} {'nnz':>10} {'tfidf':>8} {'co-buy':>8} {'top-k':>8} "
+            f"{'rows':>9} {'peak RSS':>10} {'+base':>9} {'worker':>9}"
+        )
+        for n in sizes:
+            out = ctx.Queue()
+            proc = ctx.Process(target=_run, args=(n, opts, out))
+            proc.start()
+            proc.join()
+            if proc.exitcode != 0:
+                self.stderr.write(f"{n}: worker exited with {proc.exitcode} (out of memory?)")
+                continue
+            r = out.get()
+            self.stdout.write(
+                f"{r['n']:>9} {r['nnz']:>10} {r['tfidf']:>7.2f}s {r['co']:>7.2f}s {r['topk']:>7.2f}s {r['rows']:>9} "
+                f"{r['peak']:>8.0f}MB {r['peak'] - r['base']:>7.0f}MB {r['worker_peak']:>7.0f}MB"
+            )
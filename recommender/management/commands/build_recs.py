@@ -1,24 +1,26 @@
 # recommender/management/commands/build_recs.py
 from __future__ import annotations
 
+import os
 import warnings
-from collections import defaultdict
-from typing import Dict, Iterable, List, Tuple
+from typing import List
 
-from django.core.management.base import BaseCommand
+from django.core.management.base import BaseCommand, CommandError
 from django.db import transaction
-from django.db.models import Count
 
 # Quiet common lib warnings
 warnings.filterwarnings("ignore", category=FutureWarning)
 warnings.filterwarnings("ignore", category=UserWarning)
 
-from sklearn.feature_extraction.text import TfidfVectorizer
-from sklearn.metrics.pairwise import cosine_similarity
+import numpy as np
 
 from shop.models import Product
 from orders.models import OrderItem  # adjust if your app name/path differs
 from recommender.models import ProductSimilarity
+from recommender.similarity import (
+    COPURCHASE_NORMS, DEFAULT_CHUNK_SIZE, copurchase_matrix, incidence_matrix, tfidf_matrix, topk_chunks,
+    topk_parallel,
+)
 
 
 # -----------------------
@@ -61,31 +63,6 @@ def product_text(p: Product) -> str:
     return " ".join(s for s in parts if s).strip()
 
 
-def build_copurchase_counts(order_items: Iterable[Tuple[int, int]]) -> Dict[Tuple[int, int], int]:
-    """
-    Build co-purchase counts from (order_id, product_id) pairs.
-    Returns dict mapping (pid_a, pid_b) -> count.
-    """
-    by_order: Dict[int, List[int]] = defaultdict(list)
-    for oid, pid in order_items:
-        by_order[oid].append(pid)
-
-    co: Dict[Tuple[int, int], int] = defaultdict(int)
-    for plist in by_order.values():
-        n = len(plist)
-        if n < 2:
-            continue
-        for i in range(n):
-            a = plist[i]
-            for j in range(i + 1, n):
-                b = plist[j]
-                if a == b:
-                    continue
-                co[(a, b)] += 1
-                co[(b, a)] += 1
-    return co
-
-
 # -----------------------
 # Management command
 # -----------------------
@@ -97,7 +74,20 @@ class Command(BaseCommand):
         parser.add_argument("--max-features", type=int, default=20000, help="TF-IDF max features.")
         parser.add_argument("--ngram-max", type=int, default=2, help="TF-IDF ngram upper bound (1..N).")
         parser.add_argument("--copurchase-weight", type=float, default=0.30, help="Blend weight for co-purchase (0..1).")
+        parser.add_argument(
+            "--copurchase-norm", choices=COPURCHASE_NORMS, default="raw",
+            help="Co-purchase score: raw counts, cosine, lift or (positive) PMI; scaled to 0..1.",
+        )
+        parser.add_argument("--min-copurchases", type=int, default=1, help="Ignore pairs bought together fewer times.")
         parser.add_argument("--truncate", type=int, default=0, help="If >0, truncate corpus strings to this many chars.")
+        parser.add_argument(
+            "--chunk-size", type=int, default=DEFAULT_CHUNK_SIZE,
+            help="Products scored per block; peak memory ~ chunk-size x (products + features) x 4 bytes.",
+        )
+        parser.add_argument(
+            "--workers", type=int, default=1,
+            help="Score blocks on N processes (TF-IDF matrix shared via memory-mapped files); 0 = all cores.",
+        )
 
     def handle(self, *args, **opts):
         topk: int = opts["topk"]
@@ -105,56 +95,64 @@ class Command(BaseCommand):
         ngram_max: int = opts["ngram_max"]
         w_co: float = opts["copurchase_weight"]
         trunc: int = opts["truncate"]
+        chunk_size: int = opts["chunk_size"]
+        workers: int = opts["workers"] or os.cpu_count() or 1
         verbosity: int = opts.get("verbosity", 1)
+        if topk < 1:
+            raise CommandError("--topk must be at least 1")
+        if chunk_size < 1:
+            raise CommandError("--chunk-size must be at least 1")
 
-        products: List[Product] = list(Product.objects.all())
+        products: List[Product] = list(
+            Product.objects.select_related("category").only("id", "name", "description", "category__name")
+        )
         if not products:
             if verbosity > 0:
                 self.stdout.write(self.style.WARNING("No products found."))
             return
+        ids = np.fromiter((p.id for p in products), dtype=np.int64, count=len(products))
 
         # --- TF-IDF corpus
         corpus = [product_text(p) for p in products]
         if trunc and trunc > 0:
             corpus = [c[:trunc] for c in corpus]
-
-        vectorizer = TfidfVectorizer(max_features=max_features, ngram_range=(1, ngram_max))
-        X = vectorizer.fit_transform(corpus)
-        sim = cosine_similarity(X)
+        X = tfidf_matrix(corpus, max_features=max_features, ngram_max=ngram_max)
+        del corpus, products
 
         # --- Co-purchase signal
-        multi_ids = (
-            OrderItem.objects.values("order_id")
-            .annotate(n=Count("id"))
-            .filter(n__gte=2)
-            .values_list("order_id", flat=True)
-        )
-        order_items = OrderItem.objects.filter(order_id__in=multi_ids).values_list("order_id", "product_id")
-        co = build_copurchase_counts(order_items)
-        max_co = max(co.values()) if co else 1
-
-        # --- Write results
+        co_matrix = None
+        if w_co > 0:
+            order_lines = (
+                OrderItem.objects.order_by()
+                .values_list("order_id", "product_id")
+                .iterator(chunk_size=20000)
+            )
+            A = incidence_matrix(order_lines, ids)
+            co_matrix = copurchase_matrix(A, norm=opts["copurchase_norm"], min_count=opts["min_copurchases"])
+            if verbosity > 1:
+                self.stdout.write(f"Co-purchase: {A.shape[0]} multi-item orders, {co_matrix.nnz} product pairs.")
+            del A
+
+        # --- Score chunk by chunk and write as we go (with workers, while the pool scores the rest)
+        if workers > 1:
+            chunks = topk_parallel(X, topk, co=co_matrix, co_weight=w_co, chunk_size=chunk_size, workers=workers)
+        else:
+            chunks = topk_chunks(X, topk, co=co_matrix, co_weight=w_co, chunk_size=chunk_size)
+        del X, co_matrix
+        written = 0
         with transaction.atomic():
             ProductSimilarity.objects.all().delete()
-            bulk: List[ProductSimilarity] = []
-
-            for i, p in enumerate(products):
-                row = sim[i]
-                scored: List[Tuple[int, float]] = []
-                for j, q in enumerate(products):
-                    if i == j:
-                        continue
-                    s = float(row[j])
-                    c = co.get((p.id, q.id), 0)
-                    if c and w_co > 0 and max_co > 0:
-                        s += w_co * (c / max_co)
-                    scored.append((q.id, s))
-
-                scored.sort(key=lambda t: t[1], reverse=True)
-                for pid, sc in scored[:topk]:
-                    bulk.append(ProductSimilarity(base=p, other_id=pid, score=sc))
-
-            ProductSimilarity.objects.bulk_create(bulk, batch_size=2000)
+            for start, cols, scores in chunks:
+                bulk = [
+                    ProductSimilarity(base_id=int(ids[start + r]), other_id=int(ids[c]), score=float(sc))
+                    for r, (row_cols, row_scores) in enumerate(zip(cols, scores))
+                    for c, sc in zip(row_cols, row_scores)
+                    if c >= 0
+                ]
+                ProductSimilarity.objects.bulk_create(bulk, batch_size=2000)
+                written += len(bulk)
 
         if verbosity > 0:
-            self.stdout.write(self.style.SUCCESS(f"Built similarities for {len(products)} products (topK={topk})."))
+            self.stdout.write(self.style.SUCCESS(
+                f"Built similarities for {len(ids)} products (topK={topk}, {written} rows, workers={workers})."
+            ))
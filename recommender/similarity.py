@@ -0,0 +1,243 @@
+# recommender/similarity.py
+"""
+Top-K product neighbours without an n x n matrix.
+
+TF-IDF rows are L2-normalised, so cosine similarity is X @ X.T. We compute it
+`chunk_size` rows at a time (sparse X times a dense slice of X.T; faster
+than sparse @ sparse once common terms make the product dense), add the
+non-zeros of the pre-normalised sparse co-purchase rows and keep each row's
+top-K with argpartition. Peak memory is about
+chunk_size * (n_products + n_features) * 4 bytes (float32) plus the sparse
+inputs, instead of n_products ** 2 * 8 for the full cosine matrix.
+topk_parallel() runs the same chunks on a process pool.
+
+Co-purchase comes from a binary order x product incidence matrix A:
+A.T @ A counts, for every product pair, the orders containing both (its
+diagonal is each product's order count), normalised per COPURCHASE_NORMS.
+
+No Django imports here: pool workers and the benchmark command run this in
+child processes.
+"""
+from __future__ import annotations
+
+import multiprocessing
+import os
+import tempfile
+from array import array
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import Iterable, Iterator, Tuple
+
+import numpy as np
+from scipy import sparse
+
+DEFAULT_CHUNK_SIZE = 512
+COPURCHASE_NORMS = ("raw", "cosine", "lift", "pmi")
+
+
+def tfidf_matrix(corpus, max_features: int = 20000, ngram_max: int = 2) -> sparse.csr_matrix:
+    """L2-normalised float32 TF-IDF rows for `corpus` (one row per document)."""
+    from sklearn.feature_extraction.text import TfidfVectorizer
+
+    vectorizer = TfidfVectorizer(max_features=max_features, ngram_range=(1, ngram_max), dtype=np.float32)
+    return vectorizer.fit_transform(corpus).tocsr()
+
+
+def incidence_matrix(order_lines: Iterable[Tuple[int, int]], product_ids: np.ndarray) -> sparse.csr_matrix:
+    """
+    Binary orders x products matrix from streamed (order_id, product_id)
+    pairs; columns follow `product_ids`, unknown products are skipped and
+    orders with fewer than two distinct products are dropped. Lines are
+    buffered in compact int64 arrays, so millions of them stay cheap.
+    """
+    orders, products = array("q"), array("q")
+    for order_id, product_id in order_lines:
+        orders.append(order_id)
+        products.append(product_id)
+    orders = np.frombuffer(orders, dtype=np.int64)
+    products = np.frombuffer(products, dtype=np.int64)
+    product_ids = np.asarray(product_ids, dtype=np.int64)
+
+    sorter = np.argsort(product_ids)
+    pos = np.searchsorted(product_ids, products, sorter=sorter).clip(max=len(product_ids) - 1)
+    cols = sorter[pos]
+    known = product_ids[cols] == products
+    order_ids, rows = np.unique(orders[known], return_inverse=True)
+
+    A = sparse.csr_matrix(
+        (np.ones(rows.size, dtype=np.float32), (rows, cols[known])), shape=(order_ids.size, len(product_ids))
+    )
+    A.sum_duplicates()
+    A.data[:] = 1  # same product on two lines of one order counts once
+    return A[np.diff(A.indptr) >= 2]
+
+
+def copurchase_matrix(A: sparse.spmatrix, norm: str = "raw", min_count: int = 1) -> sparse.csr_matrix:
+    """
+    Products x products co-purchase scores from incidence matrix `A`,
+    scaled to 0..1 and with an empty diagonal. With c_ij = orders with both,
+    n_i = orders with i and N = orders:
+
+      raw     c_ij
+      cosine  c_ij / sqrt(n_i * n_j)
+      lift    c_ij * N / (n_i * n_j)
+      pmi     max(0, log(lift))
+
+    Pairs bought together fewer than `min_count` times are dropped
+    (lift and PMI are noisy on single co-occurrences).
+    """
+    if norm not in COPURCHASE_NORMS:
+        raise ValueError(f"Unknown co-purchase normalisation {norm!r}")
+    A = sparse.csr_matrix(A, dtype=np.float32)
+    C = (A.T @ A).tocsr()
+    counts = C.diagonal().astype(np.float64)
+    C.setdiag(0)
+    if min_count > 1:
+        C.data[C.data < min_count] = 0
+    C.eliminate_zeros()
+
+    if norm != "raw" and C.nnz:
+        coo = C.tocoo()
+        expected = counts[coo.row] * counts[coo.col]
+        if norm == "cosine":
+            values = coo.data / np.sqrt(expected)
+        else:
+            values = coo.data * A.shape[0] / expected
+            if norm == "pmi":
+                values = np.log(values)
+        C = sparse.csr_matrix((values.astype(np.float32), (coo.row, coo.col)), shape=C.shape)
+        C.data[C.data < 0] = 0
+        C.eliminate_zeros()
+    if C.nnz:
+        C.data /= C.data.max()
+    return C
+
+
+def topk_rows(scores: np.ndarray, k: int) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    (cols, values) of the k largest entries per row of a dense block, best
+    first. O(n) per row via argpartition; only the k winners are sorted.
+    """
+    n = scores.shape[1]
+    k = max(0, min(k, n))
+    if k == 0:
+        empty = np.empty((scores.shape[0], 0))
+        return empty.astype(np.intp), empty.astype(scores.dtype)
+    if k < n:
+        cols = np.argpartition(scores, n - k, axis=1)[:, n - k:]
+    else:
+        cols = np.broadcast_to(np.arange(n), scores.shape).copy()
+    values = np.take_along_axis(scores, cols, axis=1)
+    order = np.argsort(-values, axis=1, kind="stable")
+    return np.take_along_axis(cols, order, axis=1), np.take_along_axis(values, order, axis=1)
+
+
+def _prepare(X, co, co_weight):
+    X = sparse.csr_matrix(X, dtype=np.float32)
+    if co is not None and co_weight:
+        co = sparse.csr_matrix(co, dtype=np.float32) * np.float32(co_weight)
+    else:
+        co = None
+    return X, co
+
+
+def _score_block(X, co, start: int, stop: int, topk: int) -> Tuple[np.ndarray, np.ndarray]:
+    dense = np.ascontiguousarray((X @ X[start:stop].T.toarray()).T)
+    if co is not None:
+        extra = co[start:stop].tocoo()
+        dense[extra.row, extra.col] += extra.data
+    dense[np.arange(stop - start), np.arange(start, stop)] = -np.inf
+    cols, scores = topk_rows(dense, topk)
+    cols[~(scores > 0)] = -1
+    return cols.astype(np.int32), scores
+
+
+def topk_chunks(
+    X: sparse.spmatrix,
+    topk: int,
+    co: sparse.spmatrix | None = None,
+    co_weight: float = 0.0,
+    chunk_size: int = DEFAULT_CHUNK_SIZE,
+) -> Iterator[Tuple[int, np.ndarray, np.ndarray]]:
+    """
+    Yield (first_row, cols, scores) per chunk of `chunk_size` rows of X.
+
+    score(i, j) = cos(X_i, X_j) + co_weight * co[i, j]; `co` should already
+    be scaled to 0..1. Self-pairs and scores <= 0 are dropped: those
+    positions come back as col -1 so callers can mask them.
+    """
+    X, co = _prepare(X, co, co_weight)
+    n = X.shape[0]
+    step = max(1, int(chunk_size))
+    for start in range(0, n, step):
+        stop = min(start + step, n)
+        yield (start, *_score_block(X, co, start, stop, topk))
+
+
+# -----------------------
+# Process pool
+# -----------------------
+_ARRAYS = ("data", "indices", "indptr")
+_worker: dict = {}
+
+
+def save_shared(m: sparse.csr_matrix, directory: str, name: str) -> None:
+    """Write a CSR matrix as raw .npy arrays that workers can memory-map."""
+    for attr in _ARRAYS:
+        np.save(os.path.join(directory, f"{name}.{attr}.npy"), getattr(m, attr))
+    np.save(os.path.join(directory, f"{name}.shape.npy"), np.asarray(m.shape))
+
+
+def load_shared(directory: str, name: str) -> sparse.csr_matrix | None:
+    """CSR matrix over read-only memory maps (pages shared by every worker), or None."""
+    if not os.path.exists(os.path.join(directory, f"{name}.shape.npy")):
+        return None
+    data, indices, indptr = (
+        np.load(os.path.join(directory, f"{name}.{attr}.npy"), mmap_mode="r") for attr in _ARRAYS
+    )
+    shape = tuple(np.load(os.path.join(directory, f"{name}.shape.npy")))
+    return sparse.csr_matrix((data, indices, indptr), shape=shape, copy=False)
+
+
+def _init_worker(directory: str, topk: int) -> None:
+    _worker.update(X=load_shared(directory, "X"), co=load_shared(directory, "co"), topk=topk)
+
+
+def _score_shard(start: int, stop: int) -> Tuple[int, np.ndarray, np.ndarray]:
+    return (start, *_score_block(_worker["X"], _worker["co"], start, stop, _worker["topk"]))
+
+
+def topk_parallel(
+    X: sparse.spmatrix,
+    topk: int,
+    co: sparse.spmatrix | None = None,
+    co_weight: float = 0.0,
+    chunk_size: int = DEFAULT_CHUNK_SIZE,
+    workers: int = 2,
+) -> Iterator[Tuple[int, np.ndarray, np.ndarray]]:
+    """
+    topk_chunks() over a pool of `workers` processes. X and co are written
+    once to a temp dir and memory-mapped by every worker, so the catalog is
+    not pickled per task; each task scores one chunk of rows. Chunks are
+    yielded as they finish (not in row order).
+    """
+    X, co = _prepare(X, co, co_weight)
+    n = X.shape[0]
+    step = max(1, int(chunk_size))
+    with tempfile.TemporaryDirectory(prefix="build_recs-") as directory:
+        save_shared(X, directory, "X")
+        if co is not None:
+            save_shared(co, directory, "co")
+        del X, co
+        # fork where available: spawn re-imports __main__, which breaks under `manage.py shell < x`;
+        # workers never touch the parent's DB connection and exit without running its finalizers
+        method = "fork" if "fork" in multiprocessing.get_all_start_methods() else "spawn"
+        pool = ProcessPoolExecutor(
+            max_workers=workers, mp_context=multiprocessing.get_context(method),
+            initializer=_init_worker, initargs=(directory, topk),
+        )
+        try:
+            futures = [pool.submit(_score_shard, start, min(start + step, n)) for start in range(0, n, step)]
+            for future in as_completed(futures):
+                yield future.result()
+        finally:
+            pool.shutdown(wait=True, cancel_futures=True)
@@ -1,3 +1,11 @@
 from django.contrib import admin
 
-# Register your models here.
+from .models import ShippingRule
+
+
+@admin.register(ShippingRule)
+class ShippingRuleAdmin(admin.ModelAdmin):
+    list_display = ["country", "state", "postal_prefix", "method", "min_subtotal", "max_subtotal", "price", "priority", "is_active"]
+    list_filter = ["is_active", "country", "method"]
+    list_editable = ["price", "priority", "is_active"]
+    search_fields = ["state", "postal_prefix"]
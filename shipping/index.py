@@ -0,0 +1,165 @@
+# shipping/index.py
+"""
+In-process compiled index of active ShippingRule rows.
+
+    country -> state ("" = any) -> postal-prefix trie -> method ("" = any)
+            -> rules sorted by (-priority, min_subtotal, id)
+
+A quote walks at most two state buckets and the trie path of the postal
+code, so it is a handful of dict lookups with no DB query. The index is
+rebuilt lazily: every process re-reads the rules' generation (row count and
+latest `updated`, one aggregate query) at most every
+SHIPPING_RULES_CHECK_INTERVAL seconds and recompiles when it moved. It comes
+from the DB, so web and Celery workers see admin edits without a shared
+cache; ShippingRule save/delete also drops the local index at once (see
+shipping.signals).
+"""
+from __future__ import annotations
+
+import threading
+import time
+from decimal import Decimal
+from typing import NamedTuple
+
+from django.conf import settings
+from django.db.models import Count, Max
+
+CHECK_INTERVAL = getattr(settings, "SHIPPING_RULES_CHECK_INTERVAL", 5)
+
+
+class CompiledRule(NamedTuple):
+    sort_key: tuple
+    min_subtotal: Decimal
+    max_subtotal: Decimal | None
+    method: str
+    price: Decimal
+    rule_id: int
+
+
+class _TrieNode:
+    __slots__ = ("children", "rules")
+
+    def __init__(self):
+        self.children: dict[str, _TrieNode] = {}
+        self.rules: dict[str, list[CompiledRule]] = {}   # method -> sorted rules
+
+    def walk(self):
+        yield self
+        for child in self.children.values():
+            yield from child.walk()
+
+
+class ShippingRuleIndex:
+    def __init__(self, rules=()):
+        self._countries: dict[str, dict[str, _TrieNode]] = {}
+        self.methods: tuple[str, ...] = ()
+        self.size = 0
+        methods = []
+        for r in rules:
+            self._add(r)
+            if r.method and r.method.lower() not in methods:
+                methods.append(r.method.lower())
+        self.methods = tuple(methods)
+        for states in self._countries.values():
+            for root in states.values():
+                for node in root.walk():
+                    for bucket in node.rules.values():
+                        bucket.sort()
+
+    @classmethod
+    def from_db(cls) -> "ShippingRuleIndex":
+        from .models import ShippingRule
+        qs = ShippingRule.objects.filter(is_active=True).only(
+            "id", "country", "state", "postal_prefix", "min_subtotal",
+            "max_subtotal", "method", "price", "priority",
+        )
+        return cls(qs)
+
+    def _add(self, r) -> None:
+        node = (
+            self._countries
+            .setdefault((r.country or "").upper(), {})
+            .setdefault((r.state or "").upper(), _TrieNode())
+        )
+        for ch in (r.postal_prefix or "").strip().upper():
+            node = node.children.setdefault(ch, _TrieNode())
+        method = (r.method or "").lower()
+        node.rules.setdefault(method, []).append(CompiledRule(
+            sort_key=(-r.priority, r.min_subtotal, r.pk or 0),
+            min_subtotal=r.min_subtotal,
+            max_subtotal=r.max_subtotal,
+            method=method,
+            price=r.price,
+            rule_id=r.pk,
+        ))
+        self.size += 1
+
+    def _nodes(self, country: str, state: str, postal_code: str):
+        states = self._countries.get(country)
+        if not states:
+            return
+        for key in {state, ""}:
+            root = states.get(key)
+            if root is None:
+                continue
+            if not postal_code:
+                # same as the old query: no ZIP given -> prefix rules are not filtered out
+                yield from root.walk()
+                continue
+            node = root
+            yield node
+            for ch in postal_code:
+                node = node.children.get(ch)
+                if node is None:
+                    break
+                yield node
+
+    def match(self, *, country: str = "US", state: str = "", postal_code: str = "",
+              subtotal: Decimal = Decimal("0.00"), method: str = "standard") -> CompiledRule | None:
+        """Best matching rule (highest priority, then lowest min_subtotal) or None."""
+        country = (country or "US").upper()
+        state = (state or "").upper()
+        postal_code = (postal_code or "").strip().upper()
+        method = (method or "").lower()
+        best = None
+        for node in self._nodes(country, state, postal_code):
+            for key in {method, ""}:
+                for rule in node.rules.get(key, ()):
+                    if best is not None and rule.sort_key >= best.sort_key:
+                        break
+                    if rule.min_subtotal <= subtotal and (rule.max_subtotal is None or subtotal <= rule.max_subtotal):
+                        best = rule
+                        break
+        return best
+
+
+_lock = threading.Lock()
+_state = {"index": None, "generation": None, "checked_at": 0.0}
+
+
+def _current_generation():
+    from .models import ShippingRule
+    gen = ShippingRule.objects.aggregate(n=Count("id"), updated=Max("updated"))
+    return gen["n"], gen["updated"]
+
+
+def get_index() -> ShippingRuleIndex:
+    now = time.monotonic()
+    index = _state["index"]
+    if index is not None and now - _state["checked_at"] < CHECK_INTERVAL:
+        return index
+    generation = _current_generation()
+    if index is not None and generation == _state["generation"]:
+        _state["checked_at"] = now
+        return index
+    with _lock:
+        if _state["index"] is None or _state["generation"] != generation:
+            _state["index"] = ShippingRuleIndex.from_db()
+            _state["generation"] = generation
+        _state["checked_at"] = now
+        return _state["index"]
+
+
+def invalidate_index() -> None:
+    """Drop this process's index; the others notice the new generation within CHECK_INTERVAL."""
+    _state["index"] = None
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.7 on 2026-10-19 05:06
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('shipping', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='shippingrule',
+            name='updated',
+            field=models.DateTimeField(auto_now=True),
+        ),
+    ]
@@ -64,6 +64,7 @@ class ShippingRule(models.Model):
         help_text="Higher priority wins when multiple rules match.",
     )
     is_active = models.BooleanField(default=True)
+    updated = models.DateTimeField(auto_now=True)  # with the row count, the rule index generation
 
     class Meta:
         ordering = ["-priority", "min_subtotal"]
@@ -0,0 +1,14 @@
+from __future__ import annotations
+from django.db import transaction
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+
+from .index import invalidate_index
+from .models import ShippingRule
+
+
+@receiver(post_save, sender=ShippingRule)
+@receiver(post_delete, sender=ShippingRule)
+def _invalidate_rule_index(sender, instance, **kwargs):
+    # rebuild after commit so other processes never compile the old rows
+    transaction.on_commit(invalidate_index)
@@ -1,9 +1,35 @@
 from __future__ import annotations
 
 from decimal import Decimal
-from django.db.models import Q
 
-from .models import ShippingRule
+from .index import get_index
+
+# Used when no ShippingRule matches (and to list methods when no rules exist).
+FREE_STANDARD_THRESHOLD = Decimal("50.00")
+FALLBACK_RATES = {
+    "standard": Decimal("7.95"),
+    "expedited": Decimal("19.95"),
+    "overnight": Decimal("34.95"),
+}
+
+
+def _to_subtotal(subtotal) -> Decimal:
+    try:
+        return Decimal(subtotal)
+    except Exception:
+        return Decimal("0.00")
+
+
+def fallback_shipping(method: str, subtotal: Decimal) -> Decimal:
+    method = (method or "standard").lower()
+    if method not in FALLBACK_RATES or method == "standard":
+        return Decimal("0.00") if subtotal >= FREE_STANDARD_THRESHOLD else FALLBACK_RATES["standard"]
+    return FALLBACK_RATES[method]
+
+
+def shipping_methods() -> tuple[str, ...]:
+    """Methods offered at checkout: those with an active ShippingRule, else the fallback table."""
+    return get_index().methods or tuple(FALLBACK_RATES)
 
 
 def quote_shipping(
@@ -14,38 +40,35 @@ def quote_shipping(
     subtotal: Decimal = Decimal("0.00"),
     method: str = "standard",
 ) -> Decimal:
-    country = (country or "US").upper()
-    state = (state or "").upper()
-    postal_code = (postal_code or "").strip()
+    subtotal = _to_subtotal(subtotal)
 
-    try:
-        subtotal = Decimal(subtotal)
-    except Exception:
-        subtotal = Decimal("0.00")
-
-    qs = ShippingRule.objects.filter(is_active=True, country=country)
-    qs = qs.filter(Q(state__iexact=state) | Q(state=""))           # state or any
-    qs = qs.filter(Q(method__iexact=method) | Q(method=""))       # method or any
-    qs = qs.filter(
-        min_subtotal__lte=subtotal
-    ).filter(
-        Q(max_subtotal__isnull=True) | Q(max_subtotal__gte=subtotal)
+    # compiled in-process index (shipping.index) — no DB query per quote
+    rule = get_index().match(
+        country=country,
+        state=state,
+        postal_code=postal_code,
+        subtotal=subtotal,
+        method=method,
     )
-
-    if postal_code:
-        prefix3 = postal_code[:3]
-        prefix5 = postal_code[:5]
-        qs = qs.filter(
-            Q(postal_prefix="") |
-            Q(postal_prefix__iexact=prefix3) |
-            Q(postal_prefix__iexact=prefix5)
-        )
-
-    rule = qs.order_by("-priority", "min_subtotal").first()
     if rule:
         return rule.price
 
     # Fallback if nothing matched
-    if subtotal >= Decimal("50.00"):
-        return Decimal("0.00")
-    return Decimal("7.95")
+    return fallback_shipping(method, subtotal)
+
+
+def quote_all_methods(
+    *,
+    country: str = "US",
+    state: str = "",
+    postal_code: str = "",
+    subtotal: Decimal = Decimal("0.00"),
+) -> dict[str, Decimal]:
+    """{method: price} for every offered method, from one index snapshot."""
+    subtotal = _to_subtotal(subtotal)
+    index = get_index()
+    quotes = {}
+    for method in index.methods or tuple(FALLBACK_RATES):
+        rule = index.match(country=country, state=state, postal_code=postal_code, subtotal=subtotal, method=method)
+        quotes[method] = rule.price if rule else fallback_shipping(method, subtotal)
+    return quotes
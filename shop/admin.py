@@ -55,7 +55,7 @@ class ProductAdmin(admin.ModelAdmin):
             'fields': ('image',),
         }),
         ('Attributes', {
-            'fields': ('price', 'available', 'rating', 'pattern', 'material', 'care_instructions')
+            'fields': ('price', 'available', 'reorder_threshold', 'rating', 'pattern', 'material', 'care_instructions')
         }),
         ('Options', {
             'fields': ('colors', 'sizes')
@@ -0,0 +1,83 @@
+import time
+from itertools import groupby
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils.dateparse import parse_date
+
+from orders.models import OrderItem
+from shop.recommender import NAMESPACE_CHECK_INTERVAL, Recommender, TOP_K
+
+
+class Command(BaseCommand):
+    help = (
+        "Replay paid orders' items into the Redis co-purchase graph (the same path the "
+        "payment webhook uses), then trim every product to its top-K neighbours. "
+        "--rebuild writes a fresh namespace and flips to it atomically."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--since", help="Only orders created on/after this date (YYYY-MM-DD).")
+        parser.add_argument("--batch-size", type=int, default=500, help="Orders per Redis pipeline.")
+        parser.add_argument("--clear", action="store_true", help="Drop the live graph first (in place).")
+        parser.add_argument("--rebuild", action="store_true",
+                            help="Build into a new namespace, flip the live pointer, then purge the old keys.")
+        parser.add_argument("--keep-old", action="store_true", help="With --rebuild: do not purge the old namespace.")
+        parser.add_argument("--top-k", type=int, default=TOP_K)
+        parser.add_argument("--no-trim", action="store_true")
+
+    def handle(self, *args, **opts):
+        if opts["clear"] and opts["rebuild"]:
+            raise CommandError("--clear and --rebuild are exclusive")
+        rec = Recommender()
+        progress = lambda n: self.stdout.write(f"  {n} keys deleted…")  # noqa: E731
+
+        if not opts["rebuild"]:
+            if opts["clear"]:
+                self.stdout.write(f"Cleared {rec.clear_purchases(progress=progress)} keys.")
+            self._replay(rec, opts, version=None)
+            return
+
+        version = rec.begin_rebuild()
+        self.stdout.write(f"Building namespace {version}; live writes are mirrored into it.")
+        # let every process pick up the building pointer before the replay snapshot
+        time.sleep(NAMESPACE_CHECK_INTERVAL)
+        try:
+            self._replay(rec, opts, version=version)
+        except BaseException:
+            rec.abort_rebuild(version)
+            raise
+        old = rec.publish(version)
+        self.stdout.write(f"Namespace {version} is live (was {old or 'legacy'}).")
+        if not opts["keep_old"]:
+            time.sleep(NAMESPACE_CHECK_INTERVAL)  # readers still on the old pointer
+            n = rec.purge(version=old, progress=progress)
+            self.stdout.write(f"Purged {n} keys of the old namespace.")
+        self.stdout.write(self.style.SUCCESS("Done."))
+
+    def _replay(self, rec, opts, version):
+        lines = OrderItem.objects.filter(order__paid=True)
+        if opts["since"]:
+            lines = lines.filter(order__created__date__gte=parse_date(opts["since"]))
+        rows = (
+            lines.order_by("order_id")
+            .values_list("order_id", "product_id", "order__created")
+            .iterator(chunk_size=5000)
+        )
+
+        orders = increments = 0
+        batch = []
+        for _, items in groupby(rows, key=lambda row: row[0]):
+            items = list(items)
+            if len(items) > 1:
+                batch.append(([pid for _, pid, _ in items], items[0][2]))
+            orders += 1
+            if len(batch) >= opts["batch_size"]:
+                increments += rec.record_baskets(batch, version=version)
+                batch = []
+                self.stdout.write(f"  {orders} orders replayed…")
+        increments += rec.record_baskets(batch, version=version)
+        self.stdout.write(f"Replayed {orders} orders ({increments} pair increments).")
+
+        if not opts["no_trim"]:
+            keys = rec.trim(top_k=opts["top_k"], version=version)
+            self.stdout.write(f"Trimmed {keys} product sets to top {opts['top_k']}.")
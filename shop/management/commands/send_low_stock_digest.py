@@ -0,0 +1,20 @@
+from django.core.management.base import BaseCommand
+
+from shop.stock_alerts import DIGEST_LIMIT, low_stock, send_digest
+
+
+class Command(BaseCommand):
+    help = "Email the admins a digest of products that ran low on stock since the last digest."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--limit", type=int, default=DIGEST_LIMIT)
+        parser.add_argument("--dry-run", action="store_true", help="Only list low-stock products.")
+
+    def handle(self, *args, **opts):
+        if opts["dry_run"]:
+            for p in low_stock().order_by("stock", "id").values("id", "name", "stock", "reorder_threshold", "low_stock_alerted_at"):
+                alerted = p["low_stock_alerted_at"] or "-"
+                self.stdout.write(f"#{p['id']} {p['name']}: {p['stock']} <= {p['reorder_threshold']} (alerted {alerted})")
+            return
+        n = send_digest(limit=opts["limit"])
+        self.stdout.write(self.style.SUCCESS(f"Reported {n} low-stock product(s)."))
@@ -0,0 +1,34 @@
+# Generated by Django 5.2.7 on 2026-10-19 05:05
+
+from django.db import migrations, models
+
+
+def untrack_default_thresholds(apps, schema_editor):
+    # 0004 gave every product the old default of 5 while shop.Product.stock
+    # is mostly unmaintained; start everyone untracked, admins opt in per product
+    Product = apps.get_model('shop', 'Product')
+    Product.objects.filter(reorder_threshold=5).update(reorder_threshold=0, low_stock_alerted_at=None)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('shop', '0004_product_reorder_threshold'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='product',
+            name='product_low_stock_idx',
+        ),
+        migrations.AlterField(
+            model_name='product',
+            name='reorder_threshold',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.RunPython(untrack_default_thresholds, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(condition=models.Q(('available', True), ('reorder_threshold__gt', 0), ('stock__lte', models.F('reorder_threshold'))), fields=['stock'], name='product_low_stock_idx'),
+        ),
+    ]
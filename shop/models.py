@@ -1,4 +1,5 @@
 from django.db import models
+from django.db.models import F, Q
 from django.urls import reverse
 from django.core.exceptions import ValidationError
 from django.urls import reverse
@@ -85,6 +86,8 @@ class Product(models.Model):
     material = models.CharField(max_length=100, blank=True)
     colors = models.ManyToManyField(Color, blank=True)
     stock = models.PositiveIntegerField(default=0)  # total sellable units
+    reorder_threshold = models.PositiveIntegerField(default=0)  # low stock at or below this; 0 = not tracked
+    low_stock_alerted_at = models.DateTimeField(blank=True, null=True)  # set once per low-stock episode
     brand = models.CharField(max_length=100, blank=True)
 
 
@@ -102,6 +105,16 @@ class Product(models.Model):
             models.Index(fields=['id', 'slug']),
             models.Index(fields=['name']),
             models.Index(fields=['-created']),
+            # partial: holds only the low-stock rows, so the dashboard and
+            # the digest read O(low-stock items), not the catalog
+            models.Index(
+                fields=['stock'], name='product_low_stock_idx',
+                condition=Q(available=True, reorder_threshold__gt=0, stock__lte=F('reorder_threshold')),
+            ),
+            models.Index(
+                fields=['low_stock_alerted_at'], name='product_low_stock_alerted_idx',
+                condition=Q(low_stock_alerted_at__isnull=False),
+            ),
         ]
 
     def __str__(self):
@@ -110,6 +123,10 @@ class Product(models.Model):
     def get_absolute_url(self):
         return reverse('shop:product_detail', args=[self.id, self.slug])
 
+    @property
+    def is_low_stock(self):
+        return self.available and 0 < self.reorder_threshold and self.stock <= self.reorder_threshold
+
     def get_star_rating(self):
         """Returns a range for full stars"""
         return range(int(self.rating))
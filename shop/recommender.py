@@ -1,5 +1,14 @@
+import hashlib
+import math
+import time
+import uuid
+from datetime import datetime, timezone as dt_timezone
+from itertools import permutations
+
 import redis
 from django.conf import settings
+from django.core.cache import cache
+from django.core.exceptions import ImproperlyConfigured
 
 from .models import Product
 
@@ -16,55 +25,235 @@ r = redis.Redis(
     db=settings.REDIS_DB,
 )
 
+# Neighbours kept per product by trim(); the write path never trims, so a
+# new pair gets a chance to climb before the next trim.
+TOP_K = getattr(settings, "RECOMMENDER_TOP_K", 50)
+# Optional time decay: a purchase loses half its weight every HALF_LIFE days.
+# Implemented as forward decay: newer purchases get exponentially larger
+# increments relative to the decay epoch, so writes never touch old scores.
+# The epoch lives in Redis (DECAY_EPOCH_KEY; DECAY_EPOCH until first moved);
+# the periodic trim() moves it towards now and rescales every score by the
+# same factor, which keeps increments near 1 instead of growing without bound.
+HALF_LIFE_DAYS = getattr(settings, "RECOMMENDER_HALF_LIFE_DAYS", None)
+MIN_HALF_LIFE_DAYS = 1
+if HALF_LIFE_DAYS is not None and HALF_LIFE_DAYS < MIN_HALF_LIFE_DAYS:
+    raise ImproperlyConfigured(
+        f"RECOMMENDER_HALF_LIFE_DAYS must be None or >= {MIN_HALF_LIFE_DAYS} (got {HALF_LIFE_DAYS!r})."
+    )
+DECAY_EPOCH = datetime(2025, 1, 1, tzinfo=dt_timezone.utc).timestamp()
+DECAY_EPOCH_KEY = 'recommender:copurchase:decay_epoch'
+# One trim() moves the epoch at most this many half-lives: while it rescales,
+# a write landing on the wrong side of the move is off by at most this power of 2.
+MAX_EPOCH_STEP_HALF_LIVES = 1
+# Suggestions per cart signature are cached this many seconds.
+SUGGEST_CACHE_TTL = getattr(settings, "RECOMMENDER_SUGGEST_CACHE_TTL", 60)
+
+
+# Key namespaces. The live namespace is named by VERSION_KEY; no version is
+# the original layout, product:<id>:purchased_with. A rebuild writes a new
+# namespace (named by BUILDING_KEY while it runs; live writes go to both),
+# then flips VERSION_KEY and purges the old keys. Readers re-check the
+# pointers every NAMESPACE_CHECK_INTERVAL seconds.
+VERSION_KEY = 'recommender:copurchase:version'
+BUILDING_KEY = 'recommender:copurchase:building'
+NAMESPACE_CHECK_INTERVAL = 5
+_namespaces = {'checked': float('-inf'), 'live': '', 'building': None, 'epoch': DECAY_EPOCH}
+
+
+def namespaces(refresh=False):
+    """(live version, version being built or None)."""
+    now = time.monotonic()
+    if refresh or now - _namespaces['checked'] > NAMESPACE_CHECK_INTERVAL:
+        live, building, epoch = r.mget(VERSION_KEY, BUILDING_KEY, DECAY_EPOCH_KEY)
+        _namespaces.update(
+            checked=now,
+            live=live.decode() if live else '',
+            building=building.decode() if building else None,
+            epoch=float(epoch) if epoch else DECAY_EPOCH,
+        )
+    return _namespaces['live'], _namespaces['building']
+
+
+def decay_epoch(refresh=False) -> float:
+    namespaces(refresh)
+    return _namespaces['epoch']
+
+
+def purchase_weight(when=None) -> float:
+    if not HALF_LIFE_DAYS:
+        return 1.0
+    ts = when.timestamp() if when is not None else time.time()
+    # very old purchases underflow to 0.0, which is what decay means
+    return math.pow(2.0, min((ts - decay_epoch()) / (HALF_LIFE_DAYS * 86400), 1000.0))
+
 
 class Recommender:
-    def get_product_key(self, id):
-        return f'product:{id}:purchased_with'
-
-    def products_bought(self, products):
-        product_ids = [p.id for p in products]
-        for product_id in product_ids:
-            for with_id in product_ids:
-                # get the other products bought with each product
-                if product_id != with_id:
+    @staticmethod
+    def _prefix(version):
+        return f'copurchase:{version}:' if version else ''
+
+    def get_product_key(self, id, version=None):
+        if version is None:
+            version = namespaces()[0]
+        return f'{self._prefix(version)}product:{id}:purchased_with'
+
+    def key_pattern(self, version=None):
+        if version is None:
+            version = namespaces()[0]
+        return f'{self._prefix(version)}product:*:purchased_with'
+
+    def products_bought(self, products, when=None):
+        self.record_baskets([([p.id for p in products], when)])
+
+    def record_baskets(self, baskets, version=None) -> int:
+        """
+        Add co-purchase counts for many baskets of (product_ids, when) in one
+        pipeline round trip. Returns the number of ZINCRBY commands sent.
+        Without `version`, writes go to the live namespace and to the one
+        being rebuilt, if any.
+        """
+        if version is None:
+            versions = [v for v in namespaces() if v is not None]
+        else:
+            versions = [version]
+        pipe = r.pipeline(transaction=False)
+        sent = 0
+        for product_ids, when in baskets:
+            weight = purchase_weight(when)
+            for product_id, with_id in permutations(sorted(set(product_ids)), 2):
+                for v in versions:
                     # increment score for product purchased together
-                    r.zincrby(
-                        self.get_product_key(product_id), 1, with_id
-                    )
+                    pipe.zincrby(self.get_product_key(product_id, v), weight, with_id)
+                    sent += 1
+        if sent:
+            pipe.execute()
+        return sent
 
-    def suggest_products_for(self, products, max_results=6):
-        product_ids = [p.id for p in products]
-        if len(products) == 1:
-            # only 1 product
-            suggestions = r.zrange(
-                self.get_product_key(product_ids[0]), 0, -1, desc=True
-            )[:max_results]
+    def _advance_decay_epoch(self) -> float:
+        """Move the decay epoch towards now; returns the factor every stored score must be scaled by."""
+        if not HALF_LIFE_DAYS:
+            return 1.0
+        old = decay_epoch(refresh=True)
+        half_life = HALF_LIFE_DAYS * 86400
+        new = min(time.time(), old + MAX_EPOCH_STEP_HALF_LIVES * half_life)
+        if new <= old:
+            return 1.0
+        r.set(DECAY_EPOCH_KEY, repr(new))
+        namespaces(refresh=True)
+        return math.pow(2.0, -(new - old) / half_life)
+
+    def trim(self, top_k=None, batch_size=500, version=None) -> int:
+        """
+        Cut every product's sorted set down to its top_k neighbours; returns
+        keys visited. Without `version` this trims the live namespace and,
+        with decay on, also renormalises: the epoch moves forward and all
+        scores are scaled down in the same pass (ZUNIONSTORE key 1 key
+        WEIGHTS f). While a rebuild runs, its namespace is left alone (the
+        backfill trims it once the replay is done) and the epoch stays put,
+        so both namespaces keep the same scale.
+        """
+        top_k = TOP_K if top_k is None else top_k
+        if version is None:
+            live, building = namespaces(refresh=True)
+            versions = [live]
+            factor = self._advance_decay_epoch() if building is None else 1.0
+        else:
+            versions, factor = [version], 1.0
+        pipe = r.pipeline(transaction=False)
+        visited = 0
+        for v in versions:
+            for key in r.scan_iter(match=self.key_pattern(v), count=1000):
+                if factor != 1.0:
+                    pipe.zunionstore(key, {key: factor})
+                pipe.zremrangebyrank(key, 0, -(top_k + 1))
+                visited += 1
+                if visited % batch_size == 0:
+                    pipe.execute()
+        pipe.execute()
+        return visited
+
+    def suggest_product_ids(self, product_ids, max_results=6) -> list[int]:
+        """Top `max_results` product ids bought together with `product_ids` (cached briefly)."""
+        product_ids = sorted({int(pid) for pid in product_ids})
+        if not product_ids or max_results <= 0:
+            return []
+        signature = ",".join(map(str, product_ids))
+        if len(signature) > 100:
+            signature = hashlib.sha1(signature.encode()).hexdigest()
+        version = namespaces()[0]
+        cache_key = f"recommender:suggest:{version}:{signature}:{max_results}"
+        cached = cache.get(cache_key)
+        if cached is not None:
+            return cached
+
+        if len(product_ids) == 1:
+            # only 1 product: its own set never contains it, read just the top N
+            suggestions = r.zrange(self.get_product_key(product_ids[0], version), 0, max_results - 1, desc=True)
         else:
-            # generate a temporary key
-            flat_ids = ''.join([str(id) for id in product_ids])
-            tmp_key = f'tmp_{flat_ids}'
-            # multiple products, combine scores of all products
-            # store the resulting sorted set in a temporary key
-            keys = [self.get_product_key(id) for id in product_ids]
-            r.zunionstore(tmp_key, keys)
+            # multiple products, combine scores of all products server-side in
+            # one MULTI/EXEC round trip; the temporary key is unique per call
+            tmp_key = f"tmp:suggest:{uuid.uuid4().hex}"
+            pipe = r.pipeline(transaction=True)
+            pipe.zunionstore(tmp_key, [self.get_product_key(pid, version) for pid in product_ids])
             # remove ids for the products the recommendation is for
-            r.zrem(tmp_key, *product_ids)
-            # get the product ids by their score, descendant sort
-            suggestions = r.zrange(
-                tmp_key, 0, -1, desc=True
-            )[:max_results]
-            # remove the temporary key
-            r.delete(tmp_key)
-        suggested_products_ids = [int(id) for id in suggestions]
-        # get suggested products and sort by order of appearance
-        suggested_products = list(
-            Product.objects.filter(id__in=suggested_products_ids)
-        )
-        suggested_products.sort(
-            key=lambda x: suggested_products_ids.index(x.id)
-        )
-        return suggested_products
+            pipe.zrem(tmp_key, *product_ids)
+            pipe.zrange(tmp_key, 0, max_results - 1, desc=True)
+            pipe.delete(tmp_key)
+            suggestions = pipe.execute()[2]
+        ids = [int(pid) for pid in suggestions]
+        cache.set(cache_key, ids, SUGGEST_CACHE_TTL)
+        return ids
+
+    def suggest_products_for(self, products, max_results=6):
+        suggested_products_ids = self.suggest_product_ids([p.id for p in products], max_results)
+        # get suggested products and keep the ranking order
+        by_id = Product.objects.in_bulk(suggested_products_ids)
+        return [by_id[pid] for pid in suggested_products_ids if pid in by_id]
+
+    def purge(self, version=None, batch_size=500, progress=None) -> int:
+        """
+        Delete every co-purchase key of a namespace (default: live) with
+        SCAN + batched UNLINK; memory is freed off the main Redis thread.
+        `progress(deleted)` is called after each batch. Returns keys deleted.
+        """
+        deleted = 0
+        batch = []
+        for key in r.scan_iter(match=self.key_pattern(version), count=1000):
+            batch.append(key)
+            if len(batch) >= batch_size:
+                deleted += r.unlink(*batch)
+                batch = []
+                if progress:
+                    progress(deleted)
+        if batch:
+            deleted += r.unlink(*batch)
+            if progress:
+                progress(deleted)
+        return deleted
+
+    def clear_purchases(self, progress=None):
+        return self.purge(progress=progress)
+
+    # ---- full rebuild into a fresh namespace ----
+
+    def begin_rebuild(self) -> str:
+        """Open a new namespace; live writes are mirrored into it from now on."""
+        version = time.strftime('%Y%m%d%H%M%S')
+        r.set(BUILDING_KEY, version)
+        namespaces(refresh=True)
+        return version
+
+    def publish(self, version) -> str:
+        """Atomically make `version` live; returns the previous live version."""
+        old = namespaces(refresh=True)[0]
+        pipe = r.pipeline(transaction=True)
+        pipe.set(VERSION_KEY, version)
+        pipe.delete(BUILDING_KEY)
+        pipe.execute()
+        namespaces(refresh=True)
+        return old
 
-    def clear_purchases(self):
-        for id in Product.objects.values_list('id', flat=True):
-            r.delete(self.get_product_key(id))
\ No newline at end of file
+    def abort_rebuild(self, version) -> int:
+        r.delete(BUILDING_KEY)
+        namespaces(refresh=True)
+        return self.purge(version=version)
\ No newline at end of file
@@ -0,0 +1,12 @@
+from django.db.models.signals import post_save
+from django.dispatch import receiver
+
+from .models import Product
+from .stock_alerts import stock_changed
+
+
+@receiver(post_save, sender=Product)
+def _product_saved(sender, instance, **kwargs):
+    # admin / API edits; bulk F() updates call stock_changed() themselves
+    if instance.is_low_stock and instance.low_stock_alerted_at is None:
+        stock_changed()
@@ -0,0 +1,87 @@
+# shop/stock_alerts.py
+"""
+Low-stock alerts.
+
+A product is low on stock when it is available, has opted in with a
+reorder_threshold above 0 (the default 0 means stock is not tracked) and
+`stock <= reorder_threshold`. Those rows are exactly the partial index
+`product_low_stock_idx`, so listing them never scans the catalog.
+
+Stock changes (checkout reservations, payment, ledger sync, admin edits)
+call `stock_changed()`, which schedules at most one digest per
+LOW_STOCK_DIGEST_INTERVAL. The digest mails every product that went low
+since its last alert in one notify_admin email and stamps
+`low_stock_alerted_at`; the stamp is cleared once the product recovers, so
+each low-stock episode is reported once.
+"""
+from __future__ import annotations
+
+import logging
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+
+from core.notify import notify_admin
+from .models import Product
+
+logger = logging.getLogger(__name__)
+
+DIGEST_INTERVAL = getattr(settings, "LOW_STOCK_DIGEST_INTERVAL", 15 * 60)
+DIGEST_LIMIT = 200
+_SCHEDULED_KEY = "shop:low_stock_digest:scheduled"
+
+
+def low_stock():
+    """Available products at or below their reorder threshold (served by the partial index)."""
+    return Product.objects.filter(available=True, reorder_threshold__gt=0, stock__lte=F("reorder_threshold"))
+
+
+def schedule_digest() -> None:
+    if cache.add(_SCHEDULED_KEY, 1, DIGEST_INTERVAL * 2):
+        from .tasks import send_low_stock_digest
+        try:
+            send_low_stock_digest.apply_async(countdown=DIGEST_INTERVAL)
+        except Exception:
+            # broker down: the stock write has committed; let the next change retry
+            cache.delete(_SCHEDULED_KEY)
+            logger.exception("Could not schedule the low-stock digest")
+
+
+def stock_changed() -> None:
+    """Call inside the transaction that moved shop.Product.stock."""
+    transaction.on_commit(schedule_digest)
+
+
+def send_digest(limit: int = DIGEST_LIMIT) -> int:
+    """Mail newly low products to the admins; returns how many were reported."""
+    cache.delete(_SCHEDULED_KEY)
+    # recovered since their last alert: report again next time they run low
+    (Product.objects.filter(low_stock_alerted_at__isnull=False)
+     .exclude(available=True, reorder_threshold__gt=0, stock__lte=F("reorder_threshold"))
+     .update(low_stock_alerted_at=None))
+
+    items = list(
+        low_stock().filter(low_stock_alerted_at__isnull=True)
+        .order_by("stock", "id")
+        .values("id", "name", "stock", "reorder_threshold")[:limit]
+    )
+    if not items:
+        return 0
+    site_name = getattr(settings, "SITE_NAME", "Shop")
+    notify_admin(
+        f"{site_name}: {len(items)} product(s) low on stock",
+        "emails/low_stock_digest.html",
+        {
+            "items": items,
+            "total_low": low_stock().count(),
+            "site_name": site_name,
+            "site_domain": getattr(settings, "SITE_DOMAIN", "example.com"),
+        },
+    )
+    Product.objects.filter(pk__in=[it["id"] for it in items]).update(low_stock_alerted_at=timezone.now())
+    if len(items) == limit:
+        schedule_digest()  # more left; next batch after the interval
+    return len(items)
@@ -1,7 +1,5 @@
 # shop/stripe_views.py
 from __future__ import annotations
-from django.http import HttpResponse
-from django.views.decorators.csrf import csrf_exempt
 
 
 import hashlib
@@ -14,7 +12,11 @@ from django.http import JsonResponse
 from rest_framework.decorators import api_view, permission_classes, authentication_classes
 from rest_framework.permissions import AllowAny
 
-stripe.api_key = settings.STRIPE_SECRET_KEY
+from payment.checkout_sessions import open_session, payment_pending, record_session
+from payment.stripe_client import get_client
+# api/stripe/webhook/ and payment/webhook/ share one verify-store-ack handler
+from payment.webhooks import stripe_webhook  # noqa: F401
+
 CURRENCY = "usd"
 
 def _to_cents(v) -> int:
@@ -74,17 +76,14 @@ def create_stripe_session(request):
     if total_cents <= 0:
         return JsonResponse({"detail": "Order total must be greater than zero."}, status=400)
 
-    # ---- resume existing open session if we already created one for same order+total ----
-    # The cache key includes total_cents so if the total changes, a new session will be created.
-    session_cache_key = f"checkout_session:{order.id}:{total_cents}"
-    prior_session_id = request.session.get(session_cache_key)
-    if prior_session_id:
-        try:
-            prior = stripe.checkout.Session.retrieve(prior_session_id)
-            if prior and prior.get("status") == "open" and prior.get("payment_status") == "unpaid":
-                return JsonResponse({"url": prior["url"]}, status=200)
-        except Exception:
-            pass  # just create a new one below
+    # ---- resume an open session for the same order+total (local lookup, no Stripe call) ----
+    # A changed total gets a new session; webhooks mark sessions complete/expired.
+    # A paid-session webhook still in the queue means: paid, just not recorded yet.
+    if payment_pending(order):
+        return JsonResponse({"detail": "Payment for this order is being processed."}, status=409)
+    prior = open_session(order, total_cents)
+    if prior is not None:
+        return JsonResponse({"url": prior.url}, status=200)
 
     # ---- fixed-price single line item (NO automatic tax, NO shipping options, NO discounts) ----
     site_name = getattr(settings, "SITE_NAME", "Store")
@@ -117,13 +116,15 @@ def create_stripe_session(request):
     success_url = f"{frontend}/order/thank-you?order={order.id}"
     cancel_url = f"{frontend}/cart"
 
-    # Idempotency key: unique to (order, total_cents)
-    fp_src = _json.dumps({"oid": order.id, "total": total_cents}, sort_keys=True, separators=(",", ":"))
+    # Idempotency key: unique to (order, total_cents, attempt) so a retry after
+    # expiry creates a fresh session instead of replaying the expired one
+    attempt = order.checkout_sessions.filter(total_cents=total_cents).count()
+    fp_src = _json.dumps({"oid": order.id, "total": total_cents, "n": attempt}, sort_keys=True, separators=(",", ":"))
     idem_key = f"fixedtotal:{hashlib.sha1(fp_src.encode()).hexdigest()[:20]}"
 
     # ---- create session ----
     try:
-        session = stripe.checkout.Session.create(
+        session = get_client().checkout.sessions.create(dict(
             mode="payment",
             client_reference_id=str(order.id),
             success_url=success_url,
@@ -145,11 +146,10 @@ def create_stripe_session(request):
                 "charged_total_display": f"${Decimal(total_cents)/Decimal(100):.2f}",
                 "source": "fixed-total-checkout",
             },
-            idempotency_key=idem_key,
-        )
+        ), {"idempotency_key": idem_key})
 
-        # cache the session id for quick resume
-        request.session[session_cache_key] = session.id
+        # remember it for quick resume
+        record_session(order, total_cents, session)
         request.session["last_order_id"] = order.id
         request.session.modified = True
 
@@ -157,40 +157,3 @@ def create_stripe_session(request):
 
     except stripe.error.StripeError as e:
         return JsonResponse({"detail": str(e)}, status=400)
-
-
-@csrf_exempt
-def stripe_webhook(request):
-    """
-    Verify Stripe signature, parse event, and handle the few events you care about.
-    Make sure STRIPE_WEBHOOK_SECRET is set in your environment/settings.
-    """
-    endpoint_secret = getattr(settings, "STRIPE_WEBHOOK_SECRET", "")
-    payload = request.body
-    sig_header = request.META.get("HTTP_STRIPE_SIGNATURE", "")
-
-    try:
-        event = stripe.Webhook.construct_event(payload, sig_header, endpoint_secret)
-    except ValueError:
-        return HttpResponse(status=400)  # invalid payload
-    except stripe.error.SignatureVerificationError:
-        return HttpResponse(status=400)  # invalid signature
-
-    # --- Handle events you care about ---
-    if event["type"] == "checkout.session.completed":
-        session = event["data"]["object"]
-        # Example: mark order as paid
-        order_id = session.get("client_reference_id")
-        if order_id:
-            try:
-                from orders.models import Order
-                order = Order.objects.get(id=order_id)
-                # You can also check session["payment_status"] == "paid"
-                order.paid = True
-                order.save(update_fields=["paid"])
-            except Order.DoesNotExist:
-                pass
-
-    # You can also handle 'payment_intent.succeeded' etc. if needed.
-
-    return HttpResponse(status=200)
@@ -0,0 +1,21 @@
+from celery import shared_task
+
+
+@shared_task
+def send_low_stock_digest():
+    """
+    Debounced (see shop.stock_alerts.schedule_digest): one email listing
+    the products that ran low since the last digest.
+    """
+    from .stock_alerts import send_digest
+    return send_digest()
+
+
+@shared_task
+def trim_copurchase_graph():
+    """
+    Periodic (celery beat): cut every product's co-purchase set down to
+    RECOMMENDER_TOP_K neighbours so the sets stay bounded.
+    """
+    from .recommender import Recommender
+    return Recommender().trim()
@@ -3,14 +3,23 @@ from rest_framework.decorators import api_view, permission_classes
 from rest_framework.permissions import IsAdminUser
 from rest_framework.response import Response
 from .models import Product
+from .stock_alerts import low_stock as low_stock_products
 
 @api_view(["GET"])
 @permission_classes([IsAdminUser])
 def low_stock(request):
     limit = int(request.query_params.get("limit", 8))
-    threshold = int(request.query_params.get("threshold", 5))
-    qs = Product.objects.filter(available=True, stock__lte=threshold).order_by("stock")[:limit]
-    return Response([{"id": p.id, "name": p.name, "sku": getattr(p, "sku", None), "stock": p.stock} for p in qs])
+    threshold = request.query_params.get("threshold")
+    if threshold is None:
+        # per-product reorder thresholds, read from the partial index
+        qs = low_stock_products()
+    else:
+        qs = Product.objects.filter(available=True, stock__lte=int(threshold))
+    qs = qs.only("id", "name", "stock", "reorder_threshold").order_by("stock", "id")[:limit]
+    return Response([{
+        "id": p.id, "name": p.name, "sku": getattr(p, "sku", None),
+        "stock": p.stock, "reorder_threshold": p.reorder_threshold,
+    } for p in qs])
 
 @api_view(["GET"])
 @permission_classes([IsAdminUser])